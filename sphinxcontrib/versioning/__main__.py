@@ -1,5 +1,6 @@
 """Entry point of project via setuptools which calls cli()."""
 
+import json
 import logging
 import os
 import shutil
@@ -8,9 +9,18 @@ import time
 import click
 
 from sphinxcontrib.versioning import __version__
-from sphinxcontrib.versioning.git import clone, commit_and_push, get_root, GitError
+from sphinxcontrib.versioning.git import (
+    clone, commit_and_push, fetch_branch, get_root, GitError, init_scratch, list_remote, push_tree, show_file,
+    write_tree,
+)
 from sphinxcontrib.versioning.lib import Config, HandledError, TempDir
-from sphinxcontrib.versioning.routines import build_all, gather_git_info, pre_build, read_local_conf
+from sphinxcontrib.versioning.manifest import MANIFEST_FILE, read_manifest, write_manifest
+from sphinxcontrib.versioning.output import archive_mode, copy_tree, precompress
+from sphinxcontrib.versioning.routines import (
+    build_all, build_version, cache_budgets, cache_usage, fingerprint, gather_git_info, INCREMENTAL_FILE, pre_build,
+    prune_caches, read_incremental_state, read_local_conf, read_state, write_fingerprint, write_versions_json,
+)
+from sphinxcontrib.versioning.server import LazyBuilds, LazyServer
 from sphinxcontrib.versioning.setup_logging import setup_logging
 from sphinxcontrib.versioning.versions import multi_sort, Versions
 
@@ -122,7 +132,9 @@ def cli(config, **options):
     """Build versioned Sphinx docs for every branch and tag pushed to origin.
 
     Supports only building locally with the "build" sub command or build and push to a remote with the "push" sub
-    command. For more information for either run them with their own --help.
+    command. The "serve" sub command previews docs locally, building versions when they're first viewed. The "cache"
+    sub command shows and prunes what's kept in --cache-dir. For more information for any of them run them with their
+    own --help.
 
     The options below are global and must be specified before the sub command name (e.g. -N build ...).
     \f
@@ -173,6 +185,21 @@ def cli(config, **options):
     config.update(options)
 
 
+def validate_budgets(_, __, value):
+    """Click callback verifying --cache-max-age and --cache-max-size values.
+
+    :param tuple value: Values of the option.
+
+    :return: The same values.
+    :rtype: tuple
+    """
+    try:
+        cache_budgets(value)
+    except ValueError as exc:
+        raise click.BadParameter(str(exc))
+    return value
+
+
 def build_options(func):
     """Add "build" Click options to function.
 
@@ -188,17 +215,47 @@ def build_options(func):
     func = click.option('-b', '--show-banner', help='Show a warning banner.', is_flag=True)(func)
     func = click.option('-B', '--banner-main-ref',
                         help="Don't show banner on this ref and point banner URLs to this ref. Default master.")(func)
+    func = click.option('--cache-dir', type=click.Path(file_okay=False),
+                        help='Keep metadata of commits in a database in this directory for later runs.')(func)
+    func = click.option('--cache-max-age', multiple=True, callback=validate_budgets,
+                        help='Delete cache entries not used in this many days after building. NAME=DAYS for one cache. '
+                             'Default 0 (never).')(func)
+    func = click.option('--cache-max-size', multiple=True, callback=validate_budgets,
+                        help='Delete least recently used entries of each cache above this many MiB. NAME=MIB for one '
+                             'cache. Default 0.')(func)
+    func = click.option('--copy-root', is_flag=True,
+                        help='Build root-ref only once in its subdir and copy it to the root of DESTINATION.')(func)
+    func = click.option('--dedup-static', type=click.Choice(('hardlink', 'symlink', 'rewrite')),
+                        help='Store one copy of static files identical across versions. Default is no dedup.')(func)
+    func = click.option('--dedup-trees', is_flag=True,
+                        help='Read docs only once for versions with identical docs directories (same git tree).')(func)
+    func = click.option('--incremental', is_flag=True,
+                        help='Only build refs whose docs or settings changed since the last run.')(func)
     func = click.option('-i', '--invert', help='Invert/reverse order of versions.', is_flag=True)(func)
+    func = click.option('--manifest', is_flag=True,
+                        help='Write .scv_manifest.json listing output files and changes since the last run.')(func)
     func = click.option('-p', '--priority', type=click.Choice(('branches', 'tags')),
                         help="Group these kinds of versions at the top (for themes that don't separate them).")(func)
+    func = click.option('--prefetch', type=int,
+                        help='Export commits in the background, at most this many on disk at once. Default 0.')(func)
+    func = click.option('--refresh-cache', is_flag=True,
+                        help='Ignore metadata stored in --cache-dir by previous runs and replace it.')(func)
+    func = click.option('--reproducible', is_flag=True,
+                        help='Pin build dates to commit dates so unchanged versions give identical files.')(func)
     func = click.option('-r', '--root-ref',
                         help='The branch/tag at the root of DESTINATION. Will also be in subdir. Default master.')(func)
+    func = click.option('--skip-unchanged', is_flag=True,
+                        help='Exit early if branches/tags and settings are the same as in the last run.')(func)
     func = click.option('-s', '--sort', multiple=True, type=click.Choice(('semver', 'alpha', 'time')),
                         help='Sort versions. Specify multiple times to sort equal values of one kind.')(func)
+    func = click.option('--static-conf', is_flag=True,
+                        help='Read conf.py from git without running Sphinx during the pre-run when possible.')(func)
     func = click.option('-t', '--greatest-tag', is_flag=True,
                         help='Override root-ref to be the tag with the highest version number.')(func)
     func = click.option('-T', '--recent-tag', is_flag=True,
                         help='Override root-ref to be the most recent committed tag.')(func)
+    func = click.option('--versions-json', is_flag=True,
+                        help='Write versions.json and list versions in the browser instead of in every page.')(func)
     func = click.option('-w', '--whitelist-branches', multiple=True,
                         help='Whitelist branches that match the pattern. Can be specified more than once.')(func)
     func = click.option('-W', '--whitelist-tags', multiple=True,
@@ -234,38 +291,18 @@ def override_root_main_ref(config, remotes, banner):
     return ref in [r['name'] for r in remotes]
 
 
-@cli.command(cls=ClickCommand)
-@build_options
-@click.argument('REL_SOURCE', nargs=-1, required=True)
-@click.argument('DESTINATION', type=click.Path(file_okay=False, dir_okay=True))
-@click.make_pass_decorator(Config)
-def build(config, rel_source, destination, **options):
-    """Fetch branches/tags and build all locally.
-
-    Doesn't push anything to remote. Just fetch all remote branches and tags, export them to a temporary directory, run
-    sphinx-build on each one, and then store all built documentation in DESTINATION.
-
-    REL_SOURCE is the path to the docs directory relative to the git root. If the source directory has moved around
-    between git tags you can specify additional directories.
+def gather_versions(config, rel_source, root_dirs=None):
+    """Gather git data, pick the root and banner main refs, and pre-run Sphinx on every version.
 
-    DESTINATION is the path to the local directory that will hold all generated docs for all versions.
-
-    To pass options to sphinx-build (run for every branch/tag) use a double hyphen
-    (e.g. build docs docs/_build/html -- -D setting=value).
-    \f
+    :raise HandledError: If there are no docs or the root ref isn't found.
 
     :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
     :param tuple rel_source: Possible relative paths (to git root) of Sphinx directory containing conf.py (e.g. docs).
-    :param str destination: Destination directory to copy/overwrite built docs to. Does not delete old files.
-    :param dict options: Additional Click options.
+    :param dict root_dirs: Root directories of versions in the previous run (passed to pre_build()).
+
+    :return: Versions class instance and the directory with exported commits (delete when done).
+    :rtype: tuple
     """
-    if 'pre' in config:
-        config.pop('pre')(rel_source)
-        config.update({k: v for k, v in options.items() if v})
-        if config.local_conf:
-            config.update(read_local_conf(config.local_conf), ignore_set=True)
-    if NO_EXECUTE:
-        raise RuntimeError(config, rel_source, destination)
     log = logging.getLogger(__name__)
 
     # Gather git data.
@@ -301,14 +338,112 @@ def build(config, rel_source, destination, **options):
 
     # Pre-build.
     log.info("Pre-running Sphinx to collect versions' master_doc and other info.")
-    exported_root = pre_build(config.git_root, versions)
+    exported_root = pre_build(config.git_root, versions, root_dirs)
     if config.banner_main_ref and config.banner_main_ref not in [r['name'] for r in versions.remotes]:
         log.warning('Banner main ref %s failed during pre-run. Disabling banner.', config.banner_main_ref)
         config.update(dict(banner_greatest_tag=False, banner_main_ref=None, banner_recent_tag=False, show_banner=False),
                       overwrite=True)
 
+    return versions, exported_root
+
+
+def validate_destination(config, destination):
+    """Make sure DESTINATION can be written to with the archive setting.
+
+    :raise HandledError: If DESTINATION or the combination of settings isn't supported.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param str destination: Destination directory or archive file.
+    """
+    log = logging.getLogger(__name__)
+    if config.archive and not archive_mode(destination):
+        log.error('Unsupported archive file extension (.tar.zst requires the zstandard package): %s', destination)
+        raise HandledError
+    if config.archive and (config.dedup_static or config.incremental or config.manifest):
+        log.error('Archive output cannot be combined with deduplicating static files, incremental builds, or writing a '
+                  'manifest.')
+        raise HandledError
+    if config.incremental and config.dedup_static:
+        log.error('Incremental builds cannot be combined with deduplicating static files.')
+        raise HandledError
+    if not config.archive and os.path.isfile(destination):
+        log.error('DESTINATION is a file. Use --archive to write an archive file.')
+        raise HandledError
+
+
+def check_unchanged(config, key, dest_branch, rel_source):
+    """Fingerprint the inputs of this run and compare it to the last successful run.
+
+    :raise HandledError: If git ls-remote fails.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param str key: Identifies the command and its destination in the state file.
+    :param str dest_branch: Branch docs are pushed to. None for the build sub command.
+    :param tuple rel_source: Possible relative paths (to git root) of Sphinx directory containing conf.py (e.g. docs).
+
+    :return: Fingerprint of this run and if it's the same as the last one.
+    :rtype: tuple
+    """
+    value = fingerprint(source_refs(config, dest_branch), rel_source, key)
+    return value, read_state(config.git_root).get(key) == value
+
+
+@cli.command(cls=ClickCommand)
+@build_options
+@click.option('--archive', is_flag=True,
+              help='Write DESTINATION as a tar or zip file (by file extension) instead of a directory.')
+@click.argument('REL_SOURCE', nargs=-1, required=True)
+@click.argument('DESTINATION', type=click.Path())
+@click.make_pass_decorator(Config)
+def build(config, rel_source, destination, **options):
+    """Fetch branches/tags and build all locally.
+
+    Doesn't push anything to remote. Just fetch all remote branches and tags, export them to a temporary directory, run
+    sphinx-build on each one, and then store all built documentation in DESTINATION.
+
+    REL_SOURCE is the path to the docs directory relative to the git root. If the source directory has moved around
+    between git tags you can specify additional directories.
+
+    DESTINATION is the path to the local directory that will hold all generated docs for all versions. With --archive
+    it's the path to a .tar, .tar.gz, .tgz, .tar.bz2, .tar.xz, .tar.zst, or .zip file instead.
+
+    To pass options to sphinx-build (run for every branch/tag) use a double hyphen
+    (e.g. build docs docs/_build/html -- -D setting=value).
+    \f
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param tuple rel_source: Possible relative paths (to git root) of Sphinx directory containing conf.py (e.g. docs).
+    :param str destination: Destination directory to copy/overwrite built docs to. Does not delete old files.
+    :param dict options: Additional Click options.
+    """
+    if 'pre' in config:
+        config.pop('pre')(rel_source)
+        config.update({k: v for k, v in options.items() if v})
+        if config.local_conf:
+            config.update(read_local_conf(config.local_conf), ignore_set=True)
+    if NO_EXECUTE:
+        raise RuntimeError(config, rel_source, destination)
+    log = logging.getLogger(__name__)
+
+    validate_destination(config, destination)
+    if config.incremental and not config.versions_json:
+        log.info('Enabling versions-json for incremental builds so versions are listed by versions.json.')
+        config.update(dict(versions_json=True), overwrite=True)
+
+    # Exit early if nothing changed since the last run.
+    if config.skip_unchanged:
+        key = 'build {}'.format(os.path.abspath(destination))
+        last_run, unchanged = check_unchanged(config, key, None, rel_source)
+        if unchanged and os.path.exists(destination):
+            log.info('Nothing changed since the last run. Skipping.')
+            return
+
+    # Gather git data and pre-build. Push reads state of the previous run from DEST_BRANCH instead.
+    previous = config.pop('previous', None) or (read_incremental_state(destination) if config.incremental else dict())
+    versions, exported_root = gather_versions(config, rel_source, {n: r['root_dir'] for n, r in previous.items()})
+
     # Build.
-    build_all(exported_root, destination, versions)
+    build_all(exported_root, destination, versions, previous)
 
     # Cleanup.
     log.debug('Removing: %s', exported_root)
@@ -316,6 +451,138 @@ def build(config, rel_source, destination, **options):
 
     # Store versions in state for push().
     config['versions'] = versions
+    if config.skip_unchanged:
+        write_fingerprint(config.git_root, key, last_run)
+
+
+def source_refs(config, dest_branch):
+    """List remote branches/tags that are inputs of the build (everything except DEST_BRANCH).
+
+    :raise HandledError: If git ls-remote fails.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param str dest_branch: Branch docs are pushed to. None for the build sub command.
+
+    :return: List of lists containing strings (sha, name, kind).
+    :rtype: list
+    """
+    try:
+        return [r for r in list_remote(config.git_root) if r[1:] != [dest_branch, 'heads']]
+    except GitError as exc:
+        log = logging.getLogger(__name__)
+        log.error(exc.message)
+        log.error(exc.output)
+        raise HandledError
+
+
+def push_clone(config, dest_branch, rel_dest, build_staging):
+    """Clone the destination branch, update it with built docs, and push. One attempt of the push sub command.
+
+    :raise HandledError: On unrecoverable git errors.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param str dest_branch: Branch to clone and push to.
+    :param str rel_dest: Relative path (to git root) to write generated docs to.
+    :param function build_staging: Returns the directory with built docs and the Versions class instance.
+
+    :return: If push succeeded (False if another client pushed first).
+    :rtype: bool
+    """
+    log = logging.getLogger(__name__)
+    with TempDir() as temp_dir:
+        log.info('Cloning %s into temporary directory...', dest_branch)
+        try:
+            clone(config.git_root, temp_dir, config.push_remote, dest_branch, rel_dest, tuple())
+        except GitError as exc:
+            log.error(exc.message)
+            log.error(exc.output)
+            raise HandledError
+        previous = read_incremental_state(os.path.join(temp_dir, rel_dest)) if config.incremental else dict()
+        staging, versions = build_staging(previous)
+        if config.manifest:
+            write_manifest(staging, read_manifest(staging), read_manifest(os.path.join(temp_dir, rel_dest)))
+        # Write only changed files so git can skip hashing unchanged ones. Stale files are deleted instead of git rm.
+        changed = copy_tree(staging, os.path.join(temp_dir, rel_dest), keep_exclude(config, staging, versions))
+
+        log.info('Attempting to push to branch %s on remote repository.', dest_branch)
+        try:
+            paths = [os.path.normpath(os.path.join(rel_dest, p)) for p in changed]
+            return commit_and_push(temp_dir, config.push_remote, versions, paths)
+        except GitError as exc:
+            log.error(exc.message)
+            log.error(exc.output)
+            raise HandledError
+
+
+def keep_exclude(config, staging, versions):
+    """Add root directories of versions not built again by the incremental option to grm_exclude.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param str staging: Directory with built docs.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+    :return: Glob patterns of files not to delete from REL_DEST (empty if nothing is deleted at all).
+    :rtype: tuple
+    """
+    if not config.grm_exclude:
+        return config.grm_exclude
+    kept = [r['root_dir'] for r in versions.remotes if not os.path.isdir(os.path.join(staging, r['root_dir']))]
+    return tuple(config.grm_exclude) + tuple(kept)
+
+
+def previous_file(local_root, commit, rel_dest, name):
+    """Read a JSON file (e.g. the manifest) committed to the destination branch by the previous run.
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Commit SHA of the destination branch.
+    :param str rel_dest: Relative path (to git root) generated docs are written to.
+    :param str name: File name in rel_dest.
+
+    :return: Parsed file or None if there is none.
+    :rtype: dict
+    """
+    try:
+        contents = show_file(local_root, commit, os.path.normpath(os.path.join(rel_dest, name)))
+    except GitError:
+        return None
+    return json.loads(contents)
+
+
+def push_no_worktree(config, dest_branch, rel_dest, build_staging):
+    """Commit built docs straight onto the destination branch and push. No clone or checkout.
+
+    Git plumbing runs in a temporary scratch repository (see init_scratch()) so the local repository isn't touched.
+
+    :raise HandledError: On unrecoverable git errors.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param str dest_branch: Branch to commit to and push.
+    :param str rel_dest: Relative path (to git root) to write generated docs to.
+    :param function build_staging: Returns the directory with built docs and the Versions class instance.
+
+    :return: If push succeeded (False if another client pushed first).
+    :rtype: bool
+    """
+    log = logging.getLogger(__name__)
+    with TempDir() as scratch:
+        try:
+            init_scratch(config.git_root, scratch)
+            parent = fetch_branch(scratch, config.push_remote, dest_branch)
+            previous = dict()
+            if config.incremental:
+                state = previous_file(scratch, parent, rel_dest, INCREMENTAL_FILE) or dict()
+                previous = state.get('refs', dict())
+            staging, versions = build_staging(previous)
+            log.info('Attempting to push to branch %s on remote repository.', dest_branch)
+            if config.manifest:
+                previous_manifest = previous_file(scratch, parent, rel_dest, MANIFEST_FILE)
+                write_manifest(staging, read_manifest(staging), previous_manifest)
+            tree = write_tree(scratch, parent, rel_dest, keep_exclude(config, staging, versions), staging)
+            return push_tree(scratch, config.push_remote, dest_branch, parent, tree, versions)
+        except GitError as exc:
+            log.error(exc.message)
+            log.error(exc.output)
+            raise HandledError
 
 
 @cli.command(cls=ClickCommand)
@@ -323,6 +590,8 @@ def build(config, rel_source, destination, **options):
 @click.option('-e', '--grm-exclude', multiple=True,
               help='If specified "git rm" will delete all files in REL_DEST except for these. Specify multiple times '
                    'for more. Paths are relative to REL_DEST in DEST_BRANCH.')
+@click.option('--no-worktree', is_flag=True,
+              help='Write built docs straight into a new commit on DEST_BRANCH instead of cloning and checking it out.')
 @click.option('-P', '--push-remote', help='Push built docs to this remote. Default is origin.')
 @click.argument('REL_SOURCE', nargs=-1, required=True)
 @click.argument('DEST_BRANCH')
@@ -339,7 +608,7 @@ def push(ctx, config, rel_source, dest_branch, rel_dest, **options):
     between git tags you can specify additional directories.
 
     DEST_BRANCH is the branch name where generated docs will be committed to. The branch will then be pushed to remote.
-    If there is a race condition with another job pushing to remote the docs will be re-generated and pushed again.
+    If there is a race condition with another job pushing to remote the docs will be committed and pushed again.
 
     REL_DEST is the path to the directory that will hold all generated docs for all versions relative to the git roof of
     DEST_BRANCH.
@@ -363,33 +632,180 @@ def push(ctx, config, rel_source, dest_branch, rel_dest, **options):
     if NO_EXECUTE:
         raise RuntimeError(config, rel_source, dest_branch, rel_dest)
     log = logging.getLogger(__name__)
+    if config.archive:
+        log.warning('Ignoring archive setting, push needs a directory to copy built docs from.')
+        config.update(dict(archive=False), overwrite=True)
+    if config.incremental and config.manifest:
+        log.error('Incremental builds cannot be combined with writing a manifest when pushing.')
+        raise HandledError
 
-    # Clone, build, push.
-    for _ in range(PUSH_RETRIES):
-        with TempDir() as temp_dir:
-            log.info('Cloning %s into temporary directory...', dest_branch)
-            try:
-                clone(config.git_root, temp_dir, config.push_remote, dest_branch, rel_dest, config.grm_exclude)
-            except GitError as exc:
-                log.error(exc.message)
-                log.error(exc.output)
-                raise HandledError
+    # Exit early if nothing changed since the last run.
+    key = last_run = None
+    if config.skip_unchanged:
+        key = 'push {} {} {}'.format(config.push_remote, dest_branch, rel_dest)
+        last_run, unchanged = check_unchanged(config, key, dest_branch, rel_source)
+        if unchanged:
+            log.info('Nothing changed since the last run. Skipping.')
+            return
+        config.update(dict(skip_unchanged=False), overwrite=True)  # Always build into staging.
 
-            log.info('Building docs...')
-            ctx.invoke(build, rel_source=rel_source, destination=os.path.join(temp_dir, rel_dest))
-            versions = config.pop('versions')
+    staged = dict()
 
-            log.info('Attempting to push to branch %s on remote repository.', dest_branch)
-            try:
-                if commit_and_push(temp_dir, config.push_remote, versions):
-                    return
-            except GitError as exc:
-                log.error(exc.message)
-                log.error(exc.output)
-                raise HandledError
+    def build_staging(previous):
+        """Build docs into a temporary directory unless already built from the same remote branches/tags.
+
+        :param dict previous: State of the previous incremental run in DEST_BRANCH (from read_incremental_state()).
+
+        :return: Directory with built docs and the Versions class instance.
+        :rtype: tuple
+        """
+        refs = source_refs(config, dest_branch)
+        if staged.get('refs') != refs or staged.get('previous') != previous:
+            if staged:
+                log.info('Remote branches/tags changed since building docs. Rebuilding...')
+                staged['staging'].cleanup()
+            staged.update(previous=previous, refs=refs, staging=TempDir())
+            log.info('Building docs...')
+            if config.incremental:
+                config['previous'] = previous
+            ctx.invoke(build, rel_source=rel_source, destination=staged['staging'].name)
+            staged['versions'] = config.pop('versions')
+        return staged['staging'].name, staged['versions']
+
+    # Build once, push. Rebuild only if branches/tags changed while racing with another client.
+    attempt = push_no_worktree if config.no_worktree else push_clone
+    for _ in range(PUSH_RETRIES):
+        if attempt(config, dest_branch, rel_dest, build_staging):
+            if last_run:
+                write_fingerprint(config.git_root, key, last_run)
+            return
         log.warning('Failed to push to remote repository. Retrying in %d seconds...', PUSH_SLEEP)
         time.sleep(PUSH_SLEEP)
 
     # Failed if this is reached.
     log.error('Ran out of retries, giving up.')
     raise HandledError
+
+
+@cli.command(cls=ClickCommand)
+@click.option('--cache-dir', type=click.Path(file_okay=False),
+              help='Directory with the caches. Default is scv_cache_dir in the local conf.py.')
+@click.option('--cache-max-age', multiple=True, callback=validate_budgets,
+              help='With --prune delete entries not used in this many days. NAME=DAYS for one cache.')
+@click.option('--cache-max-size', multiple=True, callback=validate_budgets,
+              help='With --prune delete least recently used entries above this many MiB. NAME=MIB for one cache.')
+@click.option('--clear', is_flag=True, help='Delete all entries of all caches.')
+@click.option('--prune', is_flag=True, help='Delete entries over --cache-max-age or --cache-max-size.')
+@click.argument('REL_SOURCE', nargs=-1)
+@click.make_pass_decorator(Config)
+def cache(config, rel_source, clear, prune, **options):
+    """Show usage and hit rates of caches in --cache-dir and optionally delete entries.
+
+    Every cache (e.g. the store of commit metadata) is pruned on its own: --cache-max-size applies to each one unless
+    given for a cache by name (e.g. --cache-max-size 512 --cache-max-size jinja2=16).
+
+    REL_SOURCE is optional, the path to the docs directory relative to the git root. Used to find the local conf.py with
+    scv_cache_dir and the other settings.
+    \f
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param tuple rel_source: Possible relative paths (to git root) of Sphinx directory containing conf.py (e.g. docs).
+    :param bool clear: Delete everything.
+    :param bool prune: Delete entries over budget.
+    :param dict options: Additional Click options.
+    """
+    if 'pre' in config:
+        config.pop('pre')(rel_source)
+        config.update({k: v for k, v in options.items() if v})
+        if config.local_conf:
+            config.update(read_local_conf(config.local_conf), ignore_set=True)
+    if NO_EXECUTE:
+        raise RuntimeError(config, rel_source, clear, prune)
+    log = logging.getLogger(__name__)
+
+    if not config.cache_dir or not os.path.isdir(config.cache_dir):
+        log.error('Cache directory not found. Specify it with --cache-dir or scv_cache_dir.')
+        raise HandledError
+
+    # Delete entries.
+    if clear:
+        log.info('Deleted %d cache entries.', prune_caches(config.cache_dir, 0, 0, clear=True))
+    elif prune:
+        if not config.cache_max_age and not config.cache_max_size:
+            log.error('Nothing to prune without --cache-max-age or --cache-max-size.')
+            raise HandledError
+        removed = prune_caches(config.cache_dir, config.cache_max_size, config.cache_max_age)
+        log.info('Removed %d cache entries over budget.', removed)
+
+    # Show usage.
+    row_format = '{:<24} {:>8} {:>12} {:>8} {:>8} {:>9}'
+    click.echo(row_format.format('Cache', 'Entries', 'Bytes', 'Hits', 'Misses', 'Hit rate'))
+    for name, count, size, hits, misses in cache_usage(config.cache_dir):
+        rate = '{:.1%}'.format(float(hits) / (hits + misses)) if hits + misses else '-'
+        click.echo(row_format.format(name, count, size, hits, misses, rate))
+
+
+@cli.command(cls=ClickCommand)
+@build_options
+@click.option('--bind', default='127.0.0.1', help='Address to listen on. Default is 127.0.0.1 (only this computer).')
+@click.option('--keep', type=int, default=0,
+              help='Keep at most this many versions built, deleting the least recently viewed. Default 0 (unlimited).')
+@click.option('--port', type=int, default=8000, help='Port to listen on. Default is 8000.')
+@click.argument('REL_SOURCE', nargs=-1, required=True)
+@click.make_pass_decorator(Config)
+def serve(config, rel_source, bind, keep, port, **options):
+    """Preview docs in a local web server, building versions on their first request.
+
+    Only the root ref is built before the server starts. Every other version is built when one of its pages is first
+    requested. Text files are gzip compressed once after building. Stop the server with Ctrl+C.
+
+    REL_SOURCE is the path to the docs directory relative to the git root. If the source directory has moved around
+    between git tags you can specify additional directories.
+    \f
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+    :param tuple rel_source: Possible relative paths (to git root) of Sphinx directory containing conf.py (e.g. docs).
+    :param str bind: Address to listen on.
+    :param int keep: Maximum number of versions built at a time (not counting the web root). 0 is unlimited.
+    :param int port: Port to listen on.
+    :param dict options: Additional Click options.
+    """
+    if 'pre' in config:
+        config.pop('pre')(rel_source)
+        config.update({k: v for k, v in options.items() if v})
+        if config.local_conf:
+            config.update(read_local_conf(config.local_conf), ignore_set=True)
+    if NO_EXECUTE:
+        raise RuntimeError(config, rel_source, bind, keep, port)
+    log = logging.getLogger(__name__)
+    names = ('archive', 'copy_root', 'dedup_static', 'incremental', 'manifest', 'skip_unchanged')
+    ignored = [n for n in names if getattr(config, n)]
+    if ignored:
+        log.warning('Ignoring options that only apply to the build sub command: %s', ', '.join(ignored))
+        config.update({n: getattr(Config(), n) for n in ignored}, overwrite=True)
+
+    versions, exported_root = gather_versions(config, rel_source)
+    staging = TempDir()
+    try:
+        log.info('Building root: %s', config.root_ref)
+        build_version(exported_root, staging.name, versions, config.root_ref, True)
+        if config.versions_json:
+            write_versions_json(staging.name, versions)
+        precompress(staging.name)
+        builds = LazyBuilds(
+            staging.name,
+            versions,
+            lambda name: build_version(exported_root, staging.name, versions, name, False),
+            keep,
+        )
+        server = LazyServer((bind, port), builds)
+        log.info('Serving docs on http://%s:%d/ (Ctrl+C to stop).', *server.server_address[:2])
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            log.info('Stopping.')
+        finally:
+            server.server_close()
+    finally:
+        staging.cleanup()
+        shutil.rmtree(exported_root, True)
@@ -0,0 +1,103 @@
+/* Render the versions sidebar and the banner's link to the main version from versions.json in the web root.
+ *
+ * Used with the versions_json option so HTML files don't have to list every version. Elements to fill in have the
+ * data-scv-web-root (relative path to the web root) and data-scv-page (current page name) attributes.
+ */
+(function () {
+    'use strict';
+
+    var MANIFEST = 'versions.json';
+
+    function hasPage(data, version, page) {
+        var docs = data.docs[version.docs];
+        if (!docs.lookup) {
+            docs.lookup = {};
+            docs.forEach(function (name) { docs.lookup[name] = true; });
+        }
+        return docs.lookup.hasOwnProperty(page);
+    }
+
+    function versionUrl(data, version, page, webRoot) {
+        var target = hasPage(data, version, page) ? page : version.master_doc;
+        return webRoot + version.root_dir + '/' + target + '.html';
+    }
+
+    function link(url, text) {
+        var anchor = document.createElement('a');
+        anchor.href = url;
+        anchor.appendChild(document.createTextNode(text));
+        return anchor;
+    }
+
+    function renderList(element, data, page, webRoot) {
+        if (element.tagName === 'UL') {
+            data.versions.forEach(function (version) {
+                var item = document.createElement('li');
+                item.appendChild(link(versionUrl(data, version, page, webRoot), version.name));
+                element.appendChild(item);
+            });
+            return;
+        }
+        [['tags', 'Tags'], ['heads', 'Branches']].forEach(function (group) {
+            var matching = data.versions.filter(function (version) { return version.kind === group[0]; });
+            if (!matching.length) {
+                return;
+            }
+            var list = document.createElement('dl');
+            var title = document.createElement('dt');
+            title.appendChild(document.createTextNode(group[1]));
+            list.appendChild(title);
+            matching.forEach(function (version) {
+                var item = document.createElement('dd');
+                item.appendChild(link(versionUrl(data, version, page, webRoot), version.name));
+                list.appendChild(item);
+            });
+            element.appendChild(list);
+        });
+    }
+
+    function renderBanner(element, data, page, webRoot) {
+        var name = element.getAttribute('data-scv-banner');
+        var main = data.versions.filter(function (version) { return version.name === name; })[0];
+        if (!main || !hasPage(data, main, page)) {
+            return;
+        }
+        var anchor = link(versionUrl(data, main, page, webRoot), '');
+        while (element.firstChild) {
+            anchor.appendChild(element.firstChild);
+        }
+        anchor.appendChild(document.createTextNode(
+            ' The ' + element.getAttribute('data-scv-label') + ' version is ' + name + '.'
+        ));
+        element.appendChild(anchor);
+    }
+
+    function load(webRoot, callback) {
+        var request = new XMLHttpRequest();
+        request.onreadystatechange = function () {
+            if (request.readyState === 4 && (request.status === 200 || request.status === 0) && request.responseText) {
+                callback(JSON.parse(request.responseText));
+            }
+        };
+        request.open('GET', webRoot + MANIFEST);
+        request.send();
+    }
+
+    document.addEventListener('DOMContentLoaded', function () {
+        var elements = document.querySelectorAll('[data-scv-web-root]');
+        if (!elements.length) {
+            return;
+        }
+        var webRoot = elements[0].getAttribute('data-scv-web-root');
+        var page = elements[0].getAttribute('data-scv-page');
+        load(webRoot, function (data) {
+            Array.prototype.forEach.call(elements, function (element) {
+                if (element.hasAttribute('data-scv-banner')) {
+                    renderBanner(element, data, page, webRoot);
+                } else {
+                    renderList(element, data, page, webRoot);
+                }
+            });
+        });
+    });
+}());
@@ -1,5 +1,6 @@
 """Interface with git locally and remotely."""
 
+import fnmatch
 import glob
 import json
 import logging
@@ -11,6 +12,8 @@ import time
 from datetime import datetime
 from subprocess import CalledProcessError, PIPE, Popen, STDOUT
 
+from sphinxcontrib.versioning.lib import TempDir
+
 IS_WINDOWS = sys.platform == 'win32'
 RE_ALL_REMOTES = re.compile(r'([\w./-]+)\t([A-Za-z0-9@:/\\._-]+) \((fetch|push)\)\n')
 RE_REMOTE = re.compile(r'^(?P<sha>[0-9a-f]{5,40})\trefs/(?P<kind>heads|tags)/(?P<name>[\w./-]+(?:\^\{})?)$',
@@ -249,6 +252,91 @@ def filter_and_date(local_root, conf_rel_paths, commits):
     return dates_paths
 
 
+def verify_commits(local_root, commits):
+    """Make sure commits are available in the local repository (e.g. when their info is cached from a previous run).
+
+    :raise CalledProcessError: Unhandled git command failure.
+    :raise GitError: A commit SHA has not been fetched.
+
+    :param str local_root: Local path to git root directory.
+    :param iter commits: List of commit SHAs.
+    """
+    for commits_group in chunk(commits, 50):
+        try:
+            run_command(local_root, ['git', 'log', '--no-walk', '--pretty=format:%H'] + commits_group)
+        except CalledProcessError as exc:
+            raise GitError('Git log failed on {0}'.format(' '.join(commits_group)), exc.output)
+
+
+def get_tree_sha(local_root, commit, rel_dir):
+    """Get the SHA of a directory's git tree object at a specific commit. Identical directory contents have equal SHAs.
+
+    :raise GitError: If git rev-parse fails (e.g. directory does not exist in that commit).
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Git commit SHA to look in.
+    :param str rel_dir: Directory relative to git root. Empty string for the root of the repository.
+
+    :return: Tree SHA.
+    :rtype: str
+    """
+    rel_dir = rel_dir.replace('\\', '/').strip('/')
+    rev = '{}:{}'.format(commit, rel_dir) if rel_dir.strip('.') else '{}^{{tree}}'.format(commit)
+    try:
+        output = run_command(local_root, ['git', 'rev-parse', '--verify', rev])
+    except CalledProcessError as exc:
+        raise GitError('Git failed to get tree of {0} in {1}'.format(rel_dir or '.', commit), exc.output)
+    return output.strip()
+
+
+def list_files(local_root, commit, rel_dir):
+    """List all files in a directory at a specific commit without exporting it (like "git ls-tree -r").
+
+    :raise GitError: If git ls-tree fails.
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Git commit SHA to look in.
+    :param str rel_dir: Directory relative to git root. Empty string for the root of the repository.
+
+    :return: Paths of files (blobs only, no submodules) relative to rel_dir using forward slashes.
+    :rtype: list
+    """
+    prefix = '{}/'.format(rel_dir.replace('\\', '/').strip('/')) if rel_dir.strip('/\\.') else ''
+    command = ['git', 'ls-tree', '-r', '-z', '--full-tree', commit]
+    if prefix:
+        command += ['--', prefix]
+    try:
+        output = run_command(local_root, command)
+    except CalledProcessError as exc:
+        raise GitError('Git ls-tree failed on {0}'.format(commit), exc.output)
+
+    files = list()
+    for entry in (e for e in output.split('\0') if e):
+        info, path = entry.split('\t', 1)
+        if info.split(' ')[1] == 'blob' and path.startswith(prefix):
+            files.append(path[len(prefix):])
+    return files
+
+
+def show_file(local_root, commit, rel_path):
+    """Read the contents of one file at a specific commit without exporting it.
+
+    :raise GitError: If git show fails (e.g. file does not exist in that commit).
+
+    :param str local_root: Local path to git root directory.
+    :param str commit: Git commit SHA to read from.
+    :param str rel_path: Path to the file relative to git root.
+
+    :return: File contents.
+    :rtype: str
+    """
+    command = ['git', 'show', '{}:{}'.format(commit, rel_path.replace('\\', '/'))]
+    try:
+        return run_command(local_root, command)
+    except CalledProcessError as exc:
+        raise GitError('Git failed to read {0} from {1}'.format(rel_path, commit), exc.output)
+
+
 def fetch_commits(local_root, remotes):
     """Fetch from origin.
 
@@ -322,9 +410,30 @@ def export(local_root, commit, target):
         os.utime(os.path.join(target, file_path), (last_committed, last_committed))
 
 
+def checkout_sparse(local_root, rel_dir):
+    """Populate the working tree of a repo cloned with --no-checkout, limited to one directory.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str rel_dir: Only check out this directory relative to git root. Everything if it's the root directory.
+    """
+    rel_dir = rel_dir.replace('\\', '/').strip('/') if rel_dir.strip('/\\.') else ''
+    if rel_dir:
+        info = os.path.join(local_root, '.git', 'info')
+        if not os.path.isdir(info):
+            os.makedirs(info)
+        with open(os.path.join(info, 'sparse-checkout'), 'w') as handle:
+            handle.write('/{}/\n'.format(rel_dir))
+        run_command(local_root, ['git', 'config', 'core.sparseCheckout', 'true'])
+    run_command(local_root, ['git', 'read-tree', '-m', '-u', 'HEAD'])
+
+
 def clone(local_root, new_root, remote, branch, rel_dest, exclude):
     """Clone "local_root" origin into a new directory and check out a specific branch. Optionally run "git rm".
 
+    Objects already in local_root are reused instead of being downloaded again and only rel_dest is checked out.
+
     :raise CalledProcessError: Unhandled git command failure.
     :raise GitError: Handled git failures.
 
@@ -332,7 +441,7 @@ def clone(local_root, new_root, remote, branch, rel_dest, exclude):
     :param str new_root: Local path empty directory in which branch will be cloned into.
     :param str remote: The git remote to clone from to.
     :param str branch: Checkout this branch.
-    :param str rel_dest: Run "git rm" on this directory if exclude is truthy.
+    :param str rel_dest: Check out only this directory. Run "git rm" on it if exclude is truthy.
     :param iter exclude: List of strings representing relative file paths to exclude from "git rm".
     """
     log = logging.getLogger(__name__)
@@ -349,18 +458,26 @@ def clone(local_root, new_root, remote, branch, rel_dest, exclude):
     if remote not in remotes:
         raise GitError('Git repo missing remote "{}".'.format(remote), output)
 
-    # Clone.
+    # Clone. Borrow objects already in the local repo so only missing ones are downloaded.
     try:
-        run_command(new_root, ['git', 'clone', remotes[remote][0], '--depth=1', '--branch', branch, '.'])
+        run_command(new_root, ['git', 'clone', remotes[remote][0], '--depth=1', '--branch', branch, '--no-checkout',
+                               '--reference-if-able', local_root, '.'])
     except CalledProcessError as exc:
         raise GitError('Failed to clone from remote repo URL.', exc.output)
 
+    # Speed up "git status" on large trees.
+    run_command(new_root, ['git', 'config', 'core.untrackedCache', 'true'])
+    run_command(new_root, ['git', 'config', 'core.splitIndex', 'true'])
+
     # Make sure user didn't select a tag as their DEST_BRANCH.
     try:
         run_command(new_root, ['git', 'symbolic-ref', 'HEAD'])
     except CalledProcessError as exc:
         raise GitError('Specified branch is not a real branch.', exc.output)
 
+    # Check out only REL_DEST.
+    checkout_sparse(new_root, rel_dest)
+
     # Copy all remotes from original repo.
     for name, (fetch, push) in remotes.items():
         try:
@@ -390,7 +507,91 @@ def clone(local_root, new_root, remote, branch, rel_dest, exclude):
     run_command(new_root, ['git', 'checkout', '--'] + exclude_joined)
 
 
-def commit_and_push(local_root, remote, versions):
+def list_changes(local_root):
+    """List files that differ between HEAD and the index or working tree in one "git status" pass.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+
+    :return: Changed, new (untracked), and deleted file paths relative to local_root.
+    :rtype: list
+    """
+    output = run_command(local_root, ['git', 'status', '--porcelain=v2', '-z', '--untracked-files=all'])
+    entries = iter(output.split('\0'))
+    paths = list()
+    for entry in entries:
+        kind = entry[:1]
+        if kind == '?':
+            paths.append(entry[2:])
+        elif kind == '1':
+            paths.append(entry.split(' ', 8)[8])
+        elif kind == '2':
+            paths.extend([entry.split(' ', 9)[9], next(entries)])  # Renamed entries are followed by the old path.
+        elif kind == 'u':
+            paths.append(entry.split(' ', 10)[10])
+    return paths
+
+
+def stage_changes(local_root, paths=None):
+    """Stage changed, new, and deleted files instead of running "git add ." on the whole tree.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param iter paths: Only stage these files (relative to local_root) plus already staged ones. Default all changes.
+
+    :return: Status letter and path of every staged change compared to HEAD.
+    :rtype: list
+    """
+    if paths is None:
+        paths = list_changes(local_root)
+    else:
+        staged = run_command(local_root, ['git', 'diff-index', '--cached', '--name-only', '-z', 'HEAD'])
+        paths = list(paths) + [p for p in staged.split('\0') if p]
+    for paths_group in chunk(paths, 500):
+        run_command(local_root, ['git', 'update-index', '--add', '--remove', '--'] + paths_group)
+
+    # Compare the index to HEAD without looking at the working tree again.
+    output = run_command(local_root, ['git', 'diff-index', '--cached', '--name-status', '-z', 'HEAD'])
+    fields = output.split('\0')
+    return list(zip(fields[::2], fields[1::2]))
+
+
+def is_significant(changes):
+    """Check if there are changes other than to files that always change (.doctrees, searchindex.js, manifest).
+
+    :param iter changes: Status letter and path (using forward slashes) of every change.
+
+    :return: True if something other than those files was modified, added, or deleted.
+    :rtype: bool
+    """
+    for status, name in changes:
+        if status != 'M':
+            return True  # Only looking for modified files.
+        components = name.split('/')
+        if '.doctrees' not in components and components[-1] not in ('searchindex.js', '.scv_manifest.json'):
+            return True  # Something other than those dirs/files has changed.
+    return False
+
+
+def commit_message(versions):
+    """Generate the commit message for publishing docs, including whitelisted CI environment variables.
+
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+    :return: Commit message.
+    :rtype: str
+    """
+    latest_commit = sorted(versions.remotes, key=lambda v: v['date'])[-1]
+    message = 'AUTO sphinxcontrib-versioning {} {}\n\n'.format(
+        datetime.utcfromtimestamp(latest_commit['date']).strftime('%Y%m%d'),
+        latest_commit['sha'][:11],
+    )
+    return message + ''.join('{}: {}\n'.format(v, os.environ[v]) for v in WHITELIST_ENV_VARS if v in os.environ)
+
+
+def commit_and_push(local_root, remote, versions, paths=None):
     """Commit changed, new, and deleted files in the repo and attempt to push the branch to the remote repository.
 
     :raise CalledProcessError: Unhandled git command failure.
@@ -399,45 +600,29 @@ def commit_and_push(local_root, remote, versions):
     :param str local_root: Local path to git root directory.
     :param str remote: The git remote to push to.
     :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param iter paths: Only stage these files (relative to local_root) plus already staged ones. Default all changes.
 
     :return: If push succeeded.
     :rtype: bool
     """
     log = logging.getLogger(__name__)
     current_branch = run_command(local_root, ['git', 'rev-parse', '--abbrev-ref', 'HEAD']).strip()
-    run_command(local_root, ['git', 'add', '.'])
 
     # Check if there are no changes.
-    try:
-        run_command(local_root, ['git', 'diff', 'HEAD', '--no-ext-diff', '--quiet', '--exit-code'])
-    except CalledProcessError:
-        pass  # Repo is dirty, something has changed.
-    else:
+    changes = stage_changes(local_root, paths)
+    if not changes:
         log.info('No changes to commit.')
         return True
 
     # Check if there are changes excluding those files that always change.
-    output = run_command(local_root, ['git', 'diff', 'HEAD', '--no-ext-diff', '--name-status'])
-    for status, name in (l.split('\t', 1) for l in output.splitlines()):
-        if status != 'M':
-            break  # Only looking for modified files.
-        components = name.split('/')
-        if '.doctrees' not in components and components[-1] != 'searchindex.js':
-            break  # Something other than those two dirs/files has changed.
-    else:
+    if not is_significant(changes):
         log.info('No significant changes to commit.')
         return True
 
     # Commit.
-    latest_commit = sorted(versions.remotes, key=lambda v: v['date'])[-1]
     commit_message_file = os.path.join(local_root, '_scv_commit_message.txt')
     with open(commit_message_file, 'w') as handle:
-        handle.write('AUTO sphinxcontrib-versioning {} {}\n\n'.format(
-            datetime.utcfromtimestamp(latest_commit['date']).strftime('%Y%m%d'),
-            latest_commit['sha'][:11],
-        ))
-        for line in ('{}: {}\n'.format(v, os.environ[v]) for v in WHITELIST_ENV_VARS if v in os.environ):
-            handle.write(line)
+        handle.write(commit_message(versions))
     try:
         run_command(local_root, ['git', 'commit', '-F', commit_message_file])
     except CalledProcessError as exc:
@@ -448,10 +633,201 @@ def commit_and_push(local_root, remote, versions):
     try:
         run_command(local_root, ['git', 'push', remote, current_branch])
     except CalledProcessError as exc:
-        if '[rejected]' in exc.output and '(fetch first)' in exc.output:
+        if '[rejected]' in exc.output and ('(fetch first)' in exc.output or '(non-fast-forward)' in exc.output):
             log.debug('Remote has changed since cloning the repo. Must retry.')
             return False
         raise GitError('Failed to push to remote.', exc.output)
 
     log.info('Successfully pushed to remote repository.')
     return True
+
+
+def init_scratch(local_root, scratch):
+    """Create an empty repository for plumbing commands that reads objects and config from the local repository.
+
+    Objects fetched or written in the scratch repository stay out of the local repository (no loose objects piling up
+    in .git/objects). Its config (remotes, credentials, committer identity) is included so remote names still work.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str scratch: Existing empty directory to create the repository in.
+    """
+    git_dir = os.path.join(local_root, '.git')
+    run_command(scratch, ['git', 'init', '--quiet', '.'], env_var=False)
+    with open(os.path.join(scratch, '.git', 'objects', 'info', 'alternates'), 'w') as handle:
+        handle.write(os.path.abspath(os.path.join(git_dir, 'objects')) + '\n')
+    run_command(scratch, ['git', 'config', 'include.path', os.path.abspath(os.path.join(git_dir, 'config'))])
+
+
+def fetch_branch(local_root, remote, branch):
+    """Fetch only the latest commit of a branch from the remote without checking it out.
+
+    Meant for the scratch repository of init_scratch(): the commit is fetched shallow into a private ref (instead of
+    FETCH_HEAD, shared by concurrent runs in the same repository).
+
+    :raise GitError: Handled git failures.
+
+    :param str local_root: Local path to git root directory.
+    :param str remote: The git remote to fetch from.
+    :param str branch: Branch name.
+
+    :return: Commit SHA of the branch's head.
+    :rtype: str
+    """
+    ref = 'refs/scv/{}'.format(branch)
+    try:
+        run_command(local_root, ['git', 'fetch', '--depth=1', remote, '+refs/heads/{}:{}'.format(branch, ref)], retry=3)
+    except CalledProcessError as exc:
+        raise GitError('Failed to fetch branch from remote.', exc.output)
+    return run_command(local_root, ['git', 'rev-parse', ref + '^{commit}']).strip()
+
+
+def matches_exclude(rel_path, exclude):
+    """Check if a file or one of its parent directories matches a glob pattern, like glob.glob() in clone().
+
+    :param str rel_path: File path relative to REL_DEST using forward slashes.
+    :param iter exclude: List of glob patterns relative to REL_DEST.
+
+    :return: If the file is excluded.
+    :rtype: bool
+    """
+    components = rel_path.split('/')
+    for pattern in (e.replace('\\', '/').strip('/').split('/') for e in exclude):
+        if len(pattern) > len(components):
+            continue
+        pairs = zip(components, pattern)
+        if all(fnmatch.fnmatchcase(c, p) and (p.startswith('.') or not c.startswith('.')) for c, p in pairs):
+            return True
+    return False
+
+
+def file_mode(path):
+    """Get the git file mode of a file on disk.
+
+    :param str path: Path to the file.
+
+    :return: Mode string for git update-index.
+    :rtype: str
+    """
+    if os.path.islink(path):
+        return '120000'
+    if not IS_WINDOWS and os.access(path, os.X_OK):
+        return '100755'
+    return '100644'
+
+
+def add_directory(local_root, source, prefix, environ):
+    """Write all files in a directory as git blobs and add them to an index.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str source: Local directory with the files to add.
+    :param str prefix: Path of source in the index with a trailing forward slash. Empty string for the root.
+    :param dict environ: Environment variables for git (e.g. GIT_INDEX_FILE).
+    """
+    paths = [os.path.join(r, n) for r, _, names in os.walk(source) for n in names]
+    with TempDir() as temp_dir:
+        for paths_group in chunk(paths, 500):
+            blobs = list()
+            for path in paths_group:
+                if not os.path.islink(path):
+                    blobs.append(path)
+                    continue
+                blobs.append(os.path.join(temp_dir, str(len(blobs))))  # Symlink blobs hold the link target.
+                with open(blobs[-1], 'wb') as handle:
+                    handle.write(os.readlink(path).replace(os.sep, '/').encode('utf-8'))
+            shas = run_command(local_root, ['git', 'hash-object', '-w', '--no-filters', '--'] + blobs).split()
+
+            command = ['git', 'update-index', '--add', '--replace']
+            for path, sha in zip(paths_group, shas):
+                rel_path = prefix + os.path.relpath(path, source).replace(os.sep, '/')
+                command += ['--cacheinfo', '{},{},{}'.format(file_mode(path), sha, rel_path)]
+            run_command(local_root, command, environ=environ)
+
+
+def write_tree(local_root, parent, rel_dest, exclude, source):
+    """Write a directory into a new git tree based on a parent commit without checking anything out.
+
+    Uses a temporary index so unchanged subtrees outside of rel_dest are reused from the parent by tree SHA. Like
+    clone(), everything in rel_dest except for excluded paths is deleted if exclude is truthy.
+
+    :raise CalledProcessError: Unhandled git command failure.
+
+    :param str local_root: Local path to git root directory.
+    :param str parent: Commit SHA to base the tree on.
+    :param str rel_dest: Write files in this directory relative to the root of the tree.
+    :param iter exclude: List of strings representing relative file paths to exclude from deletion.
+    :param str source: Local directory with the files to write.
+
+    :return: Tree SHA.
+    :rtype: str
+    """
+    prefix = '{}/'.format(rel_dest.replace('\\', '/').strip('/')) if rel_dest.strip('/\\.') else ''
+    with TempDir() as temp_dir:
+        environ = dict(GIT_INDEX_FILE=os.path.join(temp_dir, 'index'))
+        run_command(local_root, ['git', 'read-tree', parent], environ=environ)
+
+        # Delete old files.
+        if exclude:
+            deleted = [prefix + p for p in list_files(local_root, parent, rel_dest) if not matches_exclude(p, exclude)]
+            for paths_group in chunk(deleted, 500):
+                run_command(local_root, ['git', 'update-index', '--force-remove', '--'] + paths_group, environ=environ)
+
+        # Add new files.
+        add_directory(local_root, source, prefix, environ)
+
+        return run_command(local_root, ['git', 'write-tree'], environ=environ).strip()
+
+
+def push_tree(local_root, remote, branch, parent, tree, versions):
+    """Commit a tree on top of a parent commit and attempt to push it to a branch on the remote repository.
+
+    :raise CalledProcessError: Unhandled git command failure.
+    :raise GitError: Bad git config for commits or push failed for a reason other than a race condition.
+
+    :param str local_root: Local path to git root directory.
+    :param str remote: The git remote to push to.
+    :param str branch: Branch to update on the remote.
+    :param str parent: Commit SHA the branch pointed to.
+    :param str tree: Tree SHA from write_tree().
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+    :return: If push succeeded.
+    :rtype: bool
+    """
+    log = logging.getLogger(__name__)
+
+    # Check if there are no changes.
+    output = run_command(local_root, ['git', 'diff-tree', '-r', '-z', '--name-status', parent, tree])
+    fields = output.split('\0')
+    changes = list(zip(fields[::2], fields[1::2]))
+    if not changes:
+        log.info('No changes to commit.')
+        return True
+    if not is_significant(changes):
+        log.info('No significant changes to commit.')
+        return True
+
+    # Commit.
+    with TempDir() as temp_dir:
+        commit_message_file = os.path.join(temp_dir, 'message.txt')
+        with open(commit_message_file, 'w') as handle:
+            handle.write(commit_message(versions))
+        try:
+            sha = run_command(local_root, ['git', 'commit-tree', tree, '-p', parent, '-F', commit_message_file])
+        except CalledProcessError as exc:
+            raise GitError('Failed to commit locally.', exc.output)
+
+    # Push.
+    try:
+        run_command(local_root, ['git', 'push', remote, '{}:refs/heads/{}'.format(sha.strip(), branch)])
+    except CalledProcessError as exc:
+        if '[rejected]' in exc.output and ('(fetch first)' in exc.output or '(non-fast-forward)' in exc.output):
+            log.debug('Remote has changed since fetching the branch. Must retry.')
+            return False
+        raise GitError('Failed to push to remote.', exc.output)
+
+    log.info('Successfully pushed to remote repository.')
+    return True
@@ -1,15 +1,26 @@
 """Common objects used throughout the project."""
 
 import atexit
+import contextlib
+import errno
 import functools
+import hashlib
+import json
 import logging
 import os
 import shutil
 import tempfile
+import time
 import weakref
 
 import click
 
+try:
+    import fcntl
+except ImportError:  # Windows.
+    import msvcrt
+    fcntl = None
+
 
 class Config(object):
     """The global configuration and state of the running program."""
@@ -20,18 +31,31 @@ class Config(object):
         self._program_state = dict()
 
         # Booleans.
+        self.archive = False
         self.banner_greatest_tag = False
         self.banner_recent_tag = False
+        self.copy_root = False
+        self.dedup_trees = False
         self.greatest_tag = False
+        self.incremental = False
         self.invert = False
+        self.manifest = False
         self.no_colors = False
         self.no_local_conf = False
+        self.no_worktree = False
         self.recent_tag = False
+        self.refresh_cache = False
+        self.reproducible = False
         self.show_banner = False
+        self.skip_unchanged = False
+        self.static_conf = False
+        self.versions_json = False
 
         # Strings.
         self.banner_main_ref = 'master'
+        self.cache_dir = None
         self.chdir = None
+        self.dedup_static = None
         self.git_root = None
         self.local_conf = None
         self.priority = None
@@ -39,6 +63,8 @@ class Config(object):
         self.root_ref = 'master'
 
         # Tuples.
+        self.cache_max_age = tuple()
+        self.cache_max_size = tuple()
         self.grm_exclude = tuple()
         self.overflow = tuple()
         self.sort = tuple()
@@ -46,6 +72,7 @@ class Config(object):
         self.whitelist_tags = tuple()
 
         # Integers.
+        self.prefetch = 0
         self.verbose = 0
 
     def __contains__(self, item):
@@ -167,3 +194,218 @@ class TempDir(object):
         shutil.rmtree(self.name, onerror=lambda *a: os.chmod(a[1], __import__('stat').S_IWRITE) or os.unlink(a[1]))
         if os.path.exists(self.name):
             raise IOError(17, "File exists: '{}'".format(self.name))
+
+
+@contextlib.contextmanager
+def file_lock(path):
+    """Hold an exclusive lock on a file (created if missing) while in context. Blocks until other processes release it.
+
+    :param str path: Path to the lock file.
+    """
+    with open(path, 'a') as handle:
+        if fcntl:
+            fcntl.flock(handle.fileno(), fcntl.LOCK_EX)
+        else:
+            handle.seek(0)
+            msvcrt.locking(handle.fileno(), msvcrt.LK_LOCK, 1)
+        yield  # Lock is released when the file is closed.
+
+
+def makedirs(path):
+    """Create a directory and its parents. Doesn't fail if another process created it first.
+
+    :param str path: Directory to create.
+    """
+    try:
+        os.makedirs(path)
+    except OSError as exc:
+        if exc.errno != errno.EEXIST or not os.path.isdir(path):
+            raise
+
+
+def atomic_write(path, contents):
+    """Write a file by renaming a temporary file in the same directory so readers never see partial contents.
+
+    :param str path: Path to the file.
+    :param bytes contents: File contents.
+    """
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp')
+    with os.fdopen(handle, 'wb') as temp_file:
+        temp_file.write(contents)
+    if hasattr(os, 'replace'):
+        os.replace(temp_path, path)
+    else:  # Python 2.7.
+        if os.name == 'nt' and os.path.exists(path):
+            os.remove(path)
+        os.rename(temp_path, path)
+
+
+class Cache(object):
+    """Directory of files shared by concurrent runs. Evicts least recently used files over size and age budgets.
+
+    Files are named after the SHA1 of their key. Each hit updates the file's modification time which is used as its last
+    use. Files are written atomically so they can be read without locking. The lock file serializes pruning and updates
+    of the hit/miss statistics.
+
+    :ivar str name: Name of the cache (subdirectory of the cache directory).
+    :ivar str path: Directory with cached files.
+    :ivar int hits: Number of get() calls that found a file since opening.
+    :ivar int misses: Number of get() calls that didn't find a file since opening.
+    """
+
+    LOCK_FILE = '.lock'
+    STATS_FILE = '.stats.json'
+
+    def __init__(self, cache_dir, name):
+        """Constructor.
+
+        :param str cache_dir: Directory with all caches.
+        :param str name: Name of the cache (subdirectory of the cache directory). Created if it doesn't exist.
+        """
+        self.name = name
+        self.path = os.path.join(cache_dir, name)
+        self.hits = 0
+        self.misses = 0
+        makedirs(self.path)
+
+    def __enter__(self):
+        """Return self."""
+        return self
+
+    def __exit__(self, *_):
+        """Record statistics when exiting context."""
+        self.close()
+
+    def _entries(self):
+        """List cached files.
+
+        :return: Paths, sizes, and last use times of all files.
+        :rtype: list
+        """
+        entries = list()
+        for name in os.listdir(self.path):
+            if name.startswith('.'):
+                continue  # Lock file, statistics, temporary files.
+            path = os.path.join(self.path, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue  # Deleted by another process.
+            entries.append((path, stat.st_size, stat.st_mtime))
+        return entries
+
+    def clear(self):
+        """Delete all files.
+
+        :return: Number of deleted files.
+        :rtype: int
+        """
+        with file_lock(os.path.join(self.path, self.LOCK_FILE)):
+            entries = self._entries()
+            for path, _, _ in entries:
+                os.remove(path)
+        return len(entries)
+
+    def close(self):
+        """Add hits and misses since opening to the statistics file."""
+        if not self.hits and not self.misses:
+            return
+        with file_lock(os.path.join(self.path, self.LOCK_FILE)):
+            stats = self.stats()
+            stats['hits'] += self.hits
+            stats['misses'] += self.misses
+            atomic_write(os.path.join(self.path, self.STATS_FILE), json.dumps(stats, sort_keys=True).encode('utf-8'))
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        """Look up a file.
+
+        The file may be deleted by a concurrent prune() before it's opened, use read() unless that's handled.
+
+        :param str key: Identifies the file.
+
+        :return: Path to the file or None if it's not cached.
+        :rtype: str
+        """
+        path = os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest())
+        try:
+            os.utime(path, None)
+        except OSError:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return path
+
+    def read(self, key):
+        """Look up a file and read it. A file deleted by a concurrent prune() before it's read counts as a miss.
+
+        :param str key: Identifies the file.
+
+        :return: File contents or None if it's not cached.
+        :rtype: bytes
+        """
+        path = os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest())
+        try:
+            os.utime(path, None)
+            with open(path, 'rb') as handle:
+                contents = handle.read()
+        except (IOError, OSError):
+            self.misses += 1
+            return None
+        self.hits += 1
+        return contents
+
+    def put(self, key, contents):
+        """Add or replace a file.
+
+        :param str key: Identifies the file.
+        :param bytes contents: File contents.
+
+        :return: Path to the file.
+        :rtype: str
+        """
+        path = os.path.join(self.path, hashlib.sha1(key.encode('utf-8')).hexdigest())
+        atomic_write(path, contents)
+        return path
+
+    def prune(self, max_size=0, max_age=0):
+        """Delete files not used in max_age seconds, then least recently used files until the total is within max_size.
+
+        :param int max_size: Maximum total size in bytes. 0 is unlimited.
+        :param int max_age: Maximum seconds since last use. 0 is unlimited.
+
+        :return: Number of deleted files.
+        :rtype: int
+        """
+        removed = 0
+        with file_lock(os.path.join(self.path, self.LOCK_FILE)):
+            entries = sorted(self._entries(), key=lambda e: e[2])
+            total = sum(e[1] for e in entries)
+            for path, size, used in entries:
+                if (not max_age or used >= time.time() - max_age) and (not max_size or total <= max_size):
+                    break
+                os.remove(path)
+                total -= size
+                removed += 1
+        return removed
+
+    def stats(self):
+        """Read hits and misses recorded by all runs.
+
+        :return: Hits and misses.
+        :rtype: dict
+        """
+        path = os.path.join(self.path, self.STATS_FILE)
+        if not os.path.isfile(path):
+            return dict(hits=0, misses=0)
+        with open(path, 'rb') as handle:
+            return json.loads(handle.read().decode('utf-8'))
+
+    def usage(self):
+        """Count cached files.
+
+        :return: Number of files and their total size in bytes.
+        :rtype: tuple
+        """
+        entries = self._entries()
+        return len(entries), sum(e[1] for e in entries)
@@ -0,0 +1,80 @@
+"""List output files with content hashes and compare them to the previous run."""
+
+import json
+import logging
+import os
+
+from sphinxcontrib.versioning.output import file_digest
+
+MANIFEST_FILE = '.scv_manifest.json'
+
+
+def build_manifest(destination, versions):
+    """List every file in the output directory with its size and content hash, grouped by version.
+
+    Files outside of the versions' subdirectories (the root ref in the web root, shared static files) are listed under
+    "root". Paths are relative to destination using forward slashes.
+
+    :param str destination: Web root directory.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+    :return: Manifest without "changes".
+    :rtype: dict
+    """
+    by_root_dir = {r['root_dir']: dict(files=dict(), root_dir=r['root_dir'], sha=r['sha']) for r in versions.remotes}
+    manifest = dict(root=dict(files=dict()), versions={r['name']: by_root_dir[r['root_dir']] for r in versions.remotes})
+    for root, dirs, files in os.walk(destination):
+        dirs[:] = [d for d in dirs if d != '.git']
+        for path in (os.path.join(root, n) for n in files):
+            rel_path = os.path.relpath(path, destination).replace(os.sep, '/')
+            if rel_path == MANIFEST_FILE:
+                continue
+            group = by_root_dir.get(rel_path.split('/')[0], manifest['root'])
+            group['files'][rel_path] = dict(sha1=file_digest(path), size=os.path.getsize(path))
+    return manifest
+
+
+def read_manifest(destination):
+    """Read the manifest file written by a previous run.
+
+    :param str destination: Directory with MANIFEST_FILE.
+
+    :return: Parsed manifest or None if there is none.
+    :rtype: dict
+    """
+    path = os.path.join(destination, MANIFEST_FILE)
+    if not os.path.isfile(path):
+        return None
+    with open(path, 'rb') as handle:
+        return json.loads(handle.read().decode('utf-8'))
+
+
+def write_manifest(destination, manifest, previous):
+    """Write a manifest including files added, modified, and deleted compared to the previous one.
+
+    :param str destination: Directory to write MANIFEST_FILE to.
+    :param dict manifest: Manifest from build_manifest().
+    :param dict previous: Manifest of the previous run or None if there was none (all files are added).
+
+    :return: Paths of added, modified, and deleted files.
+    :rtype: dict
+    """
+    log = logging.getLogger(__name__)
+
+    def flatten(tree):
+        """All files in a manifest regardless of version."""
+        return {p: f for g in [tree['root']] + list(tree['versions'].values()) for p, f in g['files'].items()}
+    new, old = flatten(manifest), flatten(previous) if previous else dict()
+    changes = manifest['changes'] = dict(
+        added=sorted(p for p in new if p not in old),
+        deleted=sorted(p for p in old if p not in new),
+        modified=sorted(p for p in new if p in old and new[p] != old[p]),
+    )
+    if previous:
+        log.info('Output files since last run: %d added, %d modified, %d deleted.',
+                 len(changes['added']), len(changes['modified']), len(changes['deleted']))
+    else:
+        log.debug('No manifest from a previous run. All %d files are added.', len(new))
+    with open(os.path.join(destination, MANIFEST_FILE), 'wb') as handle:
+        handle.write(json.dumps(manifest, indent=1, separators=(',', ': '), sort_keys=True).encode('utf-8'))
+    return changes
@@ -0,0 +1,400 @@
+"""Post-process HTML files and directories written by sphinx-build."""
+
+import collections
+import gzip
+import hashlib
+import logging
+import os
+import re
+import shutil
+import tarfile
+import zipfile
+
+from sphinxcontrib.versioning.git import matches_exclude
+from sphinxcontrib.versioning.lib import TempDir
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+ASSET_DIRS = ('_downloads', '_images', '_static')
+COMPRESS_SUFFIXES = ('.css', '.html', '.js', '.json', '.svg', '.txt', '.xml')
+RE_RELATIVE_URL = r'(\s(?:href|src)=["\'])((?:\.\./){%d})\.\./'
+RE_URL = re.compile(r'(\s(?:href|src)=["\'])([^"\'#?:]+)')
+SHARED_STATIC = '_scv_static'
+TAR_MODES = (('.tar', 'w|'), ('.tar.gz', 'w|gz'), ('.tgz', 'w|gz'), ('.tar.bz2', 'w|bz2'), ('.tar.xz', 'w|xz'),
+             ('.tar.zst', 'w|zst'), ('.zip', 'zip'))
+
+
+def copy_root(source, destination):
+    """Copy a version built in its own subdirectory to the web root instead of building it again.
+
+    Relative URLs pointing outside of the version's directory (links to other versions from the versions sidebar and the
+    banner) are rewritten since the web root is one directory level higher than the version's subdirectory.
+
+    :param str source: Directory with the root ref's built docs (its subdirectory in destination).
+    :param str destination: Web root directory to copy to. Does not delete old files.
+    """
+    log = logging.getLogger(__name__)
+    log.debug('Copying %s to %s', source, destination)
+    patterns = dict()
+
+    for root, dirs, files in os.walk(source):
+        dirs[:] = [d for d in dirs if d != '.doctrees']
+        rel_root = os.path.relpath(root, source)
+        depth = 0 if rel_root == os.curdir else rel_root.count(os.sep) + 1
+        target_root = os.path.join(destination, rel_root)
+        if not os.path.isdir(target_root):
+            os.makedirs(target_root)
+
+        for name in files:
+            if os.path.splitext(name)[1].lower() != '.html':
+                shutil.copyfile(os.path.join(root, name), os.path.join(target_root, name))
+                continue
+            if depth not in patterns:
+                patterns[depth] = re.compile(RE_RELATIVE_URL % depth)
+            with open(os.path.join(root, name), 'rb') as handle:
+                contents = handle.read().decode('utf-8')
+            with open(os.path.join(target_root, name), 'wb') as handle:
+                handle.write(patterns[depth].sub(r'\1\2', contents).encode('utf-8'))
+
+
+def copy_tree(source, destination, exclude=None):
+    """Copy all files in a directory into another one, only writing files that are missing or have changed.
+
+    Unchanged files keep their mtime so git doesn't have to hash them again. Symlinks are copied as symlinks.
+
+    :param str source: Directory to copy from.
+    :param str destination: Directory to copy to. Created if missing.
+    :param iter exclude: Delete files in destination missing from source except those matching these glob patterns.
+        Like "git rm" in clone() nothing is deleted if this is empty.
+
+    :return: Paths (relative to destination) of files written or deleted.
+    :rtype: list
+    """
+    log = logging.getLogger(__name__)
+    log.debug('Copying %s to %s', source, destination)
+    copied, changed = set(), list()
+    for root, _, files in os.walk(source):
+        rel_root = os.path.relpath(root, source)
+        target_root = os.path.join(destination, rel_root)
+        if not os.path.isdir(target_root):
+            if os.path.lexists(target_root):
+                os.remove(target_root)
+            os.makedirs(target_root)
+        for rel_path in (os.path.normpath(os.path.join(rel_root, n)) for n in files):
+            copied.add(rel_path)
+            if not same_file(os.path.join(source, rel_path), os.path.join(destination, rel_path)):
+                copy_file(os.path.join(source, rel_path), os.path.join(destination, rel_path))
+                changed.append(rel_path)
+
+    if exclude:
+        changed.extend(remove_stale(destination, copied, exclude))
+    return changed
+
+
+def remove_stale(destination, keep, exclude):
+    """Delete files in a directory except those in keep or matching exclude. Skips .git directories.
+
+    :param str destination: Directory to delete files from.
+    :param set keep: Paths (relative to destination) of files to keep.
+    :param iter exclude: Glob patterns (relative to destination) of files or directories to keep.
+
+    :return: Paths (relative to destination) of deleted files.
+    :rtype: list
+    """
+    log = logging.getLogger(__name__)
+    removed = list()
+    for root, dirs, files in os.walk(destination):
+        dirs[:] = [d for d in dirs if d != '.git']
+        for rel_path in (os.path.normpath(os.path.join(os.path.relpath(root, destination), n)) for n in files):
+            if rel_path not in keep and not matches_exclude(rel_path.replace(os.sep, '/'), exclude):
+                log.debug('Removing stale file: %s', rel_path)
+                os.remove(os.path.join(destination, rel_path))
+                removed.append(rel_path)
+    return removed
+
+
+def copy_file(path, target):
+    """Copy one file, replacing whatever is at target. Symlinks are copied as symlinks.
+
+    :param str path: File to copy.
+    :param str target: Destination path.
+    """
+    if os.path.isdir(target) and not os.path.islink(target):
+        shutil.rmtree(target)
+    elif os.path.lexists(target) and (os.path.islink(path) or os.path.islink(target)):
+        os.remove(target)
+    if os.path.islink(path):
+        os.symlink(os.readlink(path), target)
+    else:
+        shutil.copyfile(path, target)
+
+
+def same_file(path, target):
+    """Check if two files have the same contents, comparing sizes before hashing. Symlinks compare their targets.
+
+    :param str path: First file.
+    :param str target: Second file. May not exist.
+
+    :return: If target exists with the same contents.
+    :rtype: bool
+    """
+    if os.path.islink(path) or os.path.islink(target):
+        return os.path.islink(path) and os.path.islink(target) and os.readlink(path) == os.readlink(target)
+    if not os.path.isfile(target) or os.path.getsize(path) != os.path.getsize(target):
+        return False
+    return file_digest(path) == file_digest(target)
+
+
+def file_digest(path):
+    """Hash the contents of a file.
+
+    :param str path: Path to the file.
+
+    :return: SHA1 hex digest.
+    :rtype: str
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(65536), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def precompress(directory, min_size=256):
+    """Write a gzip compressed copy (path plus .gz) of every text file so it isn't compressed for every request.
+
+    :param str directory: Directory to walk recursively.
+    :param int min_size: Skip files smaller than this many bytes, compressing them doesn't pay off.
+
+    :return: Number of compressed files written.
+    :rtype: int
+    """
+    written = 0
+    for root, _, files in os.walk(directory):
+        for name in (n for n in files if n.endswith(COMPRESS_SUFFIXES)):
+            path = os.path.join(root, name)
+            if os.path.islink(path) or os.path.getsize(path) < min_size:
+                continue
+            with open(path, 'rb') as source:
+                with gzip.GzipFile(path + '.gz', 'wb', 9, mtime=0) as handle:
+                    shutil.copyfileobj(source, handle)
+            written += 1
+    return written
+
+
+def html_references(destination):
+    """Resolve relative href/src URLs in all HTML files to local paths.
+
+    :param str destination: Directory with HTML files (searched recursively).
+
+    :return: Normalized local path of each referenced file (keys) and the HTML files referencing them (values).
+    :rtype: dict
+    """
+    references = collections.defaultdict(set)
+    for root, _, files in os.walk(destination):
+        for path in (os.path.join(root, n) for n in files if n.lower().endswith('.html')):
+            with open(path, 'rb') as handle:
+                contents = handle.read().decode('utf-8')
+            for url in (m.group(2) for m in RE_URL.finditer(contents)):
+                references[os.path.normpath(os.path.join(root, url))].add(path)
+    return references
+
+
+def rewrite_urls(html_files, rewrites):
+    """Rewrite relative href/src URLs in HTML files pointing to moved files.
+
+    :param iter html_files: Paths to HTML files to update.
+    :param dict rewrites: Normalized old paths (keys) and new paths (values) of moved files.
+    """
+    for html in html_files:
+        root = os.path.dirname(html)
+
+        def replace(match, root=root):
+            """Point URL to the new path if its file was moved."""
+            path = os.path.normpath(os.path.join(root, match.group(2)))
+            if path not in rewrites:
+                return match.group(0)
+            return match.group(1) + os.path.relpath(rewrites[path], root).replace(os.sep, '/')
+
+        with open(html, 'rb') as handle:
+            contents = handle.read().decode('utf-8')
+        with open(html, 'wb') as handle:
+            handle.write(RE_URL.sub(replace, contents).encode('utf-8'))
+
+
+def dedup_static(destination, version_dirs, mode):
+    """Store a single copy of identical static assets (_static, _images, _downloads) shared by multiple versions.
+
+    Duplicates are replaced by hardlinks or relative symlinks to the copy in SHARED_STATIC, or with mode "rewrite"
+    deleted and relative URLs pointing to them in HTML files rewritten. In rewrite mode only files referenced by HTML
+    files are deduplicated and CSS files are skipped since they may reference other files with relative URLs.
+
+    :param str destination: Web root directory. SHARED_STATIC is created in it.
+    :param iter version_dirs: Output directories of all versions (including the web root).
+    :param str mode: One of "hardlink", "symlink", or "rewrite".
+    """
+    log = logging.getLogger(__name__)
+    references = html_references(destination) if mode == 'rewrite' else None
+
+    # Group assets by their contents.
+    assets = collections.defaultdict(list)
+    for root, _, files in (w for d in version_dirs for a in ASSET_DIRS for w in os.walk(os.path.join(d, a))):
+        for path in (os.path.join(root, n) for n in files):
+            if os.path.islink(path):
+                continue
+            if references is not None and (path.lower().endswith('.css') or os.path.normpath(path) not in references):
+                continue
+            assets[file_digest(path)].append(path)
+
+    # Replace duplicates.
+    rewrites = dict()
+    for digest, paths in ((d, p) for d, p in assets.items() if len(p) > 1):
+        shared = os.path.join(destination, SHARED_STATIC, digest + os.path.splitext(paths[0])[1].lower())
+        if not os.path.isfile(shared):
+            if not os.path.isdir(os.path.dirname(shared)):
+                os.makedirs(os.path.dirname(shared))
+            shutil.copyfile(paths[0], shared)
+        log.debug('Deduplicating %d copies of %s', len(paths), shared)
+        for path in paths:
+            os.remove(path)
+            if mode == 'hardlink':
+                os.link(shared, path)
+            elif mode == 'symlink':
+                os.symlink(os.path.relpath(shared, os.path.dirname(path)), path)
+            else:
+                rewrites[os.path.normpath(path)] = shared
+
+    # Rewrite URLs in HTML files.
+    if rewrites:
+        rewrite_urls({h for p in rewrites for h in references[p]}, rewrites)
+
+
+def archive_mode(path):
+    """Determine the archive format from a file name.
+
+    :param str path: Path to the archive file.
+
+    :return: Mode for tarfile.open(), "w|zst" for zstd compressed tar files, "zip", or None if not supported.
+    :rtype: str
+    """
+    for suffix, mode in TAR_MODES:
+        if path.lower().endswith(suffix):
+            return None if mode == 'w|zst' and zstandard is None else mode
+    return None
+
+
+class DirectoryOutput(object):
+    """Write built docs straight into the destination directory.
+
+    :ivar str destination: Web root directory.
+    """
+
+    def __init__(self, destination):
+        """Constructor.
+
+        :param str destination: Web root directory.
+        """
+        self.destination = destination
+
+    def target(self, rel_dir):
+        """Directory for sphinx-build to write one version to.
+
+        :param str rel_dir: Subdirectory of the version in the web root (empty string for the web root).
+
+        :return: Path to the directory.
+        :rtype: str
+        """
+        return os.path.join(self.destination, rel_dir)
+
+    def done(self, rel_dir):
+        """Called when a version has been built into target(). Nothing to do.
+
+        :param str rel_dir: Subdirectory of the version in the web root.
+        """
+        pass
+
+    def reset(self):
+        """Called before rebuilding all versions. Nothing to do since files are overwritten."""
+        pass
+
+    def close(self):
+        """Called after all versions have been built. Nothing to do."""
+        pass
+
+
+class ArchiveOutput(object):
+    """Stream built docs into a tar or zip file one version at a time instead of keeping all of them on disk.
+
+    Each version is built into its own temporary directory which is added to the archive and deleted as soon as the
+    version is done.
+
+    :ivar str path: Path to the archive file.
+    """
+
+    def __init__(self, path):
+        """Constructor.
+
+        :param str path: Path to the archive file. Format depends on its extension (see archive_mode()).
+        """
+        self.path = path
+        self._archive = None
+        self._handles = list()
+        self._staging = dict()
+        self.reset()
+
+    def target(self, rel_dir):
+        """Create a temporary directory for sphinx-build to write one version to.
+
+        :param str rel_dir: Subdirectory of the version in the archive (empty string for the root).
+
+        :return: Path to the directory.
+        :rtype: str
+        """
+        if rel_dir not in self._staging:
+            self._staging[rel_dir] = TempDir()
+        return self._staging[rel_dir].name
+
+    def done(self, rel_dir):
+        """Add all files built into target() to the archive and delete them.
+
+        :param str rel_dir: Subdirectory of the version in the archive.
+        """
+        log = logging.getLogger(__name__)
+        source = self._staging.pop(rel_dir)
+        log.debug('Adding %s to %s as %s', source.name, self.path, rel_dir or '/')
+        for root, dirs, files in os.walk(source.name):
+            dirs.sort()
+            for name in sorted(files):
+                path = os.path.join(root, name)
+                arcname = os.path.join(rel_dir, os.path.relpath(path, source.name)).replace(os.sep, '/')
+                if isinstance(self._archive, zipfile.ZipFile):
+                    self._archive.write(path, arcname)
+                else:
+                    self._archive.add(path, arcname, recursive=False)
+        source.cleanup()
+
+    def reset(self):
+        """Start over with an empty archive. Called before rebuilding all versions."""
+        self.close()
+        mode = archive_mode(self.path)
+        if mode == 'zip':
+            self._archive = zipfile.ZipFile(self.path, 'w', zipfile.ZIP_DEFLATED)
+        elif mode == 'w|zst':
+            self._handles.append(open(self.path, 'wb'))
+            self._handles.insert(0, zstandard.ZstdCompressor().stream_writer(self._handles[0]))
+            self._archive = tarfile.open(fileobj=self._handles[0], mode='w|')
+        else:
+            self._archive = tarfile.open(self.path, mode)
+
+    def close(self):
+        """Finish writing the archive and delete leftover temporary directories."""
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+        while self._handles:
+            self._handles.pop(0).close()
+        while self._staging:
+            self._staging.popitem()[1].cleanup()
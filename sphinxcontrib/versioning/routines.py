@@ -1,16 +1,380 @@
 """Functions that perform main tasks. Code is here instead of in __main__.py."""
 
+import collections
+import hashlib
 import json
 import logging
 import os
 import re
+import shutil
 import subprocess
+import tempfile
+import threading
+import time
+
+from sphinx import __version__ as sphinx_version
+
+from sphinxcontrib.versioning import __version__
+from sphinxcontrib.versioning.git import (
+    export, fetch_commits, filter_and_date, get_tree_sha, GitError, list_files, list_remote, show_file, verify_commits,
+)
+from sphinxcontrib.versioning.lib import atomic_write, Cache, Config, file_lock, HandledError, TempDir
+from sphinxcontrib.versioning.manifest import build_manifest, read_manifest, write_manifest
+from sphinxcontrib.versioning.output import ArchiveOutput, copy_root, dedup_static, DirectoryOutput, SHARED_STATIC
+from sphinxcontrib.versioning.sphinx_ import build, read_config, read_config_static, read_scv_config
+from sphinxcontrib.versioning.store import Store
+
+INCREMENTAL_FILE = '.scv_state.json'
+RE_INVALID_FILENAME = re.compile(r'[^0-9A-Za-z.-]')
+RUNTIME_SETTINGS = ('cache_dir', 'cache_max_age', 'cache_max_size', 'chdir', 'git_root', 'local_conf', 'no_colors',
+                    'no_local_conf', 'prefetch', 'refresh_cache', 'skip_unchanged', 'verbose')
+STATE_FILE = 'sphinxcontrib_versioning_state.json'
+VERSIONS_JSON = 'versions.json'
 
-from sphinxcontrib.versioning.git import export, fetch_commits, filter_and_date, GitError, list_remote
-from sphinxcontrib.versioning.lib import Config, HandledError, TempDir
-from sphinxcontrib.versioning.sphinx_ import build, read_config
 
-RE_INVALID_FILENAME = re.compile(r'[^0-9A-Za-z.-]')
+class ExportQueue(object):
+    """Export commits to a directory ahead of the code using them and delete them after their last use.
+
+    With prefetch disabled (0) all commits are exported up front and kept until exported_root is deleted. Otherwise a
+    background thread exports commits in order of first use while at most `prefetch` exported trees exist at a time,
+    overlapping git I/O with sphinx-build running on previous commits. Uses of the same SHA must be adjacent in `shas`.
+    Commits are exported to a temporary sibling directory and renamed when complete, so an existing directory is never
+    a partial export (e.g. of a closed queue).
+
+    :ivar str exported_root: Directory with exported commits as subdirectories.
+    :ivar int prefetch: Maximum number of exported trees on disk at a time. 0 is unlimited and never deletes.
+    """
+
+    def __init__(self, local_root, exported_root, shas, prefetch=0):
+        """Constructor.
+
+        :param str local_root: Local path to git root directory.
+        :param str exported_root: Directory to export commits to.
+        :param iter shas: Commit SHAs in the order they'll be used, once for every use.
+        :param int prefetch: Maximum number of exported trees on disk at a time. 0 is unlimited and never deletes.
+        """
+        self.exported_root = exported_root
+        self.prefetch = prefetch
+        self._closed = False
+        self._errors = dict()
+        self._remaining = collections.Counter(shas)
+        self._exported = collections.OrderedDict((s, threading.Event()) for s in shas)
+        self._slots = threading.Semaphore(prefetch) if prefetch else None
+        self._thread = None
+        if not prefetch:
+            self._run(local_root)
+            return
+        self._thread = threading.Thread(target=self._run, args=(local_root,))
+        self._thread.daemon = True
+        self._thread.start()
+
+    def _run(self, local_root):
+        """Export all commits. Blocks until a slot is available if prefetching.
+
+        :param str local_root: Local path to git root directory.
+        """
+        log = logging.getLogger(__name__)
+        for sha, event in self._exported.items():
+            if self._slots:
+                self._slots.acquire()
+            if self._closed:
+                return
+            target = os.path.join(self.exported_root, sha)
+            try:
+                if not os.path.isdir(target):
+                    log.debug('Exporting %s to temporary directory.', sha)
+                    partial = tempfile.mkdtemp(prefix=sha + '.', dir=self.exported_root)
+                    try:
+                        export(local_root, sha, partial)
+                        os.rename(partial, target)
+                    finally:
+                        shutil.rmtree(partial, True)
+            except Exception as exc:  # pylint: disable=broad-except
+                self._errors[sha] = exc  # Raised by get() in the main thread.
+            finally:
+                event.set()
+
+    def close(self):
+        """Stop exporting commits in the background. Waits for an export in progress to finish."""
+        self._closed = True
+        if self._slots:
+            self._slots.release()
+        if self._thread:
+            self._thread.join()
+
+    def get(self, sha):
+        """Wait for a commit to be exported.
+
+        :raise CalledProcessError: If exporting failed (or any other exception raised while exporting).
+
+        :param str sha: Commit SHA.
+
+        :return: Path to exported commit.
+        :rtype: str
+        """
+        self._exported[sha].wait()
+        if sha in self._errors:
+            raise self._errors[sha]
+        return os.path.join(self.exported_root, sha)
+
+    def release(self, sha):
+        """Mark one use of an exported commit as done. Deletes it after its last use if prefetching.
+
+        :param str sha: Commit SHA.
+        """
+        self._remaining[sha] -= 1
+        if self._remaining[sha] > 0 or not self._slots:
+            return
+        logging.getLogger(__name__).debug('Removing exported commit %s.', sha)
+        shutil.rmtree(os.path.join(self.exported_root, sha), True)
+        self._slots.release()
+
+
+def adjacent_order(remotes, key, first):
+    """Sort remotes so that those with the same key are next to each other. Otherwise keeps the original order.
+
+    :param iter remotes: List of dicts from Versions.remotes.
+    :param function key: Get the grouping key of a remote.
+    :param first: Key of the group to put at the beginning.
+
+    :return: Sorted remotes.
+    :rtype: list
+    """
+    positions = dict()
+    for remote in remotes:
+        positions.setdefault(key(remote), len(positions))
+    return sorted(remotes, key=lambda r: (key(r) != first, positions[key(r)]))
+
+
+def fingerprint(remotes, *args):
+    """Hash all inputs of a run: remote branches/tags, settings affecting output, arguments, and tool versions.
+
+    :param iter remotes: Output of list_remote().
+    :param iter args: Additional values identifying the run (e.g. command line arguments).
+
+    :return: SHA1 hex digest.
+    :rtype: str
+    """
+    settings = {k: v for k, v in Config.from_context() if k not in RUNTIME_SETTINGS}
+    inputs = dict(args=args, remotes=sorted(remotes), settings=settings, versions=[__version__, sphinx_version])
+    return hashlib.sha1(json.dumps(inputs, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+def read_state(local_root):
+    """Read fingerprints recorded by previous successful runs from the state file in the local .git directory.
+
+    :param str local_root: Local path to git root directory.
+
+    :return: Fingerprints (values) by command and destination (keys).
+    :rtype: dict
+    """
+    path = os.path.join(local_root, '.git', STATE_FILE)
+    if not os.path.isfile(path):
+        return dict()
+    with open(path, 'rb') as handle:
+        try:
+            return json.loads(handle.read().decode('utf-8'))
+        except ValueError:
+            logging.getLogger(__name__).warning('Ignoring corrupt state file: %s', path)
+            return dict()
+
+
+def write_fingerprint(local_root, key, value):
+    """Record the fingerprint of a successful run in the state file in the local .git directory.
+
+    The file is replaced atomically so concurrent runs never read a missing or partial file, and updates are locked so
+    they don't drop each other's fingerprints.
+
+    :param str local_root: Local path to git root directory.
+    :param str key: Identifies the command and its destination.
+    :param str value: Output of fingerprint().
+    """
+    path = os.path.join(local_root, '.git', STATE_FILE)
+    with file_lock(path + '.lock'):
+        state = read_state(local_root)
+        state[key] = value
+        atomic_write(path, json.dumps(state, indent=1, separators=(',', ': '), sort_keys=True).encode('utf-8'))
+
+
+def ref_fingerprints(local_root, versions):
+    """Hash the inputs of every version's output so unchanged versions don't have to be built again.
+
+    Without the versions_json option every page links to every other version so the list of all versions (names,
+    root_dir, found_docs, etc.) is part of each fingerprint. The build sub command turns versions_json on for
+    incremental builds so pages read the list from versions.json instead and adding a version doesn't change them.
+    Docs are identified by their commit, or by the git tree SHA of their docs directory with the dedup_trees option
+    (same caveat as in group_identical()).
+
+    :param str local_root: Local path to git root directory.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+    :return: SHA1 hex digests (values) by ref name (keys).
+    :rtype: dict
+    """
+    config = Config.from_context()
+    significant = (versions.greatest_tag_remote, versions.recent_branch_remote, versions.recent_remote,
+                   versions.recent_tag_remote)
+    shared = [fingerprint(list())]
+    if not config.versions_json:
+        menu = [[r['name'], r['kind'], r['root_dir'], r['found_docs'], r['master_doc']] for r in versions.remotes]
+        shared.append(menu)
+    fingerprints = dict()
+
+    for remote in versions.remotes:
+        key = remote['sha']
+        if config.dedup_trees:
+            try:
+                key = get_tree_sha(local_root, remote['sha'], os.path.dirname(remote['conf_rel_path']))
+            except GitError:
+                pass
+        inputs = shared + [key, remote['conf_rel_path'], config.reproducible and remote['date']]
+        inputs.append([remote is r for r in significant])  # Context variables like scv_is_recent_ref.
+        fingerprints[remote['name']] = hashlib.sha1(json.dumps(inputs).encode('utf-8')).hexdigest()
+
+    return fingerprints
+
+
+def write_versions_json(target, versions):
+    """Write versions.json for versions.js to render the versions sidebar and banner links in the browser.
+
+    Lists every version's name, kind, root_dir, and master_doc. Sets of documents are listed once and referenced by
+    index since most versions have the same documents as some other version.
+
+    :param str target: Web root directory.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    """
+    docs = dict()
+    listed = list()
+    for remote in versions.remotes:
+        found_docs = tuple(sorted(remote['found_docs']))
+        listed.append(dict(
+            docs=docs.setdefault(found_docs, len(docs)),
+            kind=remote['kind'],
+            master_doc=remote['master_doc'],
+            name=remote['name'],
+            root_dir=remote['root_dir'],
+        ))
+    contents = dict(docs=[list(d) for d, _ in sorted(docs.items(), key=lambda i: i[1])], versions=listed)
+    with open(os.path.join(target, VERSIONS_JSON), 'wb') as handle:
+        handle.write(json.dumps(contents, sort_keys=True, separators=(',', ':')).encode('utf-8'))
+
+
+def read_incremental_state(destination):
+    """Read fingerprints and root directories of versions from a previous incremental run.
+
+    Versions whose root directories no longer exist in destination are ignored.
+
+    :param str destination: Web root directory of the previous run.
+
+    :return: Dicts with fingerprint and root_dir (values) by ref name (keys).
+    :rtype: dict
+    """
+    path = os.path.join(destination, INCREMENTAL_FILE)
+    if not os.path.isfile(path):
+        return dict()
+    with open(path, 'rb') as handle:
+        try:
+            refs = json.loads(handle.read().decode('utf-8'))['refs']
+        except (KeyError, ValueError):
+            logging.getLogger(__name__).warning('Ignoring corrupt state file: %s', path)
+            return dict()
+    return {n: r for n, r in refs.items() if os.path.isdir(os.path.join(destination, r['root_dir']))}
+
+
+def write_incremental_state(destination, versions, fingerprints):
+    """Record fingerprints and root directories of all built versions for the next incremental run.
+
+    :param str destination: Web root directory.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param dict fingerprints: Output of ref_fingerprints().
+    """
+    refs = {r['name']: dict(fingerprint=fingerprints[r['name']], root_dir=r['root_dir']) for r in versions.remotes}
+    with open(os.path.join(destination, INCREMENTAL_FILE), 'wb') as handle:
+        handle.write(json.dumps(dict(refs=refs), indent=1, separators=(',', ': '), sort_keys=True).encode('utf-8'))
+
+
+def open_caches(cache_dir):
+    """Open the store and every file cache (subdirectory) in the cache directory.
+
+    :param str cache_dir: Directory with all caches.
+
+    :return: Store instance followed by lib.Cache instances. Close them when done.
+    :rtype: list
+    """
+    names = [n for n in sorted(os.listdir(cache_dir)) if os.path.isdir(os.path.join(cache_dir, n))]
+    return [Store(cache_dir)] + [Cache(cache_dir, n) for n in names]
+
+
+def cache_usage(cache_dir):
+    """List usage and hit/miss statistics of every cache. The store has one entry per kind (e.g. "store:config").
+
+    :param str cache_dir: Directory with all caches.
+
+    :return: Tuples of name, number of entries, size in bytes, hits, and misses.
+    :rtype: list
+    """
+    rows = list()
+    caches = open_caches(cache_dir)
+    try:
+        usage, stats = caches[0].usage(), caches[0].stats()
+        for kind in sorted(set(usage) | set(stats)):
+            counts = stats.get(kind, dict(hits=0, misses=0))
+            rows.append(('store:' + kind, ) + usage.get(kind, (0, 0)) + (counts['hits'], counts['misses']))
+        for cache in caches[1:]:
+            counts = cache.stats()
+            rows.append((cache.name, ) + cache.usage() + (counts['hits'], counts['misses']))
+    finally:
+        for cache in caches:
+            cache.close()
+    return rows
+
+
+def cache_budgets(values):
+    """Parse the cache_max_age or cache_max_size setting: a number for all caches and/or NAME=NUMBER for one cache.
+
+    :raise ValueError: On values that aren't numbers.
+
+    :param values: Integer, string, or iterable of strings (e.g. ('512', 'jinja2=16')).
+
+    :return: Budgets (values) by cache name (keys). The None key has the budget of all other caches.
+    :rtype: dict
+    """
+    budgets = {None: 0}
+    values = values if isinstance(values, (list, tuple)) else (values, )
+    for value in values:
+        name, _, number = str(value).rpartition('=')
+        if not number.strip().isdigit():
+            raise ValueError('Budget must be a number or NAME=NUMBER, got "{}".'.format(value))
+        budgets[name.strip() or None] = int(number)
+    return budgets
+
+
+def prune_caches(cache_dir, max_size, max_age, clear=False):
+    """Delete least recently used entries of every cache over its budget. Budgets apply to each cache on its own.
+
+    :raise HandledError: On invalid budgets.
+
+    :param str cache_dir: Directory with all caches.
+    :param iter max_size: Maximum size of each cache in MiB (see cache_budgets()). 0 is unlimited.
+    :param iter max_age: Maximum days since an entry was last used (see cache_budgets()). 0 is unlimited.
+    :param bool clear: Delete everything instead.
+
+    :return: Number of deleted entries.
+    :rtype: int
+    """
+    try:
+        sizes, ages = cache_budgets(max_size), cache_budgets(max_age)
+    except ValueError as exc:
+        logging.getLogger(__name__).error('Invalid cache budget: %s', exc)
+        raise HandledError
+    removed = 0
+    for cache in open_caches(cache_dir):
+        size, age = sizes.get(cache.name, sizes[None]), ages.get(cache.name, ages[None])
+        try:
+            removed += cache.clear() if clear else cache.prune(size * 1024 ** 2, age * 24 * 60 * 60)
+        finally:
+            cache.close()
+    return removed
 
 
 def read_local_conf(local_conf):
@@ -26,7 +390,7 @@ def read_local_conf(local_conf):
     # Attempt to read.
     log.info('Reading config from %s...', local_conf)
     try:
-        config = read_config(os.path.dirname(local_conf), '<local>')
+        config = read_scv_config(local_conf)
     except HandledError:
         log.warning('Unable to read file, continuing with only CLI args.')
         return dict()
@@ -60,23 +424,30 @@ def gather_git_info(root, conf_rel_paths, whitelist_branches, whitelist_tags):
         raise HandledError
     log.info('Found: %s', ' '.join(i[1] for i in remotes))
 
-    # Filter and date.
-    try:
+    # Filter and date. Commits never change so results of previous runs are reused. None means no docs.
+    with Store.from_context() as store:
+        stored = {i[0]: store.get('dates', [i[0], conf_rel_paths], False) for i in remotes}
+        missing = [s for s, v in stored.items() if v is False]
         try:
-            dates_paths = filter_and_date(root, conf_rel_paths, (i[0] for i in remotes))
-        except GitError:
-            log.info('Need to fetch from remote...')
-            fetch_commits(root, remotes)
             try:
-                dates_paths = filter_and_date(root, conf_rel_paths, (i[0] for i in remotes))
-            except GitError as exc:
-                log.error(exc.message)
-                log.error(exc.output)
-                raise HandledError
-    except subprocess.CalledProcessError as exc:
-        log.debug(json.dumps(dict(command=exc.cmd, cwd=root, code=exc.returncode, output=exc.output)))
-        log.error('Failed to get dates for all remote commits.')
-        raise HandledError
+                verify_commits(root, [s for s, v in stored.items() if v])
+                dates_paths = filter_and_date(root, conf_rel_paths, missing)
+            except GitError:
+                log.info('Need to fetch from remote...')
+                fetch_commits(root, remotes)
+                try:
+                    dates_paths = filter_and_date(root, conf_rel_paths, missing)
+                except GitError as exc:
+                    log.error(exc.message)
+                    log.error(exc.output)
+                    raise HandledError
+        except subprocess.CalledProcessError as exc:
+            log.debug(json.dumps(dict(command=exc.cmd, cwd=root, code=exc.returncode, output=exc.output)))
+            log.error('Failed to get dates for all remote commits.')
+            raise HandledError
+        for sha in missing:
+            store.set('dates', [sha, conf_rel_paths], dates_paths.get(sha))
+    dates_paths.update((s, v) for s, v in stored.items() if v)
     filtered_remotes = [[i[0], i[1], i[2], ] + dates_paths[i[0]] for i in remotes if i[0] in dates_paths]
     log.info('With docs: %s', ' '.join(i[1] for i in filtered_remotes))
     if not whitelist_branches and not whitelist_tags:
@@ -97,7 +468,174 @@ def gather_git_info(root, conf_rel_paths, whitelist_branches, whitelist_tags):
     return whitelisted_remotes
 
 
-def pre_build(local_root, versions):
+def read_static_configs(local_root, versions):
+    """Read found_docs and master_doc for all versions straight from git objects without exporting or running Sphinx.
+
+    :param str local_root: Local path to git root directory.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+
+    :return: Config values (from sphinx_.read_config_static()) for each supported commit. SHA keys.
+    :rtype: dict
+    """
+    log = logging.getLogger(__name__)
+    overflow = Config.from_context().overflow
+    configs = dict()
+
+    for remote in versions.remotes:
+        if remote['sha'] in configs:
+            continue
+        try:
+            contents = show_file(local_root, remote['sha'], remote['conf_rel_path'])
+            file_names = list_files(local_root, remote['sha'], os.path.dirname(remote['conf_rel_path']))
+        except GitError as exc:
+            log.debug(exc.message)
+            log.debug(exc.output)
+            continue
+        config = read_config_static(contents, file_names, overflow)
+        if config is None:
+            log.debug('Unable to read config statically for %s, falling back to running Sphinx.', remote['name'])
+            continue
+        log.debug('Read config statically for: %s', remote['name'])
+        configs[remote['sha']] = config
+
+    return configs
+
+
+def probe_key(store, local_root, remote):
+    """Identify the inputs of reading a version's Sphinx config: docs, conf.py name, sphinx-build args, tool versions.
+
+    The docs directory (of conf.py) is identified by its git tree SHA so different commits with the same docs share
+    results. Tree SHAs are stored too since they never change for a commit.
+
+    :param sphinxcontrib.versioning.store.Store store: Metadata of previous runs.
+    :param str local_root: Local path to git root directory.
+    :param dict remote: Version from Versions.remotes.
+
+    :return: Key for Store.get() and Store.set().
+    :rtype: list
+    """
+    rel_dir = os.path.dirname(remote['conf_rel_path'])
+    tree = store.get('tree', [remote['sha'], rel_dir])
+    if tree is None:
+        try:
+            tree = get_tree_sha(local_root, remote['sha'], rel_dir)
+        except GitError as exc:
+            log = logging.getLogger(__name__)
+            log.debug(exc.message)
+            log.debug(exc.output)
+            tree = remote['sha']
+        store.set('tree', [remote['sha'], rel_dir], tree)
+    conf_name = os.path.basename(remote['conf_rel_path'])
+    return [tree, conf_name, list(Config.from_context().overflow), __version__, sphinx_version]
+
+
+def read_stored_configs(store, local_root, versions, root_remote):
+    """Read found_docs and master_doc of versions probed by previous runs. For the root ref the files it writes too.
+
+    :param sphinxcontrib.versioning.store.Store store: Metadata of previous runs.
+    :param str local_root: Local path to git root directory.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param dict root_remote: The root ref from Versions.remotes.
+
+    :return: Config values (like read_static_configs()) for each commit found in the store. SHA keys.
+    :rtype: dict
+    """
+    configs = dict()
+    for remote in versions.remotes:
+        config = store.get('config', probe_key(store, local_root, remote))
+        if config is None:
+            continue
+        config['found_docs'] = tuple(config['found_docs'])
+        if remote['sha'] == root_remote['sha']:
+            config['root_files'] = store.get('root_files', probe_key(store, local_root, remote))
+            if config['root_files'] is None:
+                continue
+        logging.getLogger(__name__).debug('Read config from store for: %s', remote['name'])
+        configs[remote['sha']] = config
+    return configs
+
+
+def probe_config(exports, store, local_root, remote):
+    """Read found_docs and master_doc of an exported version by partially running sphinx-build.
+
+    Reuses the result of another version with the same docs (see probe_key()) if there is one.
+
+    :raise HandledError: If sphinx-build fails. Will be logged before raising.
+
+    :param ExportQueue exports: Exported commits.
+    :param sphinxcontrib.versioning.store.Store store: Metadata of previous runs.
+    :param str local_root: Local path to git root directory.
+    :param dict remote: Version from Versions.remotes.
+
+    :return: Config values with at least found_docs and master_doc.
+    :rtype: dict
+    """
+    key = probe_key(store, local_root, remote)
+    try:
+        source = os.path.dirname(os.path.join(exports.get(remote['sha']), remote['conf_rel_path']))
+        config = store.get('config', key)
+        if config is None:
+            logging.getLogger(__name__).debug('Partially running sphinx-build to read configuration for: %s',
+                                              remote['name'])
+            config = read_config(source, remote['name'])
+            store.set('config', key, {k: config[k] for k in ('found_docs', 'master_doc')})
+    finally:
+        exports.release(remote['sha'])
+    return config
+
+
+def pre_build_root(exports, versions, root_remote, static_configs):
+    """Build the root ref in a temporary directory and list the file names sphinx-build wrote.
+
+    :param ExportQueue exports: Exported commits.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param dict root_remote: The root ref from Versions.remotes.
+    :param dict static_configs: Return value of read_static_configs().
+
+    :return: Names of top-level files and directories.
+    :rtype: list
+    """
+    if root_remote['sha'] in static_configs:
+        return list(static_configs[root_remote['sha']]['root_files'])
+    with TempDir() as temp_dir:
+        logging.getLogger(__name__).debug('Building root (before setting root_dirs) in temp dir: %s', temp_dir)
+        source = os.path.dirname(os.path.join(exports.get(root_remote['sha']), root_remote['conf_rel_path']))
+        try:
+            build(source, temp_dir, versions, root_remote['name'], True)
+        finally:
+            exports.release(root_remote['sha'])
+        return os.listdir(temp_dir)
+
+
+def assign_root_dirs(versions, existing, root_dirs):
+    """Set root_dir of all versions to a unique directory name based on the ref name.
+
+    Root directories from the previous run are kept (reserved before naming new versions) unless they now collide with
+    files of the root ref.
+
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param list existing: Names of top-level files and directories already taken. Updated in place.
+    :param dict root_dirs: Root directories (values) of ref names (keys) from the previous run.
+    """
+    log = logging.getLogger(__name__)
+    kept = dict()
+    for remote in versions.remotes:
+        root_dir = root_dirs.get(remote['name'])
+        if root_dir and root_dir not in existing:
+            kept[remote['name']] = root_dir
+            existing.append(root_dir)
+    for remote in versions.remotes:
+        root_dir = kept.get(remote['name'])
+        if not root_dir:
+            root_dir = RE_INVALID_FILENAME.sub('_', remote['name'])
+            while root_dir in existing:
+                root_dir += '_'
+            existing.append(root_dir)
+        remote['root_dir'] = root_dir
+        log.debug('%s root directory is %s', remote['name'], root_dir)
+
+
+def pre_build(local_root, versions, root_dirs=None):
     """Build docs for all versions to determine root directory and master_doc names.
 
     Need to build docs to (a) avoid filename collision with files from root_ref and branch/tag names and (b) determine
@@ -105,81 +643,260 @@ def pre_build(local_root, versions):
     versions).
 
     Exports all commits into a temporary directory and returns the path to avoid re-exporting during the final build.
+    With the static_conf option commits whose conf.py can be read statically are neither exported nor built here. The
+    same goes for commits whose results are in the store from a previous run with the cache_dir option. With the
+    prefetch option commits are exported in the background and deleted as soon as they're no longer needed.
 
     :param str local_root: Local path to git root directory.
     :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param dict root_dirs: Keep these root directories (values) of ref names (keys) from the previous run if possible.
 
     :return: Tempdir path with exported commits as subdirectories.
     :rtype: str
     """
     log = logging.getLogger(__name__)
     exported_root = TempDir(True).name
+    root_remote = versions[Config.from_context().root_ref]
+    store = Store.from_context()
+    static_configs = read_stored_configs(store, local_root, versions, root_remote)
+    if Config.from_context().static_conf:
+        static_configs.update(read_static_configs(local_root, versions))
+
+    # Start exporting all commits not read statically, root first.
+    pending = adjacent_order(
+        [r for r in versions.remotes if r['sha'] not in static_configs], lambda r: r['sha'], root_remote['sha']
+    )
+    shas = [r['sha'] for r in pending]
+    if root_remote['sha'] not in static_configs:
+        shas.insert(0, root_remote['sha'])
+    exports = ExportQueue(local_root, exported_root, shas, Config.from_context().prefetch)
 
-    # Extract all.
-    for sha in {r['sha'] for r in versions.remotes}:
-        target = os.path.join(exported_root, sha)
-        log.debug('Exporting %s to temporary directory.', sha)
-        export(local_root, sha, target)
+    try:
+        # Build root.
+        existing = pre_build_root(exports, versions, root_remote, static_configs)
+        if root_remote['sha'] not in static_configs:
+            store.set('root_files', probe_key(store, local_root, root_remote), existing)
+        if Config.from_context().dedup_static:
+            existing.append(SHARED_STATIC)
+
+        # Define root_dir for all versions to avoid file name collisions.
+        assign_root_dirs(versions, existing, root_dirs or dict())
+
+        # Get found_docs and master_doc values for all versions.
+        for remote in [r for r in versions.remotes if r['sha'] in static_configs] + pending:
+            if remote['sha'] in static_configs:
+                config = static_configs[remote['sha']]
+            else:
+                try:
+                    config = probe_config(exports, store, local_root, remote)
+                except HandledError:
+                    log.warning('Skipping. Will not be building: %s', remote['name'])
+                    versions.remotes.pop(versions.remotes.index(remote))
+                    continue
+            remote['found_docs'] = config['found_docs']
+            remote['master_doc'] = config['master_doc']
+    finally:
+        exports.close()
+        store.close()
 
-    # Build root.
-    remote = versions[Config.from_context().root_ref]
-    with TempDir() as temp_dir:
-        log.debug('Building root (before setting root_dirs) in temporary directory: %s', temp_dir)
-        source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
-        build(source, temp_dir, versions, remote['name'], True)
-        existing = os.listdir(temp_dir)
+    return exported_root
+
+
+def group_identical(local_root, versions, by_tree):
+    """Group versions whose documentation input is identical so Sphinx only has to read/parse documents once per group.
+
+    Versions pointing to the same commit are always grouped. Optionally also group versions whose docs directories
+    (the directory of conf.py) have the same git tree SHA. Only safe if docs don't use files outside of that directory.
+
+    :param str local_root: Local path to git root directory.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param bool by_tree: Also group by git tree SHA of the docs directory.
+
+    :return: The group leader (first remote in group) for every remote. Keys are remote ids, values are remote dicts.
+    :rtype: dict
+    """
+    log = logging.getLogger(__name__)
+    leaders = dict()
+    by_key = dict()
 
-    # Define root_dir for all versions to avoid file name collisions.
     for remote in versions.remotes:
-        root_dir = RE_INVALID_FILENAME.sub('_', remote['name'])
-        while root_dir in existing:
-            root_dir += '_'
-        remote['root_dir'] = root_dir
-        log.debug('%s root directory is %s', remote['name'], root_dir)
-        existing.append(root_dir)
+        key = remote['sha']
+        if by_tree:
+            try:
+                key = get_tree_sha(local_root, remote['sha'], os.path.dirname(remote['conf_rel_path']))
+            except GitError as exc:
+                log.debug(exc.message)
+                log.debug(exc.output)
+        leader = by_key.setdefault(key, remote)
+        leaders[remote['id']] = leader
+        if leader is not remote:
+            log.debug('%s has the same docs as %s.', remote['name'], leader['name'])
 
-    # Get found_docs and master_doc values for all versions.
-    for remote in list(versions.remotes):
-        log.debug('Partially running sphinx-build to read configuration for: %s', remote['name'])
-        source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
-        try:
-            config = read_config(source, remote['name'])
-        except HandledError:
-            log.warning('Skipping. Will not be building: %s', remote['name'])
-            versions.remotes.pop(versions.remotes.index(remote))
-            continue
-        remote['found_docs'] = config['found_docs']
-        remote['master_doc'] = config['master_doc']
+    return leaders
 
-    return exported_root
 
+def build_pass(exported_root, output, versions, leaders, doctrees_root, unchanged):
+    """Build the root and all versions once. Stops at the first failing version which is removed from versions.
 
-def build_all(exported_root, destination, versions):
-    """Build all versions.
+    :raise HandledError: If the root ref fails to build.
 
     :param str exported_root: Tempdir path with exported commits as subdirectories.
-    :param str destination: Destination directory to copy/overwrite built docs to. Does not delete old files.
+    :param output: DirectoryOutput or ArchiveOutput instance.
     :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param dict leaders: Group leader remote of every remote ID (from group_identical()).
+    :param str doctrees_root: Directory for doctrees of every group leader.
+    :param set unchanged: IDs of versions to skip since their output from the previous run is up to date.
+
+    :return: If all versions were built. Otherwise everything has to be built again.
+    :rtype: bool
     """
     log = logging.getLogger(__name__)
+    config = Config.from_context()
+    root_remote = versions[config.root_ref]
+
+    # Start exporting all group leaders, root first.
+    remotes = [r for r in versions.remotes if r['id'] not in unchanged]
+    remotes = adjacent_order(remotes, lambda r: leaders[r['id']]['id'], leaders[root_remote['id']]['id'])
+    shas = [leaders[r['id']]['sha'] for r in remotes]
+    if not config.copy_root:
+        shas.insert(0, leaders[root_remote['id']]['sha'])
+    exports = ExportQueue(config.git_root, exported_root, shas, config.prefetch)
+
+    def build_one(remote, target, is_root):
+        """Build one version. Doctrees are shared by all versions in the same group. Duration and outcome are stored.
+
+        :param dict remote: The version to build.
+        :param str target: Destination directory.
+        :param bool is_root: Is this build in the web root?
+        """
+        leader = leaders[remote['id']]
+        key = [remote['sha'], remote['name'], is_root]
+        result = dict(duration=None, success=False, time=time.time())
+        with Store.from_context() as store:
+            previous = store.get('build', key)
+            if previous:
+                log.debug('Previous build of %s took %.1f seconds.', remote['name'], previous['duration'])
+            source = os.path.dirname(os.path.join(exports.get(leader['sha']), leader['conf_rel_path']))
+            try:
+                build(source, target, versions, remote['name'], is_root, os.path.join(doctrees_root, leader['sha']))
+                result['success'] = True
+            finally:
+                exports.release(leader['sha'])
+                result['duration'] = time.time() - result['time']
+                store.set('build', key, result)
 
-    while True:
+    try:
         # Build root.
-        remote = versions[Config.from_context().root_ref]
-        log.info('Building root: %s', remote['name'])
-        source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
-        build(source, destination, versions, remote['name'], True)
+        if not config.copy_root:
+            log.info('Building root: %s', root_remote['name'])
+            build_one(root_remote, output.target(''), True)
+            output.done('')
 
         # Build all refs.
-        for remote in list(versions.remotes):
+        for remote in (r for r in versions.remotes if r['id'] in unchanged):
+            log.info('Skipping unchanged ref: %s', remote['name'])
+        for remote in remotes:
             log.info('Building ref: %s', remote['name'])
-            source = os.path.dirname(os.path.join(exported_root, remote['sha'], remote['conf_rel_path']))
-            target = os.path.join(destination, remote['root_dir'])
+            target = output.target(remote['root_dir'])
             try:
-                build(source, target, versions, remote['name'], False)
+                build_one(remote, target, False)
             except HandledError:
+                if remote is root_remote and config.copy_root:
+                    raise
                 log.warning('Skipping. Will not be building %s. Rebuilding everything.', remote['name'])
                 versions.remotes.pop(versions.remotes.index(remote))
-                break  # Break out of for loop.
-        else:
-            break  # Break out of while loop if for loop didn't execute break statement above.
+                output.reset()
+                return False
+            if remote is root_remote and config.copy_root:
+                log.info('Copying root: %s', root_remote['name'])
+                copy_root(target, output.target(''))
+                output.done('')
+            output.done(remote['root_dir'])
+    finally:
+        exports.close()
+    return True
+
+
+def build_version(exported_root, destination, versions, name, is_root):
+    """Build one version on its own (e.g. on demand by the serve sub command).
+
+    :raise HandledError: If sphinx-build fails. Will be logged before raising.
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories. Exported if missing.
+    :param str destination: Web root directory. The version is written to its root_dir in it unless is_root.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param str name: Name of the version to build.
+    :param bool is_root: Build into the web root.
+    """
+    config = Config.from_context()
+    remote = versions[name]
+    exports = ExportQueue(config.git_root, exported_root, [remote['sha']], config.prefetch)
+    try:
+        source = os.path.dirname(os.path.join(exports.get(remote['sha']), remote['conf_rel_path']))
+        with TempDir() as doctrees:
+            target = destination if is_root else os.path.join(destination, remote['root_dir'])
+            build(source, target, versions, name, is_root, doctrees)
+    finally:
+        exports.release(remote['sha'])
+        exports.close()
+
+
+def build_all(exported_root, destination, versions, previous=None):
+    """Build all versions.
+
+    Commits missing from exported_root (e.g. skipped by pre_build() with the static_conf option or deleted after the
+    pre-run when prefetching) are exported again.
+    Doctrees are written to a temporary directory instead of destination so they aren't published. Versions with
+    identical docs (see group_identical()) share the doctrees of their group so sphinx-build only reads sources once and
+    otherwise just writes HTML files. With the dedup_static option identical static files are deduplicated at the end.
+    With the archive option destination is a tar or zip file and each version is added to it as soon as it's built.
+    With the incremental option versions with the same fingerprint (see ref_fingerprints()) as in the previous run are
+    not built again, their output is expected to be in destination already. The root is always built.
+    With the versions_json option versions.json is written to the web root once all versions are built.
+
+    :param str exported_root: Tempdir path with exported commits as subdirectories.
+    :param str destination: Destination directory to copy/overwrite built docs to. Does not delete old files.
+    :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+    :param dict previous: Output of read_incremental_state() for the incremental option.
+    """
+    log = logging.getLogger(__name__)
+    config = Config.from_context()
+    leaders = group_identical(config.git_root, versions, config.dedup_trees)
+    doctrees_root = TempDir()
+    previous = previous or dict()
+
+    output = ArchiveOutput(destination) if config.archive else DirectoryOutput(destination)
+    try:
+        while True:
+            fingerprints = ref_fingerprints(config.git_root, versions) if config.incremental else dict()
+            candidates = [r for r in versions.remotes if r['name'] in previous and r['name'] != config.root_ref]
+            unchanged = {
+                r['id'] for r in candidates if previous[r['name']]['fingerprint'] == fingerprints.get(r['name'])
+            }
+            if build_pass(exported_root, output, versions, leaders, doctrees_root.name, unchanged):
+                break  # Otherwise rebuild everything without the failed version.
+        if config.versions_json:
+            write_versions_json(output.target(''), versions)
+            output.done('')
+    finally:
+        output.close()
+
+    # Record fingerprints for the next run.
+    if config.incremental:
+        write_incremental_state(destination, versions, fingerprints)
+
+    # Deduplicate static files.
+    if config.dedup_static:
+        log.info('Deduplicating static files across versions.')
+        version_dirs = [destination] + [os.path.join(destination, r['root_dir']) for r in versions.remotes]
+        dedup_static(destination, version_dirs, config.dedup_static)
+
+    # Write manifest.
+    if config.manifest:
+        log.info('Writing manifest of output files.')
+        write_manifest(destination, build_manifest(destination, versions), read_manifest(destination))
+
+    # Keep caches within budget.
+    if config.cache_dir and (config.cache_max_age or config.cache_max_size):
+        removed = prune_caches(config.cache_dir, config.cache_max_size, config.cache_max_age)
+        log.info('Removed %d cache entries over budget.', removed)
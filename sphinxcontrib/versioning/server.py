@@ -0,0 +1,137 @@
+"""Serve versioned docs over HTTP for previews, building versions on their first request."""
+
+import collections
+import logging
+import os
+import posixpath
+import shutil
+
+try:
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+except ImportError:
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+
+from sphinxcontrib.versioning.lib import HandledError
+from sphinxcontrib.versioning.output import precompress
+
+
+class LazyBuilds(object):
+    """Versions in the web root built on first use. Deletes least recently used versions over a limit.
+
+    :ivar str destination: Web root directory.
+    :ivar int keep: Maximum number of versions built at a time (not counting the web root). 0 is unlimited.
+    :ivar dict built: Names of built versions (keys) by root_dir (values) in order of use, oldest first.
+    :ivar set failed: Names of versions that failed to build. Not attempted again.
+    """
+
+    def __init__(self, destination, versions, build_version, keep=0):
+        """Constructor.
+
+        :param str destination: Web root directory.
+        :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
+        :param function build_version: Called with the version name to build it into its root_dir in destination.
+        :param int keep: Maximum number of versions built at a time (not counting the web root). 0 is unlimited.
+        """
+        self.destination = destination
+        self.keep = keep
+        self.built = collections.OrderedDict()
+        self.failed = set()
+        self._build_version = build_version
+        self._by_root_dir = {r['root_dir']: r['name'] for r in versions.remotes}
+
+    def ensure(self, root_dir):
+        """Build the version in root_dir if it isn't built already.
+
+        :param str root_dir: First path component of a request. Anything else (e.g. _static) is ignored.
+
+        :return: False if the version failed to build.
+        :rtype: bool
+        """
+        log = logging.getLogger(__name__)
+        name = self._by_root_dir.get(root_dir)
+        if name is None:
+            return True
+        if name in self.failed:
+            return False
+        if root_dir in self.built:
+            self.built[root_dir] = self.built.pop(root_dir)  # Most recently used.
+            return True
+
+        # Make room.
+        while self.keep and len(self.built) >= self.keep:
+            evicted = next(iter(self.built))
+            log.info('Deleting least recently viewed version: %s', self.built.pop(evicted))
+            shutil.rmtree(os.path.join(self.destination, evicted), True)
+
+        # Build.
+        log.info('Building ref: %s', name)
+        try:
+            self._build_version(name)
+        except HandledError:
+            self.failed.add(name)
+            return False
+        precompress(os.path.join(self.destination, root_dir))
+        self.built[root_dir] = name
+        return True
+
+
+class RequestHandler(SimpleHTTPRequestHandler):
+    """Serve files from the server's web root, building versions on demand and preferring precompressed files."""
+
+    def log_message(self, format_, *args):
+        """Log requests with logging instead of printing to stderr.
+
+        :param str format_: Message format.
+        :param list args: Message values.
+        """
+        logging.getLogger(__name__).debug(format_, *args)
+
+    def send_head(self):
+        """Build the requested version if needed, then open the file (gzip compressed if possible) and send headers.
+
+        :return: File object to copy to the client or None.
+        """
+        components = [c for c in posixpath.normpath(self.path.split('?', 1)[0].split('#', 1)[0]).split('/') if c]
+        if components and not self.server.builds.ensure(components[0]):
+            self.send_error(500, 'Failed to build version, see log for details.')
+            return None
+
+        path = self.translate_path(self.path)
+        if 'gzip' not in (self.headers.get('Accept-Encoding') or '') or not os.path.isfile(path + '.gz'):
+            return SimpleHTTPRequestHandler.send_head(self)
+        handle = open(path + '.gz', 'rb')
+        self.send_response(200)
+        self.send_header('Content-Type', self.guess_type(path))
+        self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(os.fstat(handle.fileno()).st_size))
+        self.send_header('Vary', 'Accept-Encoding')
+        self.end_headers()
+        return handle
+
+    def translate_path(self, path):
+        """Map the URL path to a file in the web root instead of the current working directory.
+
+        :param str path: URL path.
+
+        :return: Local path.
+        :rtype: str
+        """
+        path = SimpleHTTPRequestHandler.translate_path(self, path)
+        return os.path.join(self.server.builds.destination, os.path.relpath(path, os.getcwd()))
+
+
+class LazyServer(HTTPServer):
+    """HTTP server handling one request at a time so versions are built one at a time.
+
+    :ivar LazyBuilds builds: Versions built on demand.
+    """
+
+    def __init__(self, address, builds):
+        """Constructor.
+
+        :param tuple address: Host and port to listen on. Port 0 picks a free port.
+        :param LazyBuilds builds: Versions built on demand.
+        """
+        self.builds = builds
+        HTTPServer.__init__(self, address, RequestHandler)
@@ -1,24 +1,71 @@
 """Interface with Sphinx."""
 
+import ast
+import copy
 import datetime
+import fnmatch
+import functools
+import hashlib
+import io
 import logging
 import multiprocessing
 import os
+import posixpath
 import sys
+import time
 
+from jinja2.bccache import Bucket, BytecodeCache
 from sphinx import application, build_main, locale
 from sphinx.builders.html import StandaloneHTMLBuilder
 from sphinx.config import Config as SphinxConfig
 from sphinx.errors import SphinxError
+from sphinx.ext import intersphinx
 from sphinx.jinja2glue import SphinxFileSystemLoader
 from sphinx.util.i18n import format_date
+from sphinx.util.matching import compile_matchers
+from sphinx.util.tags import Tags
 
 from sphinxcontrib.versioning import __version__
-from sphinxcontrib.versioning.lib import Config, HandledError, TempDir
+from sphinxcontrib.versioning.lib import Cache, Config, HandledError, TempDir
+from sphinxcontrib.versioning.store import STARTED
 from sphinxcontrib.versioning.versions import Versions
 
+INVENTORY_CACHE = 'intersphinx'
+READ_FROM_URL = getattr(intersphinx, '_read_from_url', None)
+RUN_DIR = list()  # Temporary cache directory for this run if there is no cache_dir. Created once in the parent process.
 SC_VERSIONING_VERSIONS = list()  # Updated after forking.
+STATIC_CONF_DEFAULTS = dict(
+    exclude_patterns=[],
+    extensions=[],
+    html_additional_pages={},
+    html_extra_path=[],
+    html_file_suffix=None,
+    master_doc='contents',
+    source_suffix=['.rst'],
+    templates_path=[],
+)
 STATIC_DIR = os.path.join(os.path.dirname(__file__), '_static')
+STATIC_EXTENSIONS = {  # Extensions known not to add source files, by the top level output files they add.
+    'sphinx.ext.autodoc': (),
+    'sphinx.ext.coverage': (),
+    'sphinx.ext.doctest': (),
+    'sphinx.ext.extlinks': (),
+    'sphinx.ext.githubpages': ('.nojekyll',),
+    'sphinx.ext.graphviz': (),
+    'sphinx.ext.ifconfig': (),
+    'sphinx.ext.imgmath': (),
+    'sphinx.ext.inheritance_diagram': (),
+    'sphinx.ext.intersphinx': (),
+    'sphinx.ext.mathjax': (),
+    'sphinx.ext.napoleon': (),
+    'sphinx.ext.pngmath': (),
+    'sphinx.ext.todo': (),
+    'sphinx.ext.viewcode': ('_modules',),
+}
+STATIC_ROOT_FILES = ('.buildinfo', '.doctrees', '_downloads', '_images', '_sources', '_static', 'objects.inv',
+                     'searchindex.js')
+STATIC_ROOT_PAGES = ('genindex', 'py-modindex', 'search')
+TEMPLATE_CACHE = 'jinja2'
 
 
 class EventHandlers(object):
@@ -29,9 +76,14 @@ class EventHandlers(object):
     :ivar str BANNER_MAIN_VERSION: Banner URLs point to this remote name (from Versions.__getitem__()).
     :ivar bool BANNER_RECENT_TAG: Banner URLs point to most recently committed tag.
     :ivar str CURRENT_VERSION: Current version being built.
+    :ivar dict FRAGMENTS: Rendered banner and versions sidebar split at URLs, by template name and page class.
+    :ivar tuple CACHES: Directory for lib.Cache instances shared by all builds and the Unix time this run started.
     :ivar bool IS_ROOT: Value for context['scv_is_root'].
+    :ivar bool REPRODUCIBLE: Format last_updated dates in UTC instead of the local timezone.
     :ivar bool SHOW_BANNER: Display the banner.
+    :ivar TemplateCache TEMPLATES: Jinja2 bytecode cache of the builder's template environment.
     :ivar sphinxcontrib.versioning.versions.Versions VERSIONS: Versions class instance.
+    :ivar bool VERSIONS_JSON: Leave the versions sidebar and banner link to versions.js.
     """
 
     ABORT_AFTER_READ = None
@@ -39,9 +91,14 @@ class EventHandlers(object):
     BANNER_MAIN_VERSION = None
     BANNER_RECENT_TAG = False
     CURRENT_VERSION = None
+    FRAGMENTS = dict()
+    CACHES = (None, 0)
     IS_ROOT = False
+    REPRODUCIBLE = False
     SHOW_BANNER = False
+    TEMPLATES = None
     VERSIONS = None
+    VERSIONS_JSON = False
 
     @staticmethod
     def builder_inited(app):
@@ -55,6 +112,11 @@ class EventHandlers(object):
         app.builder.templates.loaders.insert(0, SphinxFileSystemLoader(templates_dir))
         app.builder.templates.templatepathlen += 1
 
+        # Share compiled templates with other builds.
+        if hasattr(app.builder.templates, 'environment'):
+            EventHandlers.TEMPLATES = TemplateCache(Cache(EventHandlers.CACHES[0], TEMPLATE_CACHE))
+            app.builder.templates.environment.bytecode_cache = EventHandlers.TEMPLATES
+
         # Add versions.html to sidebar.
         if '**' not in app.config.html_sidebars:
             app.config.html_sidebars['**'] = StandaloneHTMLBuilder.default_sidebars + ['versions.html']
@@ -70,11 +132,41 @@ class EventHandlers(object):
         """
         if cls.ABORT_AFTER_READ:
             config = {n: getattr(app.config, n) for n in (a for a in dir(app.config) if a.startswith('scv_'))}
-            config['found_docs'] = tuple(str(d) for d in env.found_docs)
+            config['found_docs'] = tuple(sorted(str(d) for d in env.found_docs))
             config['master_doc'] = str(app.config.master_doc)
             cls.ABORT_AFTER_READ.put(config)
             sys.exit(0)
 
+    @classmethod
+    def render_fragment(cls, app, template, context, page_class=()):
+        """Render one of this extension's templates whose output only varies by URLs of versions between pages.
+
+        Rendered once per page class with placeholders instead of URLs, so for every other page of that class only URLs
+        are filled in. Only for banner.html and versions.html since they take precedence over the user's templates and
+        don't use anything else specific to the page. With VERSIONS_JSON they're short and specific to the page (they
+        have its name for versions.js) so they're rendered every time.
+
+        :param sphinx.application.Sphinx app: Sphinx application object.
+        :param str template: Template name.
+        :param dict context: Jinja2 HTML context of the page.
+        :param tuple page_class: Values the template branches on other than URLs (e.g. from vhasdoc()).
+
+        :return: Rendered HTML.
+        :rtype: str
+        """
+        if cls.VERSIONS_JSON:
+            return app.builder.templates.render(template, context)
+        key = (template, page_class)
+        if key not in cls.FRAGMENTS:
+            names = [r['name'] for r in cls.VERSIONS.remotes]
+            placeholders = copy.copy(cls.VERSIONS)
+            placeholders.vpathto = {n: '\0{}\0'.format(i) for i, n in enumerate(names)}.__getitem__
+            context = dict(context, scv_render_versions=None, versions=placeholders, vpathto=placeholders.vpathto)
+            pieces = app.builder.templates.render(template, context).split('\0')
+            cls.FRAGMENTS[key] = [p if i % 2 == 0 else names[int(p)] for i, p in enumerate(pieces)]
+        pieces = cls.FRAGMENTS[key]
+        return ''.join(p if i % 2 == 0 else cls.VERSIONS.vpathto(p) for i, p in enumerate(pieces))
+
     @classmethod
     def html_page_context(cls, app, pagename, templatename, context, doctree):
         """Update the Jinja2 HTML context, exposes the Versions class instance to it.
@@ -108,6 +200,10 @@ class EventHandlers(object):
         context['scv_is_recent_tag'] = this_remote == versions.recent_tag_remote
         context['scv_is_root'] = cls.IS_ROOT
         context['scv_is_tag'] = this_remote['kind'] == 'tags'
+        context['scv_versions_json'] = cls.VERSIONS_JSON
+        context['scv_web_root'] = '../' * (pagename.count('/') + (not cls.IS_ROOT))
+        if not cls.VERSIONS_JSON:
+            context['scv_render_versions'] = functools.partial(cls.render_fragment, app, 'versions.html', context)
         context['scv_show_banner'] = cls.SHOW_BANNER
         context['versions'] = versions
         context['vhasdoc'] = versions.vhasdoc
@@ -115,7 +211,8 @@ class EventHandlers(object):
 
         # Insert banner into body.
         if cls.SHOW_BANNER and 'body' in context:
-            parsed = app.builder.templates.render('banner.html', context)
+            page_class = (versions.vhasdoc(cls.BANNER_MAIN_VERSION),)
+            parsed = cls.render_fragment(app, 'banner.html', context, page_class)
             context['body'] = parsed + context['body']
             # Handle overridden css_files.
             css_files = context.setdefault('css_files', list())
@@ -130,10 +227,133 @@ class EventHandlers(object):
             file_path = app.env.doc2path(pagename)
             if os.path.isfile(file_path):
                 lufmt = app.config.html_last_updated_fmt or getattr(locale, '_')('%b %d, %Y')
-                mtime = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
+                if cls.REPRODUCIBLE:
+                    mtime = datetime.datetime.utcfromtimestamp(os.path.getmtime(file_path))
+                else:
+                    mtime = datetime.datetime.fromtimestamp(os.path.getmtime(file_path))
                 context['last_updated'] = format_date(lufmt, mtime, language=app.config.language, warn=app.warn)
 
 
+class TemplateCache(BytecodeCache):
+    """Jinja2 bytecode cache in a lib.Cache so templates are compiled only once for all versions.
+
+    Applies to all templates: banner.html, versions.html, the theme's (e.g. layout.html), and the user's. Jinja2 keys
+    bytecode by template name and file path, replacing it when the source changes. Versions may have different
+    templates with the same name so entries are keyed by the source's hash instead.
+
+    :ivar sphinxcontrib.versioning.lib.Cache cache: Where bytecode is stored.
+    """
+
+    def __init__(self, cache):
+        """Constructor.
+
+        :param sphinxcontrib.versioning.lib.Cache cache: Where to store bytecode.
+        """
+        self.cache = cache
+
+    def clear(self):
+        """Delete all bytecode."""
+        self.cache.clear()
+
+    def dump_bytecode(self, bucket):
+        """Store compiled template.
+
+        :param jinja2.bccache.Bucket bucket: Has the bytecode.
+        """
+        self.cache.put(bucket.key, bucket.bytecode_to_string())
+
+    def get_bucket(self, environment, name, filename, source):
+        """Look up bytecode by template name and source hash.
+
+        :param jinja2.Environment environment: Template environment. Its extensions change the compiled code.
+        :param str name: Template name.
+        :param str filename: Path to the template file. Unused.
+        :param str source: Template source.
+
+        :return: Bucket with bytecode if found.
+        :rtype: jinja2.bccache.Bucket
+        """
+        checksum = self.get_source_checksum(source)
+        extensions = ' '.join(sorted(environment.extensions))
+        key = hashlib.sha1('{}|{}|{}'.format(name, checksum, extensions).encode('utf-8')).hexdigest()
+        bucket = Bucket(environment, key, checksum)
+        self.load_bytecode(bucket)
+        return bucket
+
+    def load_bytecode(self, bucket):
+        """Load compiled template if found. Bytecode from other Jinja2 or Python versions is ignored by Jinja2.
+
+        :param jinja2.bccache.Bucket bucket: Receives the bytecode.
+        """
+        contents = self.cache.read(bucket.key)
+        if contents is not None:
+            bucket.load_bytecode(io.BytesIO(contents))
+
+
+class CachedInventory(io.BytesIO):
+    """Intersphinx inventory read from the cache. Looks like a download to Sphinx so moved inventories are followed.
+
+    :ivar str url: URL of the inventory after redirects.
+    """
+
+    def __init__(self, contents, url):
+        """Constructor.
+
+        :param bytes contents: Inventory file contents.
+        :param str url: URL of the inventory after redirects.
+        """
+        super(CachedInventory, self).__init__(contents)
+        self.url = url
+
+    def geturl(self):
+        """Return the URL after redirects like urllib responses do (Sphinx < 1.5).
+
+        :return: URL of the inventory.
+        :rtype: str
+        """
+        return self.url
+
+
+def read_inventory(url, *args, **kwargs):
+    """Read an intersphinx inventory from the cache. Replaces Sphinx's _read_from_url() in child processes.
+
+    Every sphinx-build (one or two per version) would otherwise download the same objects.inv files. Each one is
+    downloaded at most once per run and shared with the following builds. Copies left by previous runs in cache_dir are
+    only used if downloading fails (e.g. the host rate limits requests).
+
+    :param str url: URL of the inventory file.
+    :param list args: Passed to _read_from_url().
+    :param dict kwargs: Passed to _read_from_url().
+
+    :return: File-like object with the inventory.
+    :rtype: CachedInventory
+    """
+    cache_dir, since = EventHandlers.CACHES
+    cached = fetched = None
+    with Cache(cache_dir, INVENTORY_CACHE) as cache:
+        contents = cache.read(url)
+        if contents is not None:
+            header, contents = contents.split(b'\n', 1)
+            fetched, final_url = header.decode('utf-8').split(' ', 1)
+            cached = CachedInventory(contents, final_url)
+            fetched = float(fetched)
+            if fetched >= since:
+                return cached
+
+        # Download.
+        try:
+            response = READ_FROM_URL(url, *args, **kwargs)
+            contents = response.read()
+        except Exception:  # pylint: disable=broad-except
+            if cached is None:
+                raise
+            logging.getLogger(__name__).warning('Failed to download %s, using copy from %s.', url, time.ctime(fetched))
+            return cached
+        final_url = getattr(response, 'url', None) or response.geturl()
+        cache.put(url, '{!r} {}\n'.format(time.time(), final_url).encode('utf-8') + contents)
+    return CachedInventory(contents, final_url)
+
+
 def setup(app):
     """Called by Sphinx during phase 0 (initialization).
 
@@ -148,6 +368,8 @@ def setup(app):
     # Needed for banner.
     app.config.html_static_path.append(STATIC_DIR)
     app.add_stylesheet('banner.css')
+    if EventHandlers.VERSIONS_JSON:
+        app.add_javascript('versions.js')
 
     # Tell Sphinx which config values can be set by the user.
     for name, default in Config():
@@ -169,7 +391,22 @@ class ConfigInject(SphinxConfig):
         self.extensions.append('sphinxcontrib.versioning.sphinx_')
 
 
-def _build(argv, config, versions, current_name, is_root):
+def _caches(config):
+    """Get the directory for caches shared by all builds of this run. Called in the parent process.
+
+    :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
+
+    :return: Value for EventHandlers.CACHES.
+    :rtype: tuple
+    """
+    if config.cache_dir:
+        return config.cache_dir, STARTED
+    if not RUN_DIR:
+        RUN_DIR.append(TempDir(True).name)
+    return RUN_DIR[0], STARTED
+
+
+def _build(argv, config, versions, current_name, is_root, caches):
     """Build Sphinx docs via multiprocessing for isolation.
 
     :param tuple argv: Arguments to pass to Sphinx.
@@ -177,9 +414,13 @@ def _build(argv, config, versions, current_name, is_root):
     :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
     :param str current_name: The ref name of the current version being built.
     :param bool is_root: Is this build in the web root?
+    :param tuple caches: Value for EventHandlers.CACHES from _caches().
     """
     # Patch.
     application.Config = ConfigInject
+    EventHandlers.CACHES = caches
+    if hasattr(intersphinx, '_read_from_url'):
+        setattr(intersphinx, '_read_from_url', read_inventory)
     if config.show_banner:
         EventHandlers.BANNER_GREATEST_TAG = config.banner_greatest_tag
         EventHandlers.BANNER_MAIN_VERSION = config.banner_main_ref
@@ -188,8 +429,14 @@ def _build(argv, config, versions, current_name, is_root):
     EventHandlers.CURRENT_VERSION = current_name
     EventHandlers.IS_ROOT = is_root
     EventHandlers.VERSIONS = versions
+    EventHandlers.VERSIONS_JSON = config.versions_json
     SC_VERSIONING_VERSIONS[:] = [p for r in versions.remotes for p in sorted(r.items()) if p[0] not in ('sha', 'date')]
 
+    # Pin dates Sphinx would otherwise take from the clock (today, copyright, last_updated) to the commit date.
+    if config.reproducible and not EventHandlers.ABORT_AFTER_READ:
+        EventHandlers.REPRODUCIBLE = True
+        os.environ['SOURCE_DATE_EPOCH'] = str(versions[current_name]['date'])
+
     # Update argv.
     if config.verbose > 1:
         argv += ('-v',) * (config.verbose - 1)
@@ -200,26 +447,29 @@ def _build(argv, config, versions, current_name, is_root):
 
     # Build.
     result = build_main(argv)
+    if EventHandlers.TEMPLATES:
+        EventHandlers.TEMPLATES.cache.close()  # Record hits/misses.
     if result != 0:
         raise SphinxError
 
 
-def _read_config(argv, config, current_name, queue):
+def _read_config(argv, config, current_name, queue, caches):
     """Read the Sphinx config via multiprocessing for isolation.
 
     :param tuple argv: Arguments to pass to Sphinx.
     :param sphinxcontrib.versioning.lib.Config config: Runtime configuration.
     :param str current_name: The ref name of the current version being built.
     :param multiprocessing.queues.Queue queue: Communication channel to parent process.
+    :param tuple caches: Value for EventHandlers.CACHES from _caches().
     """
     # Patch.
     EventHandlers.ABORT_AFTER_READ = queue
 
     # Run.
-    _build(argv, config, Versions(list()), current_name, False)
+    _build(argv, config, Versions(list()), current_name, False, caches)
 
 
-def build(source, target, versions, current_name, is_root):
+def build(source, target, versions, current_name, is_root, doctrees=None):
     """Build Sphinx docs for one version. Includes Versions class instance with names/urls in the HTML context.
 
     :raise HandledError: If sphinx-build fails. Will be logged before raising.
@@ -229,13 +479,17 @@ def build(source, target, versions, current_name, is_root):
     :param sphinxcontrib.versioning.versions.Versions versions: Versions class instance.
     :param str current_name: The ref name of the current version being built.
     :param bool is_root: Is this build in the web root?
+    :param str doctrees: Directory for cached doctrees (sphinx-build -d). Default is .doctrees in target.
     """
     log = logging.getLogger(__name__)
     argv = ('sphinx-build', source, target)
+    if doctrees:
+        argv += ('-d', doctrees)
     config = Config.from_context()
 
     log.debug('Running sphinx-build for %s with args: %s', current_name, str(argv))
-    child = multiprocessing.Process(target=_build, args=(argv, config, versions, current_name, is_root))
+    args = (argv, config, versions, current_name, is_root, _caches(config))
+    child = multiprocessing.Process(target=_build, args=args)
     child.start()
     child.join()  # Block.
     if child.exitcode != 0:
@@ -243,6 +497,47 @@ def build(source, target, versions, current_name, is_root):
         raise HandledError
 
 
+def _read_scv_config(conf_py, queue):
+    """Execute conf.py in an isolated namespace via multiprocessing and send back scv_* values.
+
+    :param str conf_py: Path to conf.py to execute.
+    :param multiprocessing.queues.Queue queue: Communication channel to parent process.
+    """
+    namespace = dict(__file__=conf_py, tags=Tags())
+    os.chdir(os.path.dirname(conf_py))  # Sphinx promises conf.py the config dir as the current dir.
+    with open(conf_py, 'rb') as handle:
+        code = compile(handle.read(), conf_py, 'exec')
+    exec(code, namespace)  # pylint: disable=exec-used
+    names = {'scv_{}'.format(n) for n, _ in Config()}
+    queue.put({k: v for k, v in namespace.items() if k in names})
+
+
+def read_scv_config(conf_py):
+    """Read only SCVersioning's scv_* settings from a conf.py file without running Sphinx.
+
+    Much faster than read_config() since Sphinx isn't initialized and no documents are read.
+
+    :raise HandledError: If conf.py raises an exception. Will be logged before raising.
+
+    :param str conf_py: Path to conf.py to read.
+
+    :return: scv_* config values defined in conf.py.
+    :rtype: dict
+    """
+    log = logging.getLogger(__name__)
+    queue = multiprocessing.Queue()
+
+    log.debug('Executing %s to read SCVersioning config values.', conf_py)
+    child = multiprocessing.Process(target=_read_scv_config, args=(os.path.abspath(conf_py), queue))
+    child.start()
+    child.join()  # Block.
+    if child.exitcode != 0:
+        log.error('Failed to execute: %s', conf_py)
+        raise HandledError
+
+    return queue.get()
+
+
 def read_config(source, current_name):
     """Read the Sphinx config for one version.
 
@@ -261,7 +556,8 @@ def read_config(source, current_name):
     with TempDir() as temp_dir:
         argv = ('sphinx-build', source, temp_dir)
         log.debug('Running sphinx-build for config values with args: %s', str(argv))
-        child = multiprocessing.Process(target=_read_config, args=(argv, config, current_name, queue))
+        args = (argv, config, current_name, queue, _caches(config))
+        child = multiprocessing.Process(target=_read_config, args=args)
         child.start()
         child.join()  # Block.
         if child.exitcode != 0:
@@ -270,3 +566,151 @@ def read_config(source, current_name):
 
     config = queue.get()
     return config
+
+
+def _is_dynamic(statement, names):
+    """Check if a conf.py statement may change variables in a way that can't be followed without executing it.
+
+    :param ast.AST statement: Top level statement in conf.py.
+    :param iter names: Variable names to look out for.
+
+    :return: If the statement uses "from x import *", exec(), globals(), etc. or modifies one of the variables.
+    :rtype: bool
+    """
+    for node in ast.walk(statement):
+        if isinstance(node, ast.ImportFrom) and any(a.name == '*' for a in node.names):
+            return True
+        if node.__class__.__name__ == 'Exec':  # Python 2.x exec statement.
+            return True
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name):
+            if node.func.id in ('eval', 'exec', 'execfile', 'globals', 'locals', 'setattr', 'vars'):
+                return True
+        if isinstance(node, ast.Name) and node.id in names and not isinstance(node.ctx, ast.Load):
+            return True
+        if isinstance(node, (ast.Attribute, ast.Subscript)) and isinstance(node.value, ast.Name):
+            if node.value.id in names and (isinstance(node, ast.Attribute) or not isinstance(node.ctx, ast.Load)):
+                return True
+    return False
+
+
+def _evaluate_conf(contents):
+    """Statically evaluate the conf.py variables in STATIC_CONF_DEFAULTS without executing conf.py.
+
+    Only top level assignments of literals (strings, lists, dicts, etc.) are supported. Anything that may change one of
+    these variables in a way that can't be followed without executing the file (e.g. conditionals, list.append(),
+    "from x import *", exec()) is considered too dynamic.
+
+    :param str contents: Contents of conf.py.
+
+    :return: Variable names and their values, or None if conf.py is too dynamic.
+    :rtype: dict
+    """
+    try:
+        tree = ast.parse(contents)
+    except (SyntaxError, TypeError, ValueError):
+        return None
+    values = dict(STATIC_CONF_DEFAULTS)
+
+    for statement in tree.body:
+        if not isinstance(statement, ast.Assign) or not all(isinstance(t, ast.Name) for t in statement.targets):
+            if _is_dynamic(statement, values):
+                return None
+            continue
+        names = [t.id for t in statement.targets if t.id in values]
+        if names:
+            try:
+                value = ast.literal_eval(statement.value)
+            except ValueError:
+                return None
+            values.update((n, value) for n in names)
+
+    # Validate types.
+    if not isinstance(values['source_suffix'], (list, tuple)):
+        values['source_suffix'] = [values['source_suffix']]
+    if not isinstance(values['html_additional_pages'], dict):
+        return None
+    if values['html_file_suffix'] is not None and not isinstance(values['html_file_suffix'], (str, type(u''))):
+        return None
+    lists = ('exclude_patterns', 'extensions', 'html_extra_path', 'templates_path')
+    return values if all(isinstance(values[n], (list, tuple)) for n in lists) else None
+
+
+def _overflow_supported(overflow):
+    """Check if sphinx-build arguments leave the variables read by _evaluate_conf() alone.
+
+    :param iter overflow: Arguments passed to sphinx-build.
+
+    :return: False if -C, -c, or -D on one of the variables in STATIC_CONF_DEFAULTS is used.
+    :rtype: bool
+    """
+    overflow = list(overflow)
+    for i, arg in enumerate(overflow):
+        if arg == '-C' or arg.startswith('-c'):
+            return False
+        if arg.startswith('-D'):
+            define = arg[2:] or (overflow[i + 1] if i + 1 < len(overflow) else '')
+            if define.split('=', 1)[0] in STATIC_CONF_DEFAULTS:
+                return False
+    return True
+
+
+def read_config_static(conf_contents, file_names, overflow=tuple()):
+    """Determine found_docs and master_doc for one version without running Sphinx or exporting the commit.
+
+    Evaluates conf.py statically (see _evaluate_conf()) and applies the same filtering sphinx-build does when looking
+    for documents. Also predicts which files and directories sphinx-build would create at the top of its output
+    directory. Extensions not in STATIC_EXTENSIONS may add source files or output files (e.g. autosummary or third
+    party extensions) so they aren't supported.
+
+    :param str conf_contents: Contents of conf.py.
+    :param iter file_names: All files in the conf.py directory (recursively) relative to it, using forward slashes.
+    :param iter overflow: Arguments passed to sphinx-build. -C, -c, and -D on relevant variables aren't supported.
+
+    :return: Specific Sphinx config values (found_docs, master_doc, and root_files) or None if not supported.
+    :rtype: dict
+    """
+    log = logging.getLogger(__name__)
+    if not _overflow_supported(overflow):
+        log.debug('Overflow arguments %s not supported when reading config statically.', repr(overflow))
+        return None
+
+    # Evaluate conf.py.
+    values = _evaluate_conf(conf_contents)
+    if values is None:
+        log.debug('conf.py too dynamic to read statically.')
+        return None
+    unknown = [e for e in values['extensions'] if e not in STATIC_EXTENSIONS]
+    if unknown:
+        log.debug('Extensions %s not supported when reading config statically.', repr(unknown))
+        return None
+
+    # Find docs like sphinx-build does.
+    patterns = ['**/_sources', '.#*', '**/.#*', '*.lproj/**']
+    patterns.extend(p for n in ('exclude_patterns', 'templates_path', 'html_extra_path') for p in values[n])
+    matchers = compile_matchers(patterns)
+    found_docs = set()
+    for file_name in file_names:
+        components = file_name.split('/')
+        if any(m(posixpath.join(*components[:i])) for i in range(1, len(components) + 1) for m in matchers):
+            continue
+        for suffix in values['source_suffix']:
+            if fnmatch.fnmatch(file_name, '*' + suffix):
+                found_docs.add(file_name[:-len(suffix)])
+                break
+
+    # Predict top level output files.
+    suffix = values['html_file_suffix'] or '.html'
+    root_files = set(STATIC_ROOT_FILES)
+    root_files.update(f for e in values['extensions'] for f in STATIC_EXTENSIONS[e])
+    root_files.update(p + suffix for p in STATIC_ROOT_PAGES)
+    root_files.update(d + suffix if '/' not in d else d.split('/')[0] for d in found_docs)
+    root_files.update((p + suffix).split('/')[0] for p in values['html_additional_pages'])
+    for extra in (posixpath.normpath(p.replace('\\', '/')) for p in values['html_extra_path']):
+        root_files.update(f[len(extra) + 1:].split('/')[0] for f in file_names if f.startswith(extra + '/'))
+        root_files.update(posixpath.basename(f) for f in file_names if f == extra)
+
+    return dict(
+        found_docs=tuple(sorted(found_docs)),
+        master_doc=str(values['master_doc']),
+        root_files=tuple(sorted(root_files)),
+    )
@@ -0,0 +1,176 @@
+"""Persist metadata about commits (dates, Sphinx configs, build results) between runs in a SQLite database."""
+
+import collections
+import json
+import logging
+import os
+import sqlite3
+import time
+
+from sphinxcontrib.versioning.lib import Config, makedirs
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS entries (kind TEXT NOT NULL, key TEXT NOT NULL, value TEXT, updated REAL NOT NULL, '
+    'used REAL NOT NULL, PRIMARY KEY (kind, key))',
+    'CREATE TABLE IF NOT EXISTS stats (kind TEXT PRIMARY KEY, hits INTEGER NOT NULL, misses INTEGER NOT NULL)',
+)
+STARTED = time.time()
+STORE_FILE = 'scv_store.sqlite3'
+TIMEOUT = 60  # Seconds to wait for other processes writing to the database.
+
+
+class Store(object):
+    """Key/value store in a SQLite database. Keys and values are anything JSON serializable.
+
+    Entries are grouped by kind (e.g. "dates" or "config"). Only values derived from immutable inputs (commit or tree
+    SHAs plus settings) are stored, so entries don't go stale unless something outside of those inputs (e.g. an
+    installed Sphinx extension) changes. Multiple processes may use the same database at the same time.
+
+    Like lib.Cache the last use of every entry and hits/misses are recorded (when closing) so the store can be pruned.
+
+    :ivar str name: Name of the store for per-cache settings (like lib.Cache.name).
+    :ivar str path: Path to the database file or ":memory:" if no cache directory is configured.
+    :ivar float since: Ignore entries written before this Unix time.
+    """
+
+    def __init__(self, cache_dir=None, since=0):
+        """Constructor.
+
+        :param str cache_dir: Directory to create or open the database in. Only keep entries in memory if None.
+        :param float since: Ignore entries written before this Unix time (they're replaced when written again).
+        """
+        self.name = 'store'
+        self.since = since
+        self._hits = collections.Counter()
+        self._misses = collections.Counter()
+        self._used = list()
+        if cache_dir:
+            makedirs(cache_dir)
+            self.path = os.path.join(cache_dir, STORE_FILE)
+        else:
+            self.path = ':memory:'
+        self._connection = sqlite3.connect(self.path, timeout=TIMEOUT)
+        if cache_dir:
+            self._connection.execute('PRAGMA journal_mode=WAL')  # Readers don't block the writer.
+        with self._connection:
+            for statement in SCHEMA:
+                self._connection.execute(statement)
+
+    @classmethod
+    def from_context(cls):
+        """Open the store in cache_dir of the current Config. Entries of previous runs are ignored with refresh_cache.
+
+        :return: Instance of this class.
+        :rtype: Store
+        """
+        config = Config.from_context()
+        return cls(config.cache_dir, STARTED if config.refresh_cache else 0)
+
+    def __enter__(self):
+        """Return self."""
+        return self
+
+    def __exit__(self, *_):
+        """Close the database when exiting context."""
+        self.close()
+
+    def clear(self):
+        """Delete all entries.
+
+        :return: Number of deleted entries.
+        :rtype: int
+        """
+        with self._connection:
+            return self._connection.execute('DELETE FROM entries').rowcount
+
+    def close(self):
+        """Record last use of entries read and hits/misses since opening. Then close the database connection."""
+        now = time.time()
+        with self._connection:
+            self._connection.executemany('UPDATE entries SET used = ? WHERE kind = ? AND key = ?',
+                                         ((now, k, j) for k, j in self._used))
+            for kind in set(self._hits) | set(self._misses):
+                self._connection.execute('INSERT OR IGNORE INTO stats (kind, hits, misses) VALUES (?, 0, 0)', (kind,))
+                self._connection.execute('UPDATE stats SET hits = hits + ?, misses = misses + ? WHERE kind = ?',
+                                         (self._hits[kind], self._misses[kind], kind))
+        self._connection.close()
+
+    def get(self, kind, key, default=None):
+        """Read one entry.
+
+        :param str kind: Group of the entry.
+        :param key: Identifies the entry within its kind.
+        :param default: Returned if there is no such entry.
+
+        :return: Decoded value.
+        """
+        encoded = json.dumps(key, sort_keys=True)
+        row = self._connection.execute(
+            'SELECT value FROM entries WHERE kind = ? AND key = ? AND updated >= ?', (kind, encoded, self.since)
+        ).fetchone()
+        if row is None:
+            self._misses[kind] += 1
+            return default
+        logging.getLogger(__name__).debug('Found %s in store: %s', kind, key)
+        self._hits[kind] += 1
+        self._used.append((kind, encoded))
+        return json.loads(row[0])
+
+    def set(self, kind, key, value):
+        """Write one entry, replacing an existing one with the same key.
+
+        :param str kind: Group of the entry.
+        :param key: Identifies the entry within its kind.
+        :param value: Value to store.
+        """
+        now = time.time()
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (kind, key, value, updated, used) VALUES (?, ?, ?, ?, ?)',
+                (kind, json.dumps(key, sort_keys=True), json.dumps(value, sort_keys=True), now, now),
+            )
+
+    def prune(self, max_size=0, max_age=0):
+        """Delete entries not used in max_age seconds, then least recently used ones until the total is within max_size.
+
+        Sizes are the length of encoded keys and values. The database file itself only shrinks when vacuumed, freed
+        space is reused by new entries.
+
+        :param int max_size: Maximum total size in bytes. 0 is unlimited.
+        :param int max_age: Maximum seconds since last use. 0 is unlimited.
+
+        :return: Number of deleted entries.
+        :rtype: int
+        """
+        removed = list()
+        with self._connection:
+            rows = self._connection.execute(
+                'SELECT rowid, LENGTH(key) + LENGTH(value), used FROM entries ORDER BY used DESC'
+            ).fetchall()
+            total = 0
+            for rowid, size, used in rows:
+                total += size
+                if (max_age and used < time.time() - max_age) or (max_size and total > max_size):
+                    removed.append((rowid,))
+            self._connection.executemany('DELETE FROM entries WHERE rowid = ?', removed)
+        return len(removed)
+
+    def stats(self):
+        """Read hits and misses recorded by all runs.
+
+        :return: Hits and misses (dict values) by kind (keys).
+        :rtype: dict
+        """
+        rows = self._connection.execute('SELECT kind, hits, misses FROM stats').fetchall()
+        return {k: dict(hits=h, misses=m) for k, h, m in rows}
+
+    def usage(self):
+        """Count entries.
+
+        :return: Number of entries and their total size in bytes (tuple values) by kind (keys).
+        :rtype: dict
+        """
+        rows = self._connection.execute(
+            'SELECT kind, COUNT(*), SUM(LENGTH(key) + LENGTH(value)) FROM entries GROUP BY kind'
+        ).fetchall()
+        return {k: (c, s) for k, c, s in rows}
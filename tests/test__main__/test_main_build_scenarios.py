@@ -1,12 +1,21 @@
 """Test calls to main() with different command line options."""
 
+import json
+import signal
+import socket
 import time
-from subprocess import CalledProcessError
+import zipfile
+from subprocess import CalledProcessError, PIPE, Popen, STDOUT
 
 import pytest
 
 from sphinxcontrib.versioning.git import IS_WINDOWS
 
+try:
+    from urllib.request import urlopen
+except ImportError:
+    from urllib2 import urlopen
+
 
 def test_sub_page_and_tag(tmpdir, local_docs, urls):
     """Test with sub pages and one git tag. Testing from local git repo.
@@ -673,6 +682,211 @@ def test_error_bad_root_ref(tmpdir, local_docs):
     assert 'Root ref unknown not found in: master' in exc.value.output
 
 
+def test_skip_unchanged(tmpdir, local_docs):
+    """Test exiting early when nothing changed since the last run.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    destination = tmpdir.join('destination')
+    command = ['sphinx-versioning', '-N', 'build', '--skip-unchanged', '.', str(destination)]
+    output = pytest.run(local_docs, command)
+    assert 'Nothing changed since the last run.' not in output
+    assert destination.join('contents.html').check(file=True)
+
+    # Same refs.
+    output = pytest.run(local_docs, command)
+    assert 'Nothing changed since the last run. Skipping.' in output
+    assert 'Building ref' not in output
+
+    # Different settings.
+    output = pytest.run(local_docs, command + ['--show-banner'])
+    assert 'Nothing changed since the last run.' not in output
+
+    # New commit.
+    local_docs.join('two.rst').write('Changed\n', mode='a')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed two.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    output = pytest.run(local_docs, command + ['--show-banner'])
+    assert 'Nothing changed since the last run.' not in output
+    assert 'Changed' in destination.join('master', 'two.html').read()
+    assert 'Nothing changed since the last run.' in pytest.run(local_docs, command + ['--show-banner'])
+
+    # Deleted destination.
+    destination.remove()
+    output = pytest.run(local_docs, command + ['--show-banner'])
+    assert 'Nothing changed since the last run.' not in output
+    assert destination.join('contents.html').check(file=True)
+
+
+def test_incremental(tmpdir, local_docs):
+    """Test building only refs whose inputs changed since the last run.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'branch', '--force', 'feature'])
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', '--force', 'origin', 'feature', 'v1.0.0'])
+    destination = tmpdir.join('destination')
+    command = ['sphinx-versioning', 'build', '--incremental', '.', str(destination)]
+    output = pytest.run(local_docs, command)
+    assert 'Skipping unchanged ref' not in output
+    assert sorted(json.loads(destination.join('.scv_state.json').read())['refs']) == ['feature', 'master', 'v1.0.0']
+
+    # Nothing changed. Root is always built.
+    output = pytest.run(local_docs, command)
+    assert 'Building root: master' in output
+    assert 'Building ref: master' in output
+    assert 'Skipping unchanged ref: feature' in output
+    assert 'Skipping unchanged ref: v1.0.0' in output
+    assert destination.join('feature', 'two.html').check(file=True)
+
+    # Changed page in one ref.
+    pytest.run(local_docs, ['git', 'checkout', 'feature'])
+    local_docs.join('two.rst').write('Changed\n', mode='a')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed two.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'feature'])
+    output = pytest.run(local_docs, command)
+    assert 'Building ref: feature' in output
+    assert 'Skipping unchanged ref: v1.0.0' in output
+    assert 'Changed' in destination.join('feature', 'two.html').read()
+
+    # Different settings.
+    output = pytest.run(local_docs, command + ['--show-banner'])
+    assert 'Skipping unchanged ref' not in output
+
+    # New page only rebuilds its version, the others read versions.json.
+    local_docs.join('four.rst').write('Four\n====\n')
+    pytest.run(local_docs, ['git', 'add', 'four.rst'])
+    pytest.run(local_docs, ['git', 'commit', '-m', 'Adding four.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'feature'])
+    output = pytest.run(local_docs, command + ['--show-banner'])
+    assert 'Building ref: feature' in output
+    assert 'Building ref: master' in output  # Root ref is always built.
+    assert 'Skipping unchanged ref: v1.0.0' in output
+    data = json.loads(destination.join('versions.json').read())
+    assert 'four' in data['docs'][[v['docs'] for v in data['versions'] if v['name'] == 'feature'][0]]
+
+    # New branch doesn't rebuild the others either.
+    pytest.run(local_docs, ['git', 'push', 'origin', 'feature:feature2'])
+    output = pytest.run(local_docs, command + ['--show-banner'])
+    assert 'Building ref: feature2' in output
+    assert 'Skipping unchanged ref: feature' in output
+    assert 'Skipping unchanged ref: v1.0.0' in output
+    assert 'feature2' in [v['name'] for v in json.loads(destination.join('versions.json').read())['versions']]
+
+    # Deleted output is built again.
+    destination.join('v1.0.0').remove()
+    output = pytest.run(local_docs, command + ['--show-banner'])
+    assert 'Building ref: v1.0.0' in output
+    assert 'Skipping unchanged ref: feature2' in output
+    assert destination.join('v1.0.0', 'contents.html').check(file=True)
+
+
+def test_cache(tmpdir, local_docs):
+    """Test the cache sub command and pruning caches after building.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    cache_dir = tmpdir.join('cache')
+    with pytest.raises(CalledProcessError) as exc:
+        pytest.run(local_docs, ['sphinx-versioning', 'cache', '--cache-dir', str(cache_dir)])
+    assert 'Cache directory not found.' in exc.value.output
+
+    destination = tmpdir.join('destination')
+    command = ['sphinx-versioning', 'build', '--cache-dir', str(cache_dir), '.', str(destination)]
+    pytest.run(local_docs, command)
+    pytest.run(local_docs, command)
+    output = pytest.run(local_docs, ['sphinx-versioning', 'cache', '--cache-dir', str(cache_dir)])
+    rows = {l.split()[0]: l.split()[1:] for l in output.splitlines() if l.startswith('store:')}
+    assert rows['store:dates'][-1] == '50.0%'  # Second run found all dates.
+    assert int(rows['store:config'][0]) > 0
+
+    # Prune after building.
+    output = pytest.run(local_docs, command + ['--cache-max-size', '0', '--cache-max-size', 'store=1',
+                                               '--cache-max-age', '1'])
+    assert 'Removed 0 cache entries over budget.' in output
+    with pytest.raises(CalledProcessError) as exc:
+        pytest.run(local_docs, command + ['--cache-max-size', 'store=big'])
+    assert 'Budget must be a number or NAME=NUMBER' in exc.value.output
+
+    with pytest.raises(CalledProcessError) as exc:
+        pytest.run(local_docs, ['sphinx-versioning', 'cache', '--cache-dir', str(cache_dir), '--prune'])
+    assert 'Nothing to prune without' in exc.value.output
+
+    # Clear.
+    output = pytest.run(local_docs, ['sphinx-versioning', 'cache', '--cache-dir', str(cache_dir), '--clear'])
+    assert 'Deleted' in output
+    assert not [l for l in output.splitlines() if l.startswith('store:') and l.split()[1] != '0']
+
+
+@pytest.mark.skipif(str(IS_WINDOWS))
+def test_serve(local_docs):
+    """Test serving docs with versions built on first request.
+
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'branch', '--force', 'feature'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'feature'])
+    sock = socket.socket()
+    sock.bind(('127.0.0.1', 0))
+    port = sock.getsockname()[1]
+    sock.close()
+
+    command = ['sphinx-versioning', '-v', 'serve', '--port', str(port), '--copy-root', '.']
+    process = Popen(command, cwd=str(local_docs), stdout=PIPE, stderr=STDOUT)
+    url = 'http://127.0.0.1:{}/'.format(port)
+    try:
+        for _ in range(300):
+            try:
+                contents = urlopen(url + 'contents.html').read().decode('utf-8')
+                break
+            except IOError:
+                assert process.poll() is None
+                time.sleep(0.1)
+        else:
+            raise AssertionError('Server did not start.')
+        assert '<li><a href="feature/contents.html">feature</a></li>' in contents
+        contents = urlopen(url + 'feature/two.html').read().decode('utf-8')
+        assert '<li><a href="../master/two.html">master</a></li>' in contents
+    finally:
+        process.send_signal(signal.SIGINT)
+        output = process.communicate()[0].decode('utf-8')
+    assert 'Ignoring options that only apply to the build sub command: copy_root' in output
+    assert 'Building root: master' in output
+    assert 'Building ref: feature' in output
+    assert 'Building ref: master' not in output
+
+
+def test_error_archive(tmpdir, local_docs):
+    """Test bad archive file names and options that need a directory.
+
+    :param tmpdir: pytest fixture.
+    :param local_docs: conftest fixture.
+    """
+    with pytest.raises(CalledProcessError) as exc:
+        pytest.run(local_docs, ['sphinx-versioning', '-N', 'build', '--archive', '.', str(tmpdir.join('docs.rar'))])
+    assert 'Unsupported archive file extension' in exc.value.output
+
+    archive = str(tmpdir.join('docs.zip'))
+    with pytest.raises(CalledProcessError) as exc:
+        pytest.run(local_docs, ['sphinx-versioning', '-N', 'build', '--archive', '--manifest', '.', archive])
+    assert 'Archive output cannot be combined' in exc.value.output
+
+    tmpdir.ensure('docs.zip')
+    with pytest.raises(CalledProcessError) as exc:
+        pytest.run(local_docs, ['sphinx-versioning', '-N', 'build', '.', archive])
+    assert 'DESTINATION is a file. Use --archive to write an archive file.' in exc.value.output
+
+    # Overwrite the existing file.
+    output = pytest.run(local_docs, ['sphinx-versioning', '-N', 'build', '--archive', '.', archive])
+    assert 'Traceback' not in output
+    with zipfile.ZipFile(archive) as handle:
+        assert 'master/contents.html' in handle.namelist()
+
+
 def test_bad_banner(banner, local_docs):
     """Test bad banner main ref.
 
@@ -1,5 +1,6 @@
 """Test calls to main() with different command line options."""
 
+import json
 import os
 import re
 from subprocess import CalledProcessError, PIPE, Popen, STDOUT
@@ -8,14 +9,18 @@ import py
 import pytest
 
 
-def test_no_exclude(local_docs_ghp, urls):
+@pytest.mark.parametrize('no_worktree', [False, True])
+def test_no_exclude(local_docs_ghp, urls, no_worktree):
     """Test with successful push to remote. Don't remove/exclude any files.
 
     :param local_docs_ghp: conftest fixture.
     :param urls: conftest fixture.
+    :param bool no_worktree: Commit without cloning DEST_BRANCH.
     """
+    command = ['sphinx-versioning', 'push', '.', 'gh-pages', '.']
+    command += ['--no-worktree'] if no_worktree else []
     # Run.
-    output = pytest.run(local_docs_ghp, ['sphinx-versioning', 'push', '.', 'gh-pages', '.'])
+    output = pytest.run(local_docs_ghp, command)
     assert 'Traceback' not in output
     assert 'Failed to push to remote repository.' not in output
 
@@ -26,10 +31,10 @@ def test_no_exclude(local_docs_ghp, urls):
     urls(local_docs_ghp.join('master', 'contents.html'), ['<li><a href="contents.html">master</a></li>'])
 
     # Run again.
-    output = pytest.run(local_docs_ghp, ['sphinx-versioning', 'push', '.', 'gh-pages', '.'])
+    output = pytest.run(local_docs_ghp, command)
     assert 'Traceback' not in output
     assert 'Failed to push to remote repository.' not in output
-    assert 'No significant changes to commit.' in output
+    assert 'No changes to commit.' in output  # Doctrees are no longer written into the output.
 
     # Check SHAs.
     old_sha = pytest.run(local_docs_ghp, ['git', 'rev-parse', 'HEAD']).strip()
@@ -38,12 +43,16 @@ def test_no_exclude(local_docs_ghp, urls):
     assert sha == old_sha
 
 
-def test_exclude(local_docs_ghp, urls):
+@pytest.mark.parametrize('no_worktree', [False, True])
+def test_exclude(local_docs_ghp, urls, no_worktree):
     """Test excluding files and REL_DEST. Also test changing files.
 
     :param local_docs_ghp: conftest fixture.
     :param urls: conftest fixture.
+    :param bool no_worktree: Commit without cloning DEST_BRANCH.
     """
+    command = ['sphinx-versioning', 'push', '.', 'gh-pages', 'documents', '-e', 'keep.txt']
+    command += ['--no-worktree'] if no_worktree else []
     pytest.run(local_docs_ghp, ['git', 'checkout', 'gh-pages'])
     local_docs_ghp.ensure('documents', 'delete.txt').write('a')
     local_docs_ghp.ensure('documents', 'keep.txt').write('b')
@@ -52,7 +61,7 @@ def test_exclude(local_docs_ghp, urls):
     pytest.run(local_docs_ghp, ['git', 'push', 'origin', 'gh-pages'])
 
     # Run.
-    output = pytest.run(local_docs_ghp, ['sphinx-versioning', 'push', '.', 'gh-pages', 'documents', '-e', 'keep.txt'])
+    output = pytest.run(local_docs_ghp, command)
     assert 'Traceback' not in output
 
     # Check files.
@@ -70,7 +79,7 @@ def test_exclude(local_docs_ghp, urls):
     pytest.run(local_docs_ghp, ['git', 'push', 'origin', 'master'])
 
     # Run.
-    output = pytest.run(local_docs_ghp, ['sphinx-versioning', 'push', '.', 'gh-pages', 'documents', '-e', 'keep.txt'])
+    output = pytest.run(local_docs_ghp, command)
     assert 'Traceback' not in output
 
     # Check files.
@@ -85,6 +94,100 @@ def test_exclude(local_docs_ghp, urls):
     assert destination.join('keep.txt').check()
 
 
+@pytest.mark.parametrize('no_worktree', [False, True])
+def test_manifest(local_docs_ghp, no_worktree):
+    """Test committing the manifest with changes compared to the one from the previous push.
+
+    :param local_docs_ghp: conftest fixture.
+    :param bool no_worktree: Commit without cloning DEST_BRANCH.
+    """
+    command = ['sphinx-versioning', 'push', '--manifest', '.', 'gh-pages', 'html']
+    command += ['--no-worktree'] if no_worktree else []
+
+    # Run.
+    output = pytest.run(local_docs_ghp, command)
+    assert 'Traceback' not in output
+    pytest.run(local_docs_ghp, ['git', 'fetch', 'origin', 'gh-pages'])
+    manifest = json.loads(pytest.run(local_docs_ghp, ['git', 'show', 'FETCH_HEAD:html/.scv_manifest.json']))
+    assert 'master/contents.html' in manifest['versions']['master']['files']
+    assert 'contents.html' in manifest['root']['files']
+    assert 'master/contents.html' in manifest['changes']['added']
+    assert manifest['changes']['deleted'] == manifest['changes']['modified'] == []
+
+    # Change one page and run again.
+    local_docs_ghp.join('two.rst').write('Changed\n', mode='a')
+    pytest.run(local_docs_ghp, ['git', 'commit', '-am', 'Changed two.'])
+    pytest.run(local_docs_ghp, ['git', 'push', 'origin', 'master'])
+    output = pytest.run(local_docs_ghp, command)
+    assert 'Traceback' not in output
+    assert 'Output files since last run: 0 added, ' in output
+    pytest.run(local_docs_ghp, ['git', 'fetch', 'origin', 'gh-pages'])
+    manifest = json.loads(pytest.run(local_docs_ghp, ['git', 'show', 'FETCH_HEAD:html/.scv_manifest.json']))
+    assert manifest['changes']['added'] == manifest['changes']['deleted'] == []
+    assert 'master/two.html' in manifest['changes']['modified']
+    assert 'master/one.html' not in manifest['changes']['modified']
+
+
+@pytest.mark.parametrize('no_worktree', [False, True])
+def test_incremental(local_docs_ghp, no_worktree):
+    """Test keeping unchanged refs in DEST_BRANCH without building them again.
+
+    :param local_docs_ghp: conftest fixture.
+    :param bool no_worktree: Commit without cloning DEST_BRANCH.
+    """
+    pytest.run(local_docs_ghp, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs_ghp, ['git', 'push', 'origin', 'v1.0.0'])
+    command = ['sphinx-versioning', 'push', '--incremental', '.', 'gh-pages', 'html', '-e', 'keep.txt']
+    command += ['--no-worktree'] if no_worktree else []
+    output = pytest.run(local_docs_ghp, command)
+    assert 'Skipping unchanged ref' not in output
+    pytest.run(local_docs_ghp, ['git', 'fetch', 'origin', 'gh-pages'])
+    state = json.loads(pytest.run(local_docs_ghp, ['git', 'show', 'FETCH_HEAD:html/.scv_state.json']))
+    assert sorted(state['refs']) == ['master', 'v1.0.0']
+
+    # Change master only.
+    local_docs_ghp.join('two.rst').write('Changed\n', mode='a')
+    pytest.run(local_docs_ghp, ['git', 'commit', '-am', 'Changed two.'])
+    pytest.run(local_docs_ghp, ['git', 'push', 'origin', 'master'])
+    output = pytest.run(local_docs_ghp, command)
+    assert 'Skipping unchanged ref: v1.0.0' in output
+    assert 'Successfully pushed to remote repository.' in output
+    pytest.run(local_docs_ghp, ['git', 'fetch', 'origin', 'gh-pages'])
+    assert 'Changed' in pytest.run(local_docs_ghp, ['git', 'show', 'FETCH_HEAD:html/master/two.html'])
+    assert 'Changed' not in pytest.run(local_docs_ghp, ['git', 'show', 'FETCH_HEAD:html/v1.0.0/two.html'])
+
+    # Manifest lists files of every version so it needs them all.
+    with pytest.raises(CalledProcessError) as exc:
+        pytest.run(local_docs_ghp, command + ['--manifest'])
+    assert 'Incremental builds cannot be combined with writing a manifest' in exc.value.output
+
+
+@pytest.mark.parametrize('no_worktree', [False, True])
+def test_skip_unchanged(local_docs_ghp, no_worktree):
+    """Test exiting early without building or cloning when nothing changed since the last push.
+
+    :param local_docs_ghp: conftest fixture.
+    :param bool no_worktree: Commit without cloning DEST_BRANCH.
+    """
+    command = ['sphinx-versioning', 'push', '--skip-unchanged', '.', 'gh-pages', '.']
+    command += ['--no-worktree'] if no_worktree else []
+    output = pytest.run(local_docs_ghp, command)
+    assert 'Successfully pushed to remote repository.' in output
+
+    # Same refs. The push to gh-pages doesn't count as a change.
+    output = pytest.run(local_docs_ghp, command)
+    assert 'Nothing changed since the last run. Skipping.' in output
+    assert 'Building docs...' not in output
+
+    # New commit.
+    local_docs_ghp.join('two.rst').write('Changed\n', mode='a')
+    pytest.run(local_docs_ghp, ['git', 'commit', '-am', 'Changed two.'])
+    pytest.run(local_docs_ghp, ['git', 'push', 'origin', 'master'])
+    output = pytest.run(local_docs_ghp, command)
+    assert 'Successfully pushed to remote repository.' in output
+    assert 'Nothing changed since the last run.' in pytest.run(local_docs_ghp, command)
+
+
 def test_root_ref(local_docs_ghp):
     """Test passing root_ref value from push Click command to build Click command.
 
@@ -110,7 +213,8 @@ def test_race(tmpdir, local_docs_ghp, remote, urls, give_up):
     :param local_docs_ghp: conftest fixture.
     :param remote: conftest fixture.
     :param urls: conftest fixture.
-    :param bool give_up: Cause multiple race conditions causing timeout/giveup.
+    :param bool give_up: Cause multiple race conditions causing timeout/giveup. Also changes a source branch each time
+        so docs are rebuilt before every attempt.
     """
     local_other = tmpdir.ensure_dir('local_other')
     pytest.run(local_other, ['git', 'clone', remote, '--branch=gh-pages', '.'])
@@ -131,6 +235,8 @@ def test_race(tmpdir, local_docs_ghp, remote, urls, give_up):
                 local_other.join('README').write('changed', mode='a')
                 pytest.run(local_other, ['git', 'commit', '-am', 'Cause race condition.'])
                 pytest.run(local_other, ['git', 'push', 'origin', 'gh-pages'])
+                if give_up:
+                    pytest.run(local_other, ['git', 'push', 'origin', 'gh-pages:race{}'.format(len(output_lines))])
                 caused = True
     output_lines.append(proc.communicate()[0])
     output = b''.join(output_lines).decode('utf-8')
@@ -147,8 +253,12 @@ def test_race(tmpdir, local_docs_ghp, remote, urls, give_up):
     if give_up:
         assert 'Successfully pushed to remote repository.' not in output
         assert 'Ran out of retries, giving up.' in output
+        assert output.count('Building docs...') == 3
+        assert output.count('Remote branches/tags changed since building docs. Rebuilding...') == 2
         return
     assert 'Successfully pushed to remote repository.' in output
+    assert output.count('Building docs...') == 1
+    assert output.count('Cloning gh-pages into temporary directory...') == 2
 
     # Verify files.
     pytest.run(local_docs_ghp, ['git', 'checkout', 'gh-pages'])
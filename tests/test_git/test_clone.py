@@ -86,12 +86,35 @@ def test_exclude_subdir(tmpdir, local):
     new_root = tmpdir.ensure_dir('new_root')
     clone(str(local), str(new_root), 'origin', 'master', 'sub', ['three.txt'])
     paths = sorted(f.relto(new_root) for f in new_root.visit() if new_root.join('.git') not in f.parts())
-    assert paths == ['README', 'sub', join('sub', 'three.txt')]
+    assert paths == ['sub', join('sub', 'three.txt')]  # Only REL_DEST is checked out.
 
     status = pytest.run(new_root, ['git', 'status', '--porcelain'])
     assert status == 'D  sub/four.txt\n'
 
 
+def test_reference(tmpdir, local):
+    """Test reusing objects from the local repo and checking out only REL_DEST.
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    local.ensure('sub', 'three.txt').write('three')
+    pytest.run(local, ['git', 'add', 'sub'])
+    pytest.run(local, ['git', 'commit', '-m', 'Adding new files.'])
+    pytest.run(local, ['git', 'push', 'origin', 'master'])
+
+    new_root = tmpdir.ensure_dir('new_root')
+    clone(str(local), str(new_root), 'origin', 'master', 'sub', None)
+    alternates = new_root.join('.git', 'objects', 'info', 'alternates').read()
+    assert alternates.strip() == str(local.join('.git', 'objects'))
+    assert new_root.join('sub', 'three.txt').read() == 'three'
+    assert not new_root.join('README').check()
+
+    # Files outside of REL_DEST are still tracked and unchanged.
+    assert pytest.run(new_root, ['git', 'ls-files']).splitlines() == ['README', 'sub/three.txt']
+    assert pytest.run(new_root, ['git', 'status', '--porcelain']) == ''
+
+
 def test_exclude_patterns(tmpdir, local):
     """Test with grm_dir set to a subdirectory.
 
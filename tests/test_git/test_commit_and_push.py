@@ -52,6 +52,7 @@ def test_nothing_significant_to_commit(caplog, local, subdirs):
     """
     local.ensure('sub' if subdirs else '', '.doctrees', 'file.bin').write('data')
     local.ensure('sub' if subdirs else '', 'searchindex.js').write('data')
+    local.ensure('sub' if subdirs else '', '.scv_manifest.json').write('data')
     old_sha = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
     actual = commit_and_push(str(local), 'origin', Versions(REMOTES))
     assert actual is True
@@ -64,6 +65,7 @@ def test_nothing_significant_to_commit(caplog, local, subdirs):
 
     local.ensure('sub' if subdirs else '', '.doctrees', 'file.bin').write('changed')
     local.ensure('sub' if subdirs else '', 'searchindex.js').write('changed')
+    local.ensure('sub' if subdirs else '', '.scv_manifest.json').write('changed')
     old_sha = sha
     records_seek = len(caplog.records)
     actual = commit_and_push(str(local), 'origin', Versions(REMOTES))
@@ -114,6 +116,30 @@ def test_changes(monkeypatch, local):
     assert body == 'LANG: en_US.UTF-8\nTRAVIS_BRANCH: master\nTRAVIS_BUILD_ID: 12345'
 
 
+def test_paths(local):
+    """Test staging only the given paths (plus already staged changes).
+
+    :param local: conftest fixture.
+    """
+    old_sha = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+    local.ensure('new', 'new.txt')
+    local.ensure('new', 'ignored.txt')
+    local.join('README').write('test\n', mode='a')
+    local.join('staged.txt').write('staged')
+    pytest.run(local, ['git', 'add', 'staged.txt'])
+
+    actual = commit_and_push(str(local), 'origin', Versions(REMOTES), paths=['new/new.txt'])
+    assert actual is True
+    sha = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+    assert sha != old_sha
+
+    # Verify only new.txt and staged.txt were committed.
+    output = pytest.run(local, ['git', 'diff-tree', '--no-commit-id', '--name-status', '-r', 'HEAD'])
+    assert output.splitlines() == ['A\tnew/new.txt', 'A\tstaged.txt']
+    output = pytest.run(local, ['git', 'status', '--porcelain'])
+    assert output.splitlines() == [' M README', '?? new/ignored.txt']
+
+
 def test_branch_deleted(local):
     """Test scenario where branch is deleted by someone.
 
@@ -0,0 +1,31 @@
+"""Test function in module."""
+
+import pytest
+
+from sphinxcontrib.versioning.git import get_tree_sha, GitError
+
+
+def test(local_docs):
+    """Test function.
+
+    :param local_docs: conftest fixture.
+    """
+    local_docs.ensure('docs', 'conf.py')
+    pytest.run(local_docs, ['git', 'add', 'docs'])
+    pytest.run(local_docs, ['git', 'commit', '-m', 'Adding docs subdirectory.'])
+    first = pytest.run(local_docs, ['git', 'rev-parse', 'HEAD']).strip()
+    local_docs.join('README').write('Changed outside of docs.')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed README.'])
+    second = pytest.run(local_docs, ['git', 'rev-parse', 'HEAD']).strip()
+
+    # Docs directory unchanged.
+    assert get_tree_sha(str(local_docs), first, 'docs') == get_tree_sha(str(local_docs), second, 'docs')
+    expected = pytest.run(local_docs, ['git', 'rev-parse', 'HEAD:docs']).strip()
+    assert get_tree_sha(str(local_docs), first, 'docs') == expected
+
+    # Root directory changed.
+    assert get_tree_sha(str(local_docs), first, '') != get_tree_sha(str(local_docs), second, '.')
+
+    # Missing directory.
+    with pytest.raises(GitError):
+        get_tree_sha(str(local_docs), first, 'unknown')
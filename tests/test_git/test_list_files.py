@@ -0,0 +1,39 @@
+"""Test function in module."""
+
+import pytest
+
+from sphinxcontrib.versioning.git import GitError, list_files, show_file
+
+
+def test(local_docs):
+    """Test function.
+
+    :param local_docs: conftest fixture.
+    """
+    local_docs.ensure('docs', 'sub', 'page.rst').write('Page\n====\n')
+    local_docs.ensure('docs', 'conf.py').write('master_doc = "index"\n')
+    pytest.run(local_docs, ['git', 'add', 'docs'])
+    pytest.run(local_docs, ['git', 'commit', '-m', 'Adding docs subdirectory.'])
+    sha = pytest.run(local_docs, ['git', 'rev-parse', 'HEAD']).strip()
+
+    # Test root and subdirectory.
+    expected = ['README', 'conf.py', 'contents.rst', 'docs/conf.py', 'docs/sub/page.rst', 'one.rst', 'three.rst',
+                'two.rst']
+    assert sorted(list_files(str(local_docs), sha, '')) == expected
+    assert sorted(list_files(str(local_docs), sha, '.')) == expected
+    assert sorted(list_files(str(local_docs), sha, 'docs')) == ['conf.py', 'sub/page.rst']
+
+    # Test reading files.
+    assert show_file(str(local_docs), sha, 'docs/conf.py') == 'master_doc = "index"\n'
+    assert show_file(str(local_docs), sha, 'conf.py') == ''
+
+
+def test_bad_commit(local_docs):
+    """Test with unknown commits and files.
+
+    :param local_docs: conftest fixture.
+    """
+    with pytest.raises(GitError):
+        list_files(str(local_docs), 'a' * 40, '')
+    with pytest.raises(GitError):
+        show_file(str(local_docs), 'HEAD', 'unknown.py')
@@ -0,0 +1,108 @@
+"""Test function in module."""
+
+import os
+
+import pytest
+
+from sphinxcontrib.versioning.git import (
+    fetch_branch, init_scratch, IS_WINDOWS, list_files, matches_exclude, show_file, write_tree,
+)
+
+
+@pytest.mark.parametrize('exclude', [False, True])
+def test(tmpdir, local, exclude):
+    """Test function.
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    :param bool exclude: Delete old files in rel_dest except for excluded ones.
+    """
+    local.ensure('html', 'old.html').write('old')
+    local.ensure('html', 'keep', 'keep.txt').write('keep')
+    pytest.run(local, ['git', 'add', 'html'])
+    pytest.run(local, ['git', 'commit', '-m', 'Adding html.'])
+    parent = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+
+    source = tmpdir.ensure_dir('source')
+    source.ensure('index.html').write('new')
+    source.ensure('sub', 'page.html').write('page')
+
+    # Run.
+    objects = pytest.run(local, ['git', 'count-objects'])
+    scratch = tmpdir.ensure_dir('scratch')
+    init_scratch(str(local), str(scratch))
+    tree = write_tree(str(scratch), parent, 'html', ['keep'] if exclude else [], str(source))
+    pytest.run(local, ['git', 'diff-index', '--quiet', 'HEAD', '--'])  # Working tree and index untouched.
+    assert pytest.run(local, ['git', 'count-objects']) == objects  # No blobs written to the local repo.
+
+    # Verify.
+    expected = ['index.html', 'keep/keep.txt', 'sub/page.html'] + ([] if exclude else ['old.html'])
+    assert sorted(list_files(str(scratch), tree, 'html')) == sorted(expected)
+    assert show_file(str(scratch), tree, 'html/sub/page.html') == 'page'
+    assert show_file(str(scratch), tree, 'README') == show_file(str(local), parent, 'README')
+
+
+@pytest.mark.skipif(str(IS_WINDOWS))
+def test_modes(tmpdir, local):
+    """Test executable files and symlinks.
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    """
+    parent = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+    source = tmpdir.ensure_dir('source')
+    source.ensure('run.sh').write('#!/bin/sh\n')
+    source.join('run.sh').chmod(0o755)
+    os.symlink('run.sh', str(source.join('link.sh')))
+
+    scratch = tmpdir.ensure_dir('scratch')
+    init_scratch(str(local), str(scratch))
+    tree = write_tree(str(scratch), parent, '.', [], str(source))
+    output = pytest.run(scratch, ['git', 'ls-tree', tree, 'link.sh', 'run.sh'])
+    assert [l.split()[0] for l in output.splitlines()] == ['120000', '100755']
+    assert show_file(str(scratch), tree, 'link.sh') == 'run.sh'
+
+
+def test_fetch_branch(tmpdir, local, remote):
+    """Test fetching only the head of a branch into a scratch repo, leaving the local repo alone.
+
+    :param tmpdir: pytest fixture.
+    :param local: conftest fixture.
+    :param remote: conftest fixture.
+    """
+    pytest.run(local, ['git', 'checkout', '--orphan', 'gh-pages'])
+    for i in range(3):
+        local.join('README').write('Commit {}'.format(i))
+        pytest.run(local, ['git', 'add', 'README'])
+        pytest.run(local, ['git', 'commit', '-m', 'Commit {}'.format(i)])
+    head = pytest.run(local, ['git', 'rev-parse', 'HEAD']).strip()
+    pytest.run(local, ['git', 'push', 'origin', 'gh-pages'])
+    pytest.run(local, ['git', 'checkout', 'master'])
+    pytest.run(local, ['git', 'branch', '-D', 'gh-pages'])
+    pytest.run(local, ['git', 'update-ref', '-d', 'refs/remotes/origin/gh-pages'])
+    refs = pytest.run(local, ['git', 'show-ref'])
+
+    scratch = tmpdir.ensure_dir('scratch')
+    init_scratch(str(local), str(scratch))
+    assert fetch_branch(str(scratch), 'origin', 'gh-pages') == head
+    assert len(pytest.run(scratch, ['git', 'rev-list', head]).split()) == 1  # Shallow.
+    assert pytest.run(local, ['git', 'show-ref']) == refs
+    assert not local.join('.git', 'FETCH_HEAD').check()
+
+
+@pytest.mark.parametrize('rel_path,exclude,expected', [
+    ('keep.txt', ['keep.txt'], True),
+    ('sub/keep.txt', ['sub'], True),
+    ('sub/keep.txt', ['*/*.txt'], True),
+    ('sub/keep.txt', ['*.txt'], False),
+    ('.hidden', ['*'], False),
+    ('.hidden', ['.*'], True),
+])
+def test_matches_exclude(rel_path, exclude, expected):
+    """Test glob matching like glob.glob() in clone().
+
+    :param str rel_path: Test this path.
+    :param list exclude: Test these patterns.
+    :param bool expected: Expected return value.
+    """
+    assert matches_exclude(rel_path, exclude) is expected
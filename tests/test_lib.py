@@ -1,8 +1,11 @@
 """Test objects in module."""
 
+import os
+import time
+
 import pytest
 
-from sphinxcontrib.versioning.lib import Config
+from sphinxcontrib.versioning.lib import Cache, Config
 
 
 def test_config():
@@ -23,25 +26,41 @@ def test_config():
     # Verify iter.
     actual = sorted(config)
     expected = [
+        ('archive', False),
         ('banner_greatest_tag', False),
         ('banner_main_ref', 'master'),
         ('banner_recent_tag', False),
+        ('cache_dir', None),
+        ('cache_max_age', tuple()),
+        ('cache_max_size', tuple()),
         ('chdir', None),
+        ('copy_root', False),
+        ('dedup_static', None),
+        ('dedup_trees', False),
         ('git_root', None),
         ('greatest_tag', False),
         ('grm_exclude', tuple()),
+        ('incremental', False),
         ('invert', True),
         ('local_conf', None),
+        ('manifest', False),
         ('no_colors', False),
         ('no_local_conf', False),
+        ('no_worktree', False),
         ('overflow', ('-D', 'key=value')),
+        ('prefetch', 0),
         ('priority', None),
         ('push_remote', 'origin'),
         ('recent_tag', False),
+        ('refresh_cache', False),
+        ('reproducible', False),
         ('root_ref', 'master'),
         ('show_banner', False),
+        ('skip_unchanged', False),
         ('sort', tuple()),
+        ('static_conf', False),
         ('verbose', 1),
+        ('versions_json', False),
         ('whitelist_branches', tuple()),
         ('whitelist_tags', tuple()),
     ]
@@ -70,3 +89,43 @@ def test_config():
     with pytest.raises(AttributeError) as exc:
         config.update(dict(invert=False))
     assert exc.value.args[0] == "'Config' object does not support item re-assignment on 'invert'"
+
+
+def test_cache(monkeypatch, tmpdir):
+    """Test lib.Cache.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    """
+    cache = Cache(str(tmpdir), 'test')
+    assert cache.get('one') is None
+    for i, key in enumerate(('one', 'two', 'three')):
+        path = cache.put(key, b'x' * 100)
+        os.utime(path, (time.time() - 100 + i, time.time() - 100 + i))  # Oldest first.
+    assert not [p for p in tmpdir.join('test').listdir() if p.basename.startswith('.tmp')]
+    assert cache.read('one') == b'x' * 100  # Most recently used now.
+    cache.close()
+    assert cache.usage() == (3, 300)
+    assert cache.stats() == dict(hits=1, misses=1)
+
+    # Least recently used first.
+    cache = Cache(str(tmpdir), 'test')
+    assert cache.prune(max_size=250) == 1
+    assert cache.get('two') is None
+    assert cache.prune(max_age=50) == 1
+    assert cache.get('three') is None
+    assert cache.get('one') is not None
+    cache.close()
+    assert cache.stats() == dict(hits=2, misses=3)
+
+    # Deleted by another process (e.g. pruning) between looking it up and reading it.
+    utime = os.utime
+    monkeypatch.setattr(os, 'utime', lambda p, t: utime(p, t) or os.remove(p))
+    cache = Cache(str(tmpdir), 'test')  # Directory exists.
+    assert cache.read('one') is None
+    assert cache.misses == 1
+    monkeypatch.undo()
+    cache.put('four', b'x')
+
+    assert cache.clear() == 1
+    assert cache.usage() == (0, 0)
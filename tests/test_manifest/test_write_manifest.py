@@ -0,0 +1,52 @@
+"""Test functions in module."""
+
+import json
+
+from sphinxcontrib.versioning.manifest import build_manifest, MANIFEST_FILE, read_manifest, write_manifest
+from sphinxcontrib.versioning.versions import Versions
+
+REMOTES = (
+    ('abaaa358379408d997255ec8155db30cea2a61a8', 'master', 'heads', 1465764862, 'docs/conf.py'),
+    ('3b7987d8f5f50457f960cfbb04f69b4f1cb3e5ac', 'v1.0.0', 'tags', 1433133463, 'docs/conf.py'),
+)
+
+
+def test(tmpdir):
+    """Test listing files per version and changes since the previous manifest.
+
+    :param tmpdir: pytest fixture.
+    """
+    versions = Versions(REMOTES)
+    for remote in versions.remotes:
+        remote['root_dir'] = remote['name']
+    destination = tmpdir.ensure_dir('destination')
+    destination.ensure('contents.html').write('root')
+    destination.ensure('master', 'contents.html').write('master')
+    destination.ensure('v1.0.0', 'contents.html').write('tag')
+    destination.ensure('v1.0.0', 'old.html').write('old')
+
+    # First run.
+    assert read_manifest(str(destination)) is None
+    manifest = build_manifest(str(destination), versions)
+    changes = write_manifest(str(destination), manifest, None)
+    assert changes == dict(
+        added=['contents.html', 'master/contents.html', 'v1.0.0/contents.html', 'v1.0.0/old.html'],
+        deleted=[],
+        modified=[],
+    )
+    written = json.loads(destination.join(MANIFEST_FILE).read())
+    assert written == read_manifest(str(destination))
+    assert sorted(written['root']['files']) == ['contents.html']
+    assert sorted(written['versions']['v1.0.0']['files']) == ['v1.0.0/contents.html', 'v1.0.0/old.html']
+    assert written['versions']['v1.0.0']['sha'] == '3b7987d8f5f50457f960cfbb04f69b4f1cb3e5ac'
+    expected = dict(sha1='4f26aeafdb2367620a393c973eddbe8f8b846ebd', size=6)
+    assert written['versions']['master']['files']['master/contents.html'] == expected
+
+    # Second run.
+    destination.join('master', 'contents.html').write('changed')
+    destination.join('v1.0.0', 'old.html').remove()
+    destination.ensure('v1.0.0', 'new.html').write('new')
+    previous = read_manifest(str(destination))
+    changes = write_manifest(str(destination), build_manifest(str(destination), versions), previous)
+    assert changes == dict(added=['v1.0.0/new.html'], deleted=['v1.0.0/old.html'], modified=['master/contents.html'])
+    assert MANIFEST_FILE not in read_manifest(str(destination))['root']['files']
@@ -0,0 +1,61 @@
+"""Test class in module."""
+
+import tarfile
+import zipfile
+
+import py
+import pytest
+
+from sphinxcontrib.versioning.output import archive_mode, ArchiveOutput
+
+
+@pytest.mark.parametrize('name,mode', [
+    ('docs.tar', 'w|'),
+    ('docs.TAR.GZ', 'w|gz'),
+    ('docs.tgz', 'w|gz'),
+    ('docs.tar.bz2', 'w|bz2'),
+    ('docs.zip', 'zip'),
+    ('docs.rar', None),
+    ('docs', None),
+])
+def test_archive_mode(name, mode):
+    """Test detecting the archive format from the file extension.
+
+    :param str name: File name to test.
+    :param str mode: Expected mode.
+    """
+    assert archive_mode(name) == mode
+
+
+@pytest.mark.parametrize('name', ['docs.tar.gz', 'docs.zip'])
+def test(tmpdir, name):
+    """Test adding versions to the archive one at a time and starting over.
+
+    :param tmpdir: pytest fixture.
+    :param str name: Archive file name.
+    """
+    path = tmpdir.join(name)
+    output = ArchiveOutput(str(path))
+    target = output.target('master')
+    py.path.local(target).ensure('stale.html').write('stale')
+    output.done('master')
+    assert not py.path.local(target).check()
+
+    # Start over.
+    output.reset()
+    py.path.local(output.target('')).ensure('contents.html').write('root')
+    py.path.local(output.target('master')).ensure('_static', 'style.css').write('css')
+    output.done('')
+    output.done('master')
+    leftover = output.target('v1.0.0')
+    output.close()
+    assert not py.path.local(leftover).check()
+
+    # Verify.
+    if name.endswith('.zip'):
+        with zipfile.ZipFile(str(path)) as archive:
+            files = {n: archive.read(n) for n in archive.namelist()}
+    else:
+        with tarfile.open(str(path)) as archive:
+            files = {m.name: archive.extractfile(m).read() for m in archive.getmembers() if m.isfile()}
+    assert files == {'contents.html': b'root', 'master/_static/style.css': b'css'}
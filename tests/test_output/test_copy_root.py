@@ -0,0 +1,38 @@
+"""Test function in module."""
+
+from sphinxcontrib.versioning.output import copy_root
+
+
+def test(tmpdir):
+    """Test function.
+
+    :param tmpdir: pytest fixture.
+    """
+    source = tmpdir.ensure_dir('dst', 'master')
+    source.ensure('.doctrees', 'contents.doctree')
+    source.ensure('_static', 'banner.css').write('a {}')
+    source.join('contents.html').write(
+        '<link rel="stylesheet" href="_static/banner.css" type="text/css" />\n'
+        '<li><a href="contents.html">master</a></li>\n'
+        "<li><a href='../v1.0.0/contents.html'>v1.0.0</a></li>\n"
+    )
+    source.ensure('sub', 'page.html').write(
+        '<img src="../_images/one.png" />\n'
+        '<li><a href="page.html">master</a></li>\n'
+        '<li><a href="../../v1.0.0/sub/page.html">v1.0.0</a></li>\n'
+    )
+
+    copy_root(str(source), str(tmpdir.join('dst')))
+    destination = tmpdir.join('dst')
+    assert not destination.join('.doctrees').check()
+    assert destination.join('_static', 'banner.css').read() == 'a {}'
+    assert destination.join('contents.html').read() == (
+        '<link rel="stylesheet" href="_static/banner.css" type="text/css" />\n'
+        '<li><a href="contents.html">master</a></li>\n'
+        "<li><a href='v1.0.0/contents.html'>v1.0.0</a></li>\n"
+    )
+    assert destination.join('sub', 'page.html').read() == (
+        '<img src="../_images/one.png" />\n'
+        '<li><a href="page.html">master</a></li>\n'
+        '<li><a href="../v1.0.0/sub/page.html">v1.0.0</a></li>\n'
+    )
@@ -0,0 +1,70 @@
+"""Test function in module."""
+
+import os
+
+from sphinxcontrib.versioning.output import copy_tree
+
+
+def test(tmpdir):
+    """Test function.
+
+    :param tmpdir: pytest fixture.
+    """
+    source = tmpdir.ensure_dir('source')
+    source.ensure('contents.html').write('new')
+    source.ensure('sub', 'page.html').write('page')
+    destination = tmpdir.ensure_dir('destination')
+    destination.ensure('contents.html').write('old')
+    destination.ensure('stale.html').write('stale')
+
+    copy_tree(str(source), str(destination.join('html')))
+    assert destination.join('html', 'sub', 'page.html').read() == 'page'
+
+    copy_tree(str(source), str(destination))
+    assert destination.join('contents.html').read() == 'new'
+    assert destination.join('sub', 'page.html').read() == 'page'
+    assert destination.join('stale.html').read() == 'stale'
+
+
+def test_unchanged(tmpdir):
+    """Test files with the same contents aren't written again.
+
+    :param tmpdir: pytest fixture.
+    """
+    source = tmpdir.ensure_dir('source')
+    source.ensure('same.html').write('same')
+    source.ensure('size.html').write('new')
+    destination = tmpdir.ensure_dir('destination')
+    destination.ensure('same.html').write('same')
+    destination.ensure('size.html').write('old')
+    for path in (destination.join('same.html'), destination.join('size.html')):
+        path.setmtime(1000000000)
+
+    assert copy_tree(str(source), str(destination)) == ['size.html']
+    assert destination.join('same.html').mtime() == 1000000000
+    assert destination.join('size.html').mtime() != 1000000000
+    assert destination.join('size.html').read() == 'new'
+
+
+def test_exclude(tmpdir):
+    """Test deleting stale files.
+
+    :param tmpdir: pytest fixture.
+    """
+    source = tmpdir.ensure_dir('source')
+    source.ensure('contents.html').write('new')
+    destination = tmpdir.ensure_dir('destination')
+    destination.ensure('stale.html').write('stale')
+    destination.ensure('old', 'stale.html').write('stale')
+    destination.ensure('.git', 'HEAD').write('ref')
+    destination.ensure('.gitignore').write('ignore')
+    destination.ensure('keep', 'file.txt').write('keep')
+
+    changed = copy_tree(str(source), str(destination), ['.gitignore', 'keep'])
+    assert sorted(changed) == ['contents.html', os.path.join('old', 'stale.html'), 'stale.html']
+    assert destination.join('contents.html').read() == 'new'
+    assert not destination.join('stale.html').check()
+    assert not destination.join('old', 'stale.html').check()
+    assert destination.join('.git', 'HEAD').check()
+    assert destination.join('.gitignore').check()
+    assert destination.join('keep', 'file.txt').check()
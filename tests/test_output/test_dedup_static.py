@@ -0,0 +1,75 @@
+"""Test function in module."""
+
+import pytest
+
+from sphinxcontrib.versioning.git import IS_WINDOWS
+from sphinxcontrib.versioning.output import dedup_static, SHARED_STATIC
+
+
+@pytest.fixture
+def destination(tmpdir):
+    """Create two versions with one identical and one different static file.
+
+    :param tmpdir: pytest fixture.
+
+    :return: Web root directory.
+    :rtype: py.path.local
+    """
+    destination = tmpdir.ensure_dir('destination')
+    for name, theme in (('v1', 'a {}'), ('v2', 'b {}')):
+        destination.ensure(name, '_static', 'jquery.js').write('jQuery')
+        destination.ensure(name, '_static', 'theme.css').write(theme)
+        destination.ensure(name, '_static', 'spinner.gif').write('gif')
+        destination.ensure(name, 'sub', 'page.html').write(
+            '<script src="../_static/jquery.js"></script>\n'
+            '<link href="../_static/theme.css" />\n'
+            '<a href="http://example.com/_static/jquery.js">jQuery</a>\n'
+        )
+    return destination
+
+
+@pytest.mark.skipif(str(IS_WINDOWS))
+@pytest.mark.parametrize('mode', ['hardlink', 'symlink'])
+def test_links(destination, mode):
+    """Test replacing duplicates with links.
+
+    :param destination: Fixture defined above.
+    :param str mode: Replace duplicates with this kind of link.
+    """
+    version_dirs = [str(destination.join('v1')), str(destination.join('v2'))]
+    dedup_static(str(destination), version_dirs, mode)
+
+    shared = destination.join(SHARED_STATIC)
+    assert sorted(f.ext for f in shared.listdir()) == ['.gif', '.js']
+    for name in ('v1', 'v2'):
+        jquery = destination.join(name, '_static', 'jquery.js')
+        assert jquery.read() == 'jQuery'
+        assert jquery.islink() is (mode == 'symlink')
+        if mode == 'hardlink':
+            assert jquery.stat().nlink == 3  # Two versions plus the shared copy.
+        assert not destination.join(name, '_static', 'theme.css').islink()
+
+    # HTML is left alone.
+    assert destination.join('v1', 'sub', 'page.html').read().startswith('<script src="../_static/jquery.js">')
+
+
+def test_rewrite(destination):
+    """Test deleting duplicates and rewriting URLs.
+
+    :param destination: Fixture defined above.
+    """
+    version_dirs = [str(destination.join('v1')), str(destination.join('v2'))]
+    dedup_static(str(destination), version_dirs, 'rewrite')
+
+    # Only jquery.js is referenced by HTML files and isn't CSS.
+    shared = destination.join(SHARED_STATIC).listdir()
+    assert [f.ext for f in shared] == ['.js']
+    for name in ('v1', 'v2'):
+        assert not destination.join(name, '_static', 'jquery.js').check()
+        assert destination.join(name, '_static', 'theme.css').check()
+        assert destination.join(name, '_static', 'spinner.gif').check()
+        assert destination.join(name, 'sub', 'page.html').read() == (
+            '<script src="../../{}/{}"></script>\n'
+            '<link href="../_static/theme.css" />\n'
+            '<a href="http://example.com/_static/jquery.js">jQuery</a>\n'
+        ).format(SHARED_STATIC, shared[0].basename)
@@ -0,0 +1,27 @@
+"""Test function in module."""
+
+import gzip
+
+from sphinxcontrib.versioning.output import precompress
+
+
+def test_precompress(tmpdir):
+    """Test compressing text files and skipping small or binary ones.
+
+    :param tmpdir: pytest fixture.
+    """
+    contents = b'<html>' + b'Hello World. ' * 100 + b'</html>'
+    tmpdir.ensure('index.html').write(contents, 'wb')
+    tmpdir.ensure('_static', 'theme.css').write('a {}' * 100)
+    tmpdir.ensure('_static', 'small.js').write('var a;')
+    tmpdir.ensure('_static', 'spinner.gif').write('gif' * 100)
+
+    assert precompress(str(tmpdir)) == 2
+    assert sorted(p.basename for p in tmpdir.visit('*.gz')) == ['index.html.gz', 'theme.css.gz']
+    with gzip.open(str(tmpdir.join('index.html.gz'))) as handle:
+        assert handle.read() == contents
+
+    # Same output every time (no timestamp in the header).
+    before = tmpdir.join('index.html.gz').read('rb')
+    assert precompress(str(tmpdir)) == 2
+    assert tmpdir.join('index.html.gz').read('rb') == before
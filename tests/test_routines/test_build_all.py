@@ -1,12 +1,18 @@
 """Test function in module."""
 
+import json
+import os
 import re
+import tarfile
+import time
+import zipfile
 from os.path import join
 
 import pytest
 
 from sphinxcontrib.versioning.git import export
 from sphinxcontrib.versioning.lib import HandledError
+from sphinxcontrib.versioning.output import SHARED_STATIC
 from sphinxcontrib.versioning.routines import build_all, gather_git_info
 from sphinxcontrib.versioning.versions import Versions
 
@@ -31,11 +37,9 @@ def test_single(tmpdir, local_docs, urls):
     build_all(str(exported_root), str(destination), versions)
     actual = sorted(f.relto(destination) for f in destination.visit() if f.check(dir=True))
     expected = [
-        '.doctrees',
         '_sources',
         '_static',
         'master',
-        join('master', '.doctrees'),
         join('master', '_sources'),
         join('master', '_static'),
     ]
@@ -76,22 +80,18 @@ def test_multiple(tmpdir, config, local_docs, urls, triple, parallel):
     build_all(str(exported_root), str(destination), versions)
     actual = sorted(f.relto(destination) for f in destination.visit() if f.check(dir=True))
     expected = [
-        '.doctrees',
         '_sources',
         '_static',
         'master',
-        join('master', '.doctrees'),
         join('master', '_sources'),
         join('master', '_static'),
         'v1.0.0',
-        join('v1.0.0', '.doctrees'),
         join('v1.0.0', '_sources'),
         join('v1.0.0', '_static'),
     ]
     if triple:
         expected.extend([
             'v1.0.1',
-            join('v1.0.1', '.doctrees'),
             join('v1.0.1', '_sources'),
             join('v1.0.1', '_static'),
         ])
@@ -413,3 +413,259 @@ def test_all_errors(tmpdir, local_docs, urls):
     # Verify root HTML links.
     urls(destination.join('contents.html'), ['<li><a href="master/contents.html">master</a></li>'])
     urls(destination.join('master', 'contents.html'), ['<li><a href="contents.html">master</a></li>'])
+
+
+def test_copy_root(tmpdir, config, local_docs, urls):
+    """Test building the root ref only once and copying it to the web root.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    config.copy_root = True
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+
+    # Export (git tags point to same master sha).
+    exported_root = tmpdir.ensure_dir('exported_root')
+    export(str(local_docs), versions['master']['sha'], str(exported_root.join(versions['master']['sha'])))
+
+    # Run and verify directory.
+    destination = tmpdir.ensure_dir('destination')
+    build_all(str(exported_root), str(destination), versions)
+    assert destination.join('contents.html').check(file=True)
+    assert destination.join('_static', 'banner.css').check(file=True)
+
+    # Verify HTML links.
+    expected = ['<li><a href="contents.html">master</a></li>', '<li><a href="v1.0.0/contents.html">v1.0.0</a></li>']
+    urls(destination.join('contents.html'), expected)
+    expected = ['<li><a href="contents.html">master</a></li>', '<li><a href="../v1.0.0/contents.html">v1.0.0</a></li>']
+    urls(destination.join('master', 'contents.html'), expected)
+
+
+@pytest.mark.parametrize('dedup_trees', [False, True])
+def test_reuse_doctrees(tmpdir, capfd, config, local_docs, urls, dedup_trees):
+    """Test reading docs only once for versions with identical docs.
+
+    :param tmpdir: pytest fixture.
+    :param capfd: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    :param bool dedup_trees: Also group versions with identical git trees.
+    """
+    config.dedup_trees = dedup_trees
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'other'])
+    pytest.run(local_docs, ['git', 'commit', '--allow-empty', '-m', 'Same tree, different commit.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0', 'other'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    assert [r['name'] for r in versions.remotes] == ['master', 'other', 'v1.0.0']
+    config.git_root = str(local_docs)
+
+    # Run.
+    destination = tmpdir.ensure_dir('destination')
+    capfd.readouterr()
+    build_all(str(tmpdir.ensure_dir('exported_root')), str(destination), versions)
+    stdout = capfd.readouterr()[0]
+
+    # Verify sources were only read once per group.
+    assert stdout.count('updating environment: 0 added, 0 changed, 0 removed') == (3 if dedup_trees else 2)
+    urls(destination.join('other', 'contents.html'), [
+        '<li><a href="../master/contents.html">master</a></li>',
+        '<li><a href="contents.html">other</a></li>',
+        '<li><a href="../v1.0.0/contents.html">v1.0.0</a></li>',
+    ])
+    urls(destination.join('v1.0.0', 'contents.html'), [
+        '<li><a href="../master/contents.html">master</a></li>',
+        '<li><a href="../other/contents.html">other</a></li>',
+        '<li><a href="contents.html">v1.0.0</a></li>',
+    ])
+
+
+def test_prefetch(tmpdir, config, local_docs, urls):
+    """Test exporting in the background and deleting exported commits after use.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    config.prefetch = 1
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'other'])
+    local_docs.join('contents.rst').write('Other\n=====\n')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0', 'other'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    config.git_root = str(local_docs)
+
+    # Run.
+    exported_root = tmpdir.ensure_dir('exported_root')
+    destination = tmpdir.ensure_dir('destination')
+    build_all(str(exported_root), str(destination), versions)
+
+    # Verify exported commits were deleted and all versions were built.
+    assert exported_root.listdir() == []
+    assert 'Other' in destination.join('other', 'contents.html').read()
+    urls(destination.join('contents.html'), [
+        '<li><a href="master/contents.html">master</a></li>',
+        '<li><a href="other/contents.html">other</a></li>',
+        '<li><a href="v1.0.0/contents.html">v1.0.0</a></li>',
+    ])
+
+
+def test_dedup_static(tmpdir, config, local_docs, urls):
+    """Test storing static files shared by all versions only once.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    config.dedup_static = 'rewrite'
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    for remote in versions.remotes:
+        remote['root_dir'] = remote['name']
+    config.git_root = str(local_docs)
+
+    # Run.
+    destination = tmpdir.ensure_dir('destination')
+    build_all(str(tmpdir.ensure_dir('exported_root')), str(destination), versions)
+
+    # Verify scripts are stored once and referenced by all versions.
+    scripts = set()
+    for name in ('', 'master', 'v1.0.0'):
+        contents = destination.join(name, 'contents.html').read()
+        assert 'src="{}_static/'.format('../' if name else '') not in contents
+        found = re.findall(r'src="(?:\.\./)?{}/([0-9a-f]{{40}}\.js)"'.format(SHARED_STATIC), contents)
+        assert found
+        scripts.add(tuple(found))
+        assert not destination.join(name, '_static', 'jquery.js').check()
+    assert len(scripts) == 1
+    assert all(destination.join(SHARED_STATIC, f).check(file=True) for f in scripts.pop())
+    urls(destination.join('master', 'contents.html'), [
+        '<li><a href="contents.html">master</a></li>',
+        '<li><a href="../v1.0.0/contents.html">v1.0.0</a></li>',
+    ])
+
+
+def test_reproducible(tmpdir, config, local_docs):
+    """Test building unchanged versions twice gives identical files with dates pinned to commit dates.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    config.reproducible = True
+    local_docs.join('conf.py').write(
+        'html_last_updated_fmt = "%c"\n'
+        'html_theme="sphinx_rtd_theme"\n'
+    )
+    local_docs.join('two.rst').write('Built |today|.\n', mode='a')
+    pytest.run(local_docs, ['git', 'commit', '-am', 'Changed two.'], environ=pytest.author_committer_dates(10))
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+    exported_root = tmpdir.ensure_dir('exported_root')
+    export(str(local_docs), versions['master']['sha'], str(exported_root.join(versions['master']['sha'])))
+
+    # Run twice.
+    first, second = tmpdir.ensure_dir('first'), tmpdir.ensure_dir('second')
+    build_all(str(exported_root), str(first), versions)
+    time.sleep(1.1)
+    build_all(str(exported_root), str(second), versions)
+
+    # Verify.
+    files = sorted(p.relto(first) for p in first.visit() if p.check(file=True))
+    assert files == sorted(p.relto(second) for p in second.visit() if p.check(file=True))
+    assert [f for f in files if first.join(f).read_binary() != second.join(f).read_binary()] == []
+    assert 'Built Dec 05, 2016.' in first.join('master', 'two.html').read()
+    search = RE_LAST_UPDATED.findall(first.join('master', 'search.html').read())
+    assert search == ['Last updated on Dec 5, 2016, 3:27:07 AM.\n']  # Committed date.
+
+
+@pytest.mark.parametrize('copy_root', [False, True])
+@pytest.mark.parametrize('name', ['docs.tar.gz', 'docs.zip'])
+def test_archive(tmpdir, config, local_docs, copy_root, name):
+    """Test writing versions into an archive file with the same layout as the destination directory.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param bool copy_root: Copy the root ref's subdirectory instead of building it.
+    :param str name: Archive file name.
+    """
+    config.copy_root = copy_root
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'v1.0.0'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+    for remote in versions.remotes:
+        remote['root_dir'] = remote['name']
+    config.git_root = str(local_docs)
+
+    # Build directory.
+    destination = tmpdir.ensure_dir('destination')
+    build_all(str(tmpdir.ensure_dir('exported_root')), str(destination), versions)
+    expected = {p.relto(destination).replace(os.sep, '/'): p.read_binary() for p in destination.visit() if p.isfile()}
+
+    # Build archive.
+    config.archive = True
+    archive = tmpdir.join(name)
+    build_all(str(tmpdir.ensure_dir('exported_root2')), str(archive), versions)
+    if name.endswith('.zip'):
+        with zipfile.ZipFile(str(archive)) as handle:
+            files = {n: handle.read(n) for n in handle.namelist()}
+    else:
+        with tarfile.open(str(archive)) as handle:
+            files = {m.name: handle.extractfile(m).read() for m in handle.getmembers() if m.isfile()}
+    assert sorted(files) == sorted(expected)
+    assert files['master/contents.html'] == expected['master/contents.html']
+    assert files['contents.html'] == expected['contents.html']
+
+
+def test_versions_json(tmpdir, config, local_docs, urls):
+    """Test writing versions.json and leaving the versions sidebar to versions.js.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    config.versions_json = True
+    local_docs.join('four.rst').write('Four\n====\n')
+    pytest.run(local_docs, ['git', 'add', 'four.rst'])
+    pytest.run(local_docs, ['git', 'commit', '-m', 'Adding four.'])
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0', 'HEAD~1'])
+    pytest.run(local_docs, ['git', 'tag', 'v2.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'master', 'v1.0.0', 'v2.0.0'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['semver'])
+    for remote in versions.remotes:
+        remote['found_docs'] = ('contents', 'four', 'one', 'three', 'two')
+        remote['root_dir'] = remote['name']
+    versions['v1.0.0']['found_docs'] = ('contents', 'one', 'three', 'two')
+    config.git_root = str(local_docs)
+
+    destination = tmpdir.ensure_dir('destination')
+    build_all(str(tmpdir.ensure_dir('exported_root')), str(destination), versions)
+
+    manifest = json.loads(destination.join('versions.json').read())
+    assert manifest == dict(
+        docs=[['contents', 'four', 'one', 'three', 'two'], ['contents', 'one', 'three', 'two']],
+        versions=[
+            dict(docs=0, kind='tags', master_doc='contents', name='v2.0.0', root_dir='v2.0.0'),
+            dict(docs=1, kind='tags', master_doc='contents', name='v1.0.0', root_dir='v1.0.0'),
+            dict(docs=0, kind='heads', master_doc='contents', name='master', root_dir='master'),
+        ],
+    )
+
+    # No links to versions in HTML.
+    contents = urls(destination.join('master', 'four.html'), [])
+    assert '<ul data-scv-page="four" data-scv-web-root="../"></ul>' in contents
+    assert '<script type="text/javascript" src="_static/versions.js"></script>' in contents
+    assert destination.join('master', '_static', 'versions.js').check(file=True)
+    contents = urls(destination.join('contents.html'), [])
+    assert '<ul data-scv-page="contents" data-scv-web-root=""></ul>' in contents
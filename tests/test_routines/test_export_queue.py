@@ -0,0 +1,67 @@
+"""Test objects in module."""
+
+import errno
+import os
+import threading
+
+import pytest
+
+from sphinxcontrib.versioning.routines import ExportQueue
+
+
+@pytest.mark.parametrize('prefetch', [0, 1])
+def test_error(monkeypatch, tmpdir, prefetch):
+    """Test errors other than git failing (e.g. disk full) are raised by get() instead of hanging.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param int prefetch: Export in the background.
+    """
+    def export(_, sha, target):
+        """Write part of an export, then fail for one commit."""
+        tmpdir.join(os.path.basename(target)).ensure('index.rst')  # Partially written.
+        if sha == 'b' * 40:
+            raise IOError(errno.ENOSPC, 'No space left on device')
+
+    monkeypatch.setattr('sphinxcontrib.versioning.routines.export', export)
+    shas = ['a' * 40, 'b' * 40]
+    exports = ExportQueue('', str(tmpdir), shas, prefetch)
+    try:
+        assert exports.get(shas[0]) == str(tmpdir.join(shas[0]))
+        exports.release(shas[0])
+        with pytest.raises(IOError) as exc:
+            exports.get(shas[1])
+        assert exc.value.errno == errno.ENOSPC
+    finally:
+        exports.close()
+
+    # Nothing half exported is left behind.
+    assert [p.basename for p in tmpdir.listdir()] == ([] if prefetch else [shas[0]])
+
+
+def test_close(monkeypatch, tmpdir):
+    """Test close() waiting for the export in progress so the next queue never sees a partial export.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    """
+    started, finish = threading.Event(), threading.Event()
+
+    def export(_, __, target):
+        """Block until the test lets the export finish."""
+        started.set()
+        finish.wait()
+        tmpdir.join(os.path.basename(target)).ensure('index.rst')
+
+    monkeypatch.setattr('sphinxcontrib.versioning.routines.export', export)
+    exports = ExportQueue('', str(tmpdir), ['a' * 40, 'b' * 40], 2)
+    started.wait()
+    closing = threading.Thread(target=exports.close)
+    closing.start()
+    closing.join(0.1)
+    assert closing.is_alive()  # Waiting for the export.
+
+    finish.set()
+    closing.join()
+    assert [p.basename for p in tmpdir.listdir()] == ['a' * 40]
+    assert tmpdir.join('a' * 40, 'index.rst').check(file=True)
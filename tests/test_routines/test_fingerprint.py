@@ -0,0 +1,58 @@
+"""Test functions in module."""
+
+import threading
+
+from sphinxcontrib.versioning.routines import fingerprint, read_state, STATE_FILE, write_fingerprint
+
+REMOTES = [
+    ['abaaa358379408d997255ec8155db30cea2a61a8', 'master', 'heads'],
+    ['3b7987d8f5f50457f960cfbb04f69b4f1cb3e5ac', 'v1.0.0', 'tags'],
+]
+
+
+def test(config):
+    """Test which inputs change the fingerprint.
+
+    :param config: conftest fixture.
+    """
+    value = fingerprint(REMOTES, ('docs',))
+    assert value == fingerprint(list(reversed(REMOTES)), ('docs',))
+    assert value != fingerprint(REMOTES[:1], ('docs',))
+    assert value != fingerprint(REMOTES, ('docs', 'doc'))
+
+    # Settings affecting output.
+    config.show_banner = True
+    assert value != fingerprint(REMOTES, ('docs',))
+
+    # Runtime settings.
+    config.show_banner = False
+    config.verbose = 2
+    config.prefetch = 3
+    assert value == fingerprint(REMOTES, ('docs',))
+
+
+def test_state(tmpdir):
+    """Test recording fingerprints in the state file.
+
+    :param tmpdir: pytest fixture.
+    """
+    tmpdir.ensure_dir('.git')
+    assert read_state(str(tmpdir)) == dict()
+
+    write_fingerprint(str(tmpdir), 'build a', '123')
+    write_fingerprint(str(tmpdir), 'push b', '456')
+    write_fingerprint(str(tmpdir), 'build a', '789')
+    assert read_state(str(tmpdir)) == {'build a': '789', 'push b': '456'}
+    assert sorted(p.basename for p in tmpdir.join('.git').listdir()) == [STATE_FILE, STATE_FILE + '.lock']
+
+    # Concurrent writers.
+    threads = [threading.Thread(target=write_fingerprint, args=(str(tmpdir), str(i), 'x')) for i in range(10)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(read_state(str(tmpdir))) == sorted(['build a', 'push b'] + [str(i) for i in range(10)])
+
+    # Corrupt.
+    tmpdir.join('.git', STATE_FILE).write('{')
+    assert read_state(str(tmpdir)) == dict()
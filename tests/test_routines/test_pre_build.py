@@ -1,12 +1,14 @@
 """Test function in module."""
 
 import posixpath
+import time
 
 import py
 import pytest
 
 from sphinxcontrib.versioning.lib import HandledError
 from sphinxcontrib.versioning.routines import gather_git_info, pre_build
+from sphinxcontrib.versioning.store import Store
 from sphinxcontrib.versioning.versions import Versions
 
 
@@ -119,3 +121,152 @@ def test_error(config, local_docs):
     config.root_ref = 'master'
     pre_build(str(local_docs), versions)
     assert [r['name'] for r in versions.remotes] == ['a_good', 'c_good', 'master']
+
+
+def test_static_conf(config, local_docs):
+    """Test reading conf.py statically without exporting.
+
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'checkout', 'feature'])
+    local_docs.join('conf.py').write('import os\nmaster_doc = os.environ.get("MASTER_DOC", "contents")\n')
+    local_docs.join('contents.rst').write('Test\n====\n\n.. toctree::\n    one\n')
+    local_docs.join('one.rst').write('One\n===\n')
+    pytest.run(local_docs, ['git', 'add', 'conf.py', 'contents.rst', 'one.rst'])
+    pytest.run(local_docs, ['git', 'commit', '-m', 'Dynamic conf.py.'])
+    pytest.run(local_docs, ['git', 'checkout', '-b', '_static', 'master'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'feature', '_static'])
+
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    assert len(versions) == 3
+
+    # Run and verify only dynamic conf.py was exported.
+    config.static_conf = True
+    exported_root = py.path.local(pre_build(str(local_docs), versions))
+    assert [p.basename for p in exported_root.listdir()] == [versions['feature']['sha']]
+
+    # Verify root_dirs, master_docs, and found_docs.
+    expected = ['_static_/contents', 'feature/contents', 'master/contents']
+    assert sorted(posixpath.join(r['root_dir'], r['master_doc']) for r in versions.remotes) == expected
+    actual = [sorted(r['found_docs']) for r in versions.remotes]
+    assert actual == [['contents', 'one', 'three', 'two'], ['contents', 'one'], ['contents', 'one', 'three', 'two']]
+
+
+def test_prefetch(config, local_docs):
+    """Test exporting in the background and deleting exported commits after use.
+
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'other'])
+    local_docs.join('four.rst').write('Four\n====\n')
+    pytest.run(local_docs, ['git', 'add', 'four.rst'])
+    pytest.run(local_docs, ['git', 'commit', '-m', 'Adding four.rst.'])
+    pytest.run(local_docs, ['git', 'tag', 'v1.0.0'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'other', 'v1.0.0'])
+
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    assert len(versions) == 3
+
+    # Run and verify nothing is left on disk.
+    config.prefetch = 1
+    exported_root = py.path.local(pre_build(str(local_docs), versions))
+    assert exported_root.listdir() == []
+
+    # Verify root_dirs, master_docs, and found_docs.
+    expected = ['master/contents', 'other/contents', 'v1.0.0/contents']
+    assert sorted(posixpath.join(r['root_dir'], r['master_doc']) for r in versions.remotes) == expected
+    actual = [sorted(r['found_docs']) for r in versions.remotes]
+    expected = [['contents', 'one', 'three', 'two'], ['contents', 'four', 'one', 'three', 'two']]
+    assert actual == expected + expected[1:]
+
+
+def test_previous_root_dirs(local_docs):
+    """Test keeping root directories from a previous run unless they collide with files of the root ref.
+
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'branch', '--force', 'feature'])
+    pytest.run(local_docs, ['git', 'checkout', '-b', '_static'])
+    pytest.run(local_docs, ['git', 'push', '--force', 'origin', '_static', 'feature'])
+
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()))
+    assert len(versions) == 3
+
+    # Verify versions root_dirs and master_docs.
+    pre_build(str(local_docs), versions, {'_static': '_static', 'feature': '_static_', 'deleted': 'master'})
+    expected = ['_static_/contents', '_static__/contents', 'master/contents']
+    assert sorted(posixpath.join(r['root_dir'], r['master_doc']) for r in versions.remotes) == expected
+    assert versions['feature']['root_dir'] == '_static_'
+
+
+def test_store(tmpdir, config, local_docs):
+    """Test reusing dates and configs of commits from previous runs.
+
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'other'])
+    local_docs.join('four.rst').write('Four\n====\n')
+    pytest.run(local_docs, ['git', 'add', 'four.rst'])
+    pytest.run(local_docs, ['git', 'commit', '-m', 'Adding four.rst.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'other'])
+    config.cache_dir = str(tmpdir.join('cache'))
+
+    # First run reads everything from git and Sphinx.
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    exported_root = py.path.local(pre_build(str(local_docs), versions))
+    assert len(exported_root.listdir()) == 2
+    keys = ('name', 'date', 'root_dir', 'found_docs', 'master_doc')
+    expected = [[r[k] for k in keys] for r in versions.remotes]
+
+    # Second run doesn't need to export anything.
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    exported_root = py.path.local(pre_build(str(local_docs), versions))
+    assert exported_root.listdir() == []
+    assert [[r[k] for k in keys] for r in versions.remotes] == expected
+
+    # Different sphinx-build arguments.
+    config.overflow = ('-D', 'master_doc=one')
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    exported_root = py.path.local(pre_build(str(local_docs), versions))
+    assert len(exported_root.listdir()) == 2
+    assert [r['master_doc'] for r in versions.remotes] == ['one', 'one']
+
+
+def test_store_tree(monkeypatch, tmpdir, config, local_docs):
+    """Test sharing configs of commits with identical docs and ignoring previous runs with refresh_cache.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    pytest.run(local_docs, ['git', 'checkout', '-b', 'same'])
+    pytest.run(local_docs, ['git', 'commit', '--allow-empty', '-m', 'Same docs.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'same'])
+    config.cache_dir = str(tmpdir.join('cache'))
+
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    assert versions['master']['sha'] != versions['same']['sha']
+    pre_build(str(local_docs), versions)
+    with Store(config.cache_dir) as store:
+        trees = [store.get('tree', [versions[n]['sha'], '']) for n in ('master', 'same')]
+    assert trees[0] and trees[0] == trees[1]
+
+    # A new commit with the same docs.
+    pytest.run(local_docs, ['git', 'commit', '--allow-empty', '-m', 'Same docs again.'])
+    pytest.run(local_docs, ['git', 'push', 'origin', 'same'])
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    exported_root = py.path.local(pre_build(str(local_docs), versions))
+    assert exported_root.listdir() == []
+    assert [r['master_doc'] for r in versions.remotes] == ['contents', 'contents']
+
+    # Refresh.
+    monkeypatch.setattr('sphinxcontrib.versioning.store.STARTED', time.time())
+    config.refresh_cache = True
+    versions = Versions(gather_git_info(str(local_docs), ['conf.py'], tuple(), tuple()), sort=['alpha'])
+    exported_root = py.path.local(pre_build(str(local_docs), versions))
+    assert len(exported_root.listdir()) == 2
@@ -0,0 +1,50 @@
+"""Test functions in module."""
+
+import pytest
+
+from sphinxcontrib.versioning.lib import Cache, HandledError
+from sphinxcontrib.versioning.routines import cache_budgets, prune_caches
+from sphinxcontrib.versioning.store import Store
+
+
+@pytest.mark.parametrize('values,expected', [
+    (tuple(), {None: 0}),
+    (512, {None: 512}),
+    ('512', {None: 512}),
+    (('512', 'jinja2=16', 'store = 0'), {None: 512, 'jinja2': 16, 'store': 0}),
+])
+def test_cache_budgets(values, expected):
+    """Test parsing budgets.
+
+    :param values: Setting to parse.
+    :param dict expected: Expected return value.
+    """
+    assert cache_budgets(values) == expected
+
+
+@pytest.mark.parametrize('values', ['big', ('jinja2=',), ('jinja2=-1',)])
+def test_cache_budgets_invalid(values):
+    """Test invalid budgets.
+
+    :param values: Setting to parse.
+    """
+    with pytest.raises(ValueError):
+        cache_budgets(values)
+
+
+def test_prune_caches(tmpdir):
+    """Test budgets of individual caches overriding the budget of all caches.
+
+    :param tmpdir: pytest fixture.
+    """
+    Store(str(tmpdir)).close()
+    for name in ('intersphinx', 'jinja2'):
+        cache = Cache(str(tmpdir), name)
+        cache.put('one', b'x' * 1024 ** 2)
+        cache.put('two', b'x')
+    assert prune_caches(str(tmpdir), ('1', 'jinja2=0'), ()) == 1  # Only intersphinx over budget.
+    assert Cache(str(tmpdir), 'jinja2').usage()[0] == 2
+    assert Cache(str(tmpdir), 'intersphinx').usage()[0] == 1
+
+    with pytest.raises(HandledError):
+        prune_caches(str(tmpdir), ('jinja2=big',), ())
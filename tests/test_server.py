@@ -0,0 +1,105 @@
+"""Test objects in module."""
+
+import gzip
+import io
+import threading
+
+import pytest
+
+from sphinxcontrib.versioning.lib import HandledError
+from sphinxcontrib.versioning.server import LazyBuilds, LazyServer
+from sphinxcontrib.versioning.versions import Versions
+
+try:
+    from urllib.request import Request, urlopen
+    from urllib.error import HTTPError
+except ImportError:
+    from urllib2 import HTTPError, Request, urlopen
+
+
+@pytest.fixture
+def builds(tmpdir):
+    """Web root with three versions built by a fake build function.
+
+    :param tmpdir: pytest fixture.
+
+    :return: LazyBuilds instance. Names built so far are in its calls attribute.
+    :rtype: sphinxcontrib.versioning.server.LazyBuilds
+    """
+    remotes = [('a' * 40, name, 'heads', 1465766422, 'conf.py') for name in ('master', 'feature', 'broken')]
+    versions = Versions(remotes)
+    destination = tmpdir.ensure_dir('html')
+    destination.ensure('index.html').write('root')
+    calls = list()
+
+    def build_version(name):
+        """Fake build."""
+        calls.append(name)
+        if name == 'broken':
+            raise HandledError
+        destination.ensure(name, 'index.html').write('<p>{}</p>'.format(name) * 100)
+
+    lazy_builds = LazyBuilds(str(destination), versions, build_version, keep=1)
+    lazy_builds.calls = calls
+    return lazy_builds
+
+
+def test_ensure(tmpdir, builds):
+    """Test building on first use, evicting, and remembering failures.
+
+    :param tmpdir: pytest fixture.
+    :param builds: Fixture defined above.
+    """
+    destination = tmpdir.join('html')
+    assert builds.ensure('_static') is True
+    assert builds.ensure('master') is True
+    assert builds.ensure('master') is True
+    assert builds.calls == ['master']
+    assert destination.join('master', 'index.html.gz').check(file=True)
+
+    # Evict.
+    assert builds.ensure('feature') is True
+    assert builds.calls == ['master', 'feature']
+    assert not destination.join('master').check()
+    assert list(builds.built) == ['feature']
+
+    # Failures aren't retried.
+    assert builds.ensure('broken') is False
+    assert builds.ensure('broken') is False
+    assert builds.calls == ['master', 'feature', 'broken']
+
+
+@pytest.mark.parametrize('accept_gzip', [False, True])
+def test_server(builds, accept_gzip):
+    """Test serving files and building versions on request.
+
+    :param builds: Fixture defined above.
+    :param bool accept_gzip: Send Accept-Encoding: gzip.
+    """
+    server = LazyServer(('127.0.0.1', 0), builds)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+    headers = {'Accept-Encoding': 'gzip'} if accept_gzip else {}
+    try:
+        response = urlopen(Request(url + 'index.html', headers=headers))
+        assert response.read() == b'root'
+
+        response = urlopen(Request(url + 'feature/index.html', headers=headers))
+        body = response.read()
+        if accept_gzip:
+            assert response.info().get('Content-Encoding') == 'gzip'
+            body = gzip.GzipFile(fileobj=io.BytesIO(body)).read()
+        else:
+            assert response.info().get('Content-Encoding') is None
+        assert body == b'<p>feature</p>' * 100
+        assert response.info().get('Content-Type') == 'text/html'
+
+        with pytest.raises(HTTPError) as exc:
+            urlopen(Request(url + 'broken/index.html', headers=headers))
+        assert exc.value.code == 500
+        assert builds.calls == ['feature', 'broken']
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -1,11 +1,43 @@
 """Test function."""
 
+import threading
+import time
+import zlib
+
 import pytest
 
-from sphinxcontrib.versioning.lib import HandledError
+from sphinxcontrib.versioning.lib import Cache, HandledError
 from sphinxcontrib.versioning.sphinx_ import build
 from sphinxcontrib.versioning.versions import Versions
 
+try:
+    from http.server import BaseHTTPRequestHandler, HTTPServer
+except ImportError:
+    from BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+
+
+class InventoryHandler(BaseHTTPRequestHandler):
+    """Stand-in for a web server hosting another project's Sphinx docs. Records requested paths."""
+
+    REQUESTS = list()
+
+    def do_GET(self):  # noqa
+        """Serve objects.inv."""
+        self.REQUESTS.append(self.path)
+        if self.path != '/objects.inv':
+            self.send_error(404)
+            return
+        contents = b'# Sphinx inventory version 2\n# Project: Other\n# Version: 1.0\n'
+        contents += b'# The remainder of this file is compressed using zlib.\n'
+        contents += zlib.compress(b'other.func py:function 1 api.html#$ -\n')
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(contents)))
+        self.end_headers()
+        self.wfile.write(contents)
+
+    def log_message(self, *_):
+        """Don't print to stderr."""
+
 
 @pytest.mark.parametrize('no_feature', [True, False])
 def test_simple(tmpdir, local_docs, urls, no_feature):
@@ -210,3 +242,125 @@ def test_subdirs(tmpdir, local_docs, urls):
             '<li><a href="{}master/{}sub.html">master</a></li>'.format('../' * i, 'subdir/' * i),
             '<li><a href="{}feature/{}sub.html">feature</a></li>'.format('../' * i, 'subdir/' * i),
         ])
+
+
+def test_intersphinx(monkeypatch, tmpdir, config, local_docs):
+    """Verify intersphinx inventories are downloaded once per run and shared by all builds.
+
+    :param monkeypatch: pytest fixture.
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    server = HTTPServer(('127.0.0.1', 0), InventoryHandler)
+    threading.Thread(target=server.serve_forever).start()
+    url = 'http://127.0.0.1:{}/'.format(server.server_address[1])
+    local_docs.join('conf.py').write(
+        'extensions = ["sphinx.ext.intersphinx"]\n'
+        'intersphinx_mapping = {"other": ("%s", None)}\n' % url
+    )
+    local_docs.join('one.rst').write('\nSee :py:func:`other.func`.\n', mode='a')
+    config.cache_dir = str(tmpdir.join('cache'))
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py'), ('', 'feature', 'heads', 2, 'conf.py')])
+
+    try:
+        for name in ('master', 'feature'):
+            build(str(local_docs), str(tmpdir.join(name)), versions, name, False)
+        assert InventoryHandler.REQUESTS == ['/objects.inv']
+
+        # Next run downloads it again.
+        monkeypatch.setattr('sphinxcontrib.versioning.sphinx_.STARTED', time.time())
+        build(str(local_docs), str(tmpdir.join('again')), versions, 'master', False)
+        assert InventoryHandler.REQUESTS == ['/objects.inv'] * 2
+    finally:
+        server.shutdown()
+        server.server_close()
+
+    # Fall back to the copy of the previous run.
+    monkeypatch.setattr('sphinxcontrib.versioning.sphinx_.STARTED', time.time())
+    build(str(local_docs), str(tmpdir.join('offline')), versions, 'master', False)
+    for name in ('master', 'feature', 'again', 'offline'):
+        assert '{}api.html#other.func'.format(url) in tmpdir.join(name, 'one.html').read()
+
+
+def test_template_cache(tmpdir, config, local_docs):
+    """Verify compiled templates are shared by builds and templates with the same name but different source aren't.
+
+    :param tmpdir: pytest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    """
+    config.cache_dir = str(tmpdir.join('cache'))
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py'), ('', 'feature', 'heads', 2, 'conf.py')])
+    local_docs.join('conf.py').write(
+        'templates_path = ["_templates"]\n'
+        'html_sidebars = {"**": ["custom.html"]}\n'
+    )
+
+    local_docs.ensure('_templates', 'custom.html').write('<h3>Sidebar of master</h3>')
+    build(str(local_docs), str(tmpdir.join('master')), versions, 'master', False)
+    cache = Cache(config.cache_dir, 'jinja2')
+    count = cache.usage()[0]
+    assert count > 1
+    assert cache.stats()['hits'] == 0
+
+    local_docs.join('_templates', 'custom.html').write('<h3>Sidebar of feature</h3>')
+    build(str(local_docs), str(tmpdir.join('feature')), versions, 'feature', False)
+    assert cache.usage()[0] == count + 1
+    assert cache.stats()['hits'] == count - 1
+    assert '<h3>Sidebar of master</h3>' in tmpdir.join('master', 'contents.html').read()
+    assert '<h3>Sidebar of feature</h3>' in tmpdir.join('feature', 'contents.html').read()
+
+
+def test_fragments(tmpdir, banner, config, local_docs, urls):
+    """Verify the banner and versions sidebar rendered once per page class have the right URLs on every page.
+
+    :param tmpdir: pytest fixture.
+    :param banner: conftest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    config.show_banner = True
+    config.banner_main_ref = 'master'
+    target = tmpdir.ensure_dir('target')
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py'), ('', 'feature', 'heads', 2, 'conf.py')])
+    versions['master']['found_docs'] = ('contents', 'one')
+    versions['feature']['found_docs'] = ('contents', 'one', 'two', 'subdir/sub')
+    local_docs.join('contents.rst').write('    subdir/sub\n', mode='a')
+    local_docs.ensure('subdir', 'sub.rst').write('Sub\n===\n\nSub directory sub page documentation.\n')
+
+    build(str(local_docs), str(target), versions, 'feature', False)
+
+    message = 'the development version of Python. The main version is master'
+    banner(target.join('contents.html'), '../master/contents.html', message)
+    banner(target.join('one.html'), '../master/one.html', message)
+    banner(target.join('two.html'), '', 'the development version of Python')  # Not in master.
+    banner(target.join('subdir', 'sub.html'), '', 'the development version of Python')
+    urls(target.join('one.html'), ['<li><a href="../master/one.html">master</a></li>',
+                                   '<li><a href="one.html">feature</a></li>'])
+    urls(target.join('subdir', 'sub.html'), ['<li><a href="../../master/contents.html">master</a></li>',
+                                             '<li><a href="sub.html">feature</a></li>'])
+
+
+def test_versions_json(tmpdir, banner, config, local_docs, urls):
+    """Verify links to other versions are left to versions.js with versions_json.
+
+    :param tmpdir: pytest fixture.
+    :param banner: conftest fixture.
+    :param sphinxcontrib.versioning.lib.Config config: conftest fixture.
+    :param local_docs: conftest fixture.
+    :param urls: conftest fixture.
+    """
+    config.show_banner = True
+    config.banner_main_ref = 'master'
+    config.versions_json = True
+    target = tmpdir.ensure_dir('target')
+    versions = Versions([('', 'master', 'heads', 1, 'conf.py'), ('', 'feature', 'heads', 2, 'conf.py')])
+
+    build(str(local_docs), str(target), versions, 'feature', False)
+
+    contents = banner(target.join('one.html'), '', 'the development version of Python')
+    assert ('<p class="scv-banner" data-scv-banner="master" data-scv-label="main" data-scv-page="one" '
+            'data-scv-web-root="../">') in contents
+    assert '<ul data-scv-page="one" data-scv-web-root="../"></ul>' in urls(target.join('one.html'), [])
@@ -0,0 +1,89 @@
+"""Test function."""
+
+import pytest
+
+from sphinxcontrib.versioning.sphinx_ import read_config_static
+
+FILES = ['conf.py', 'contents.rst', 'one.rst', 'sub/two.rst', 'sub/three.md', '_build/html/_sources/one.rst',
+         '_templates/layout.rst', 'extra/robots.txt']
+
+
+@pytest.mark.parametrize('contents,master_doc,found_docs', [
+    ('', 'contents', ['contents', 'one', 'sub/two']),
+    ('import os\nmaster_doc = "one"\nproject = os.getcwd()\n', 'one', ['contents', 'one', 'sub/two']),
+    ('exclude_patterns = ["_build", "sub"]\n', 'contents', ['contents', 'one']),
+    ('source_suffix = [".rst", ".md"]\n', 'contents', ['contents', 'one', 'sub/three', 'sub/two']),
+    ('source_suffix = ".md"\n', 'contents', ['sub/three']),
+    ('templates_path = ["_templates"]\n', 'contents', ['contents', 'one', 'sub/two']),
+])
+def test(contents, master_doc, found_docs):
+    """Verify working.
+
+    :param str contents: conf.py contents.
+    :param str master_doc: Expected master_doc.
+    :param list found_docs: Expected found_docs (ignoring _build and _templates).
+    """
+    config = read_config_static(contents, FILES)
+    assert config['master_doc'] == master_doc
+    assert [d for d in config['found_docs'] if not d.startswith('_')] == found_docs
+    assert '_templates/layout' not in config['found_docs'] or 'templates_path' not in contents
+    assert '_build/html/_sources/one' not in config['found_docs']
+
+
+def test_root_files():
+    """Verify predicted top level output files."""
+    contents = 'exclude_patterns = ["_build", "_templates"]\nhtml_extra_path = ["extra"]\n'
+    config = read_config_static(contents, FILES)
+    assert 'contents.html' in config['root_files']
+    assert 'sub' in config['root_files']
+    assert 'robots.txt' in config['root_files']
+    assert '_static' in config['root_files']
+    assert 'search.html' in config['root_files']
+    assert 'extra' not in config['root_files']
+    assert '_modules' not in config['root_files']
+
+
+def test_root_files_suffix_extensions():
+    """Verify html_file_suffix and files written by extensions."""
+    contents = 'extensions = ["sphinx.ext.autodoc", "sphinx.ext.viewcode"]\nhtml_file_suffix = ".xhtml"\n'
+    config = read_config_static(contents, FILES)
+    assert 'contents.xhtml' in config['root_files']
+    assert 'search.xhtml' in config['root_files']
+    assert 'contents.html' not in config['root_files']
+    assert '_modules' in config['root_files']
+
+
+@pytest.mark.parametrize('contents', [
+    'master_doc = get_master()\n',
+    'exclude_patterns = []\nexclude_patterns.append("_build")\n',
+    'if tags.has("x"):\n    master_doc = "index"\n',
+    'from common_conf import *\n',
+    'exec(open("other.py").read())\n',
+    'exclude_patterns = "_build"\n',
+    'master_doc = \n',
+    'extensions = ["sphinx.ext.autosummary"]\n',
+    'extensions = ["sphinx.ext.autodoc"]\nextensions.append("custom")\n',
+    'html_file_suffix = 1\n',
+])
+def test_dynamic(contents):
+    """Test conf.py files that can't be evaluated statically.
+
+    :param str contents: conf.py contents.
+    """
+    assert read_config_static(contents, FILES) is None
+
+
+@pytest.mark.parametrize('overflow,supported', [
+    (('-A', 'html_theme=x'), True),
+    (('-D', 'html_theme=x'), True),
+    (('-D', 'master_doc=index'), False),
+    (('-Dmaster_doc=index',), False),
+    (('-C',), False),
+])
+def test_overflow(overflow, supported):
+    """Test overflow arguments changing relevant variables.
+
+    :param tuple overflow: Arguments passed to sphinx-build.
+    :param bool supported: Expected to be supported.
+    """
+    assert (read_config_static('', FILES, overflow) is not None) is supported
@@ -0,0 +1,43 @@
+"""Test function."""
+
+import os
+import sys
+
+import pytest
+
+from sphinxcontrib.versioning.lib import HandledError
+from sphinxcontrib.versioning.sphinx_ import read_scv_config
+
+
+def test(tmpdir):
+    """Verify working and isolated from this process.
+
+    :param tmpdir: pytest fixture.
+    """
+    tmpdir.join('version.txt').write('feature')
+    conf_py = tmpdir.join('conf.py')
+    conf_py.write(
+        'import sys\n'
+        'sys.path.insert(0, "/unknown")\n'
+        'scv_root_ref = open("version.txt").read()\n'  # Relative to conf.py directory.
+        'scv_show_banner = tags.has("unknown")\n'
+        'scv_unknown_item = True\n'
+        'project = "MyProject"\n'
+    )
+    cwd = os.getcwd()
+
+    config = read_scv_config(str(conf_py))
+    assert config == dict(scv_root_ref='feature', scv_show_banner=False)
+    assert '/unknown' not in sys.path
+    assert os.getcwd() == cwd
+
+
+def test_error(tmpdir):
+    """Test error handling.
+
+    :param tmpdir: pytest fixture.
+    """
+    conf_py = tmpdir.join('conf.py')
+    conf_py.write('undefined')
+    with pytest.raises(HandledError):
+        read_scv_config(str(conf_py))
@@ -0,0 +1,110 @@
+"""Test objects in module."""
+
+import multiprocessing
+import time
+
+from sphinxcontrib.versioning.store import Store, STORE_FILE
+
+
+def write_entries(cache_dir, start):
+    """Write entries from another process.
+
+    :param str cache_dir: Directory with the database.
+    :param int start: First key.
+    """
+    with Store(cache_dir) as store:
+        for i in range(start, start + 20):
+            store.set('test', [i], dict(value=i))
+
+
+def test_memory():
+    """Test entries are only kept in memory without a cache directory."""
+    with Store() as store:
+        assert store.path == ':memory:'
+        assert store.get('dates', ['abc', ['docs/conf.py']]) is None
+        assert store.get('dates', ['abc', ['docs/conf.py']], False) is False
+        store.set('dates', ['abc', ['docs/conf.py']], None)
+        assert store.get('dates', ['abc', ['docs/conf.py']], False) is None
+    with Store() as store:
+        assert store.get('dates', ['abc', ['docs/conf.py']], False) is False
+
+
+def test_persist(tmpdir):
+    """Test reading entries in later runs.
+
+    :param tmpdir: pytest fixture.
+    """
+    cache_dir = tmpdir.join('cache', 'subdir')
+    with Store(str(cache_dir)) as store:
+        store.set('config', ['abc', 'conf.py'], dict(found_docs=['contents', 'one'], master_doc='contents'))
+        store.set('config', ['abc', 'conf.py'], dict(found_docs=['contents'], master_doc='contents'))
+        store.set('root_files', ['abc', 'conf.py'], ['contents.html'])
+    assert cache_dir.join(STORE_FILE).check(file=True)
+
+    with Store(str(cache_dir)) as store:
+        assert store.get('config', ['abc', 'conf.py']) == dict(found_docs=['contents'], master_doc='contents')
+        assert store.get('root_files', ['abc', 'conf.py']) == ['contents.html']
+        assert store.get('config', ['abc', 'docs/conf.py']) is None
+        assert store.get('dates', ['abc', 'conf.py']) is None
+
+
+def test_concurrent(tmpdir):
+    """Test writing from multiple processes at the same time.
+
+    :param tmpdir: pytest fixture.
+    """
+    processes = [multiprocessing.Process(target=write_entries, args=(str(tmpdir), i * 20)) for i in range(4)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    assert [p.exitcode for p in processes] == [0, 0, 0, 0]
+
+    with Store(str(tmpdir)) as store:
+        assert [store.get('test', [i])['value'] for i in range(80)] == list(range(80))
+
+
+def test_since(tmpdir):
+    """Test ignoring entries written before a point in time.
+
+    :param tmpdir: pytest fixture.
+    """
+    with Store(str(tmpdir)) as store:
+        store.set('config', ['abc'], 'old')
+    time.sleep(0.01)
+    with Store(str(tmpdir), time.time()) as store:
+        assert store.get('config', ['abc']) is None
+        store.set('config', ['def'], 'new')
+        assert store.get('config', ['def']) == 'new'
+    with Store(str(tmpdir)) as store:
+        assert store.get('config', ['abc']) == 'old'
+
+
+def test_prune(tmpdir):
+    """Test deleting old and least recently used entries.
+
+    :param tmpdir: pytest fixture.
+    """
+    with Store(str(tmpdir)) as store:
+        for i in range(4):
+            store.set('config', [i], 'x' * 100)
+        store.set('dates', ['old'], 1)
+    time.sleep(0.01)
+    with Store(str(tmpdir)) as store:
+        assert store.get('config', [0]) == 'x' * 100  # Most recently used now.
+        assert store.get('config', [9]) is None
+    with Store(str(tmpdir)) as store:
+        usage = store.usage()
+        assert usage['config'][0] == 4
+        assert store.stats() == dict(config=dict(hits=1, misses=1))
+
+        # Keep room for about two entries.
+        assert store.prune(max_size=usage['config'][1] // 2) == 3
+        assert store.get('config', [0]) == 'x' * 100
+        assert store.get('config', [3]) is None
+
+        time.sleep(0.01)
+        assert store.prune(max_age=0.005) == 2
+        assert store.usage() == dict()
+        store.set('config', [0], 'new')
+        assert store.clear() == 1